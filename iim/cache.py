@@ -0,0 +1,178 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing an on-disk cache of prepared IIM models.
+
+Each entry holds the sector labels, the model matrices (I/O table,
+as-planned output, A and A*) and the arrays of the S matrix solver
+(LU factorization or S), stored as raw .npy files in a directory named
+by a content hash of the input table and the table/mode/solver options.
+Entries are loaded by memory-mapping, so a warm start does not parse
+the CSV file or refactorize. The total size of the cache is bounded by
+evicting the least recently used entries.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import scipy.sparse
+import iim.iim as iim
+import iim.solver as iim_solver
+
+CACHE_VERSION = 2  # bump when the layout of cache entries changes
+
+_MATRICES = ["io_table", "xoutput", "amat", "astar"]
+
+
+class ModelCache:
+    """Class providing an on-disk cache of prepared IIM models."""
+    def __init__(self, directory, max_bytes=2 * 1024**3):
+        self.directory = directory  # cache directory
+        self.max_bytes = max_bytes  # maximum total size of cache entries
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, filename, table_="IO", mode_="Demand", solver_="LU",
+            precision_="float64"):
+        """Return cache key for input file and model options."""
+        h = hashlib.sha256()
+        h.update(json.dumps(
+            [CACHE_VERSION, table_, mode_, solver_, precision_]).encode())
+        with open(filename, "rb") as fin:
+            for chunk in iter(lambda: fin.read(1024**2), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def get(self, filename, psector_, cvalue_, table_="IO", mode_="Demand",
+            solver_="LU", precision_="float64"):
+        """Return IIM model from cache, preparing and storing it if needed."""
+        key = self.key(filename, table_, mode_, solver_, precision_)
+        model = self.load(key)
+        if model is None:
+            model = iim.IIM(
+                filename, [], [], table_, mode_, solver_, precision_)
+            self.store(key, model)
+        return model.with_perturbation(psector_, cvalue_)
+
+    def load(self, key):
+        """Return unperturbed IIM model for key, or None if not cached."""
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, "meta.json")) as fin:
+                meta = json.load(fin)
+            arrays = {}
+            for name in _MATRICES:
+                arrays[name] = _load_matrix(path, name, meta["matrices"])
+            state = {}
+            for name in meta["solver_state"]:
+                state[name] = np.load(
+                    os.path.join(path, "solver_" + name + ".npy"),
+                    mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(path, ignore_errors=True)  # corrupt entry
+            return None
+        os.utime(path)  # mark as recently used
+        solver = iim_solver.restore_solver(
+            arrays["astar"], state, meta["solver"])
+        return iim.IIM._from_prepared(
+            meta["sectors"], arrays["io_table"], arrays["xoutput"],
+            arrays["amat"], arrays["astar"], solver,
+            meta["table"], meta["mode"], meta["solver"], meta["precision"])
+
+    def store(self, key, model):
+        """Store prepared IIM model under key."""
+        if model.solver_type not in iim_solver.SOLVERS:
+            raise RuntimeError(
+                "%s solver cannot be cached" % model.solver_type)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            matrices = {}
+            for name in _MATRICES:
+                matrices[name] = _save_matrix(tmp, name, getattr(model, name))
+            state = model.solver.state()
+            for name, arr in state.items():
+                np.save(os.path.join(tmp, "solver_" + name + ".npy"), arr)
+            meta = {"sectors": [str(s) for s in model.get_sectors()],
+                    "table": model.table,
+                    "mode": model.mode,
+                    "solver": model.solver_type,
+                    "precision": model.precision,
+                    "matrices": matrices,
+                    "solver_state": sorted(state)}
+            with open(os.path.join(tmp, "meta.json"), "w") as fout:
+                json.dump(meta, fout)
+            os.replace(tmp, os.path.join(self.directory, key))
+        except OSError:
+            pass  # entry written concurrently by another process
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict(keep=key)
+
+    def entries(self):
+        """Return list of (key, bytes) sorted from least recently used."""
+        res = []
+        for key in os.listdir(self.directory):
+            path = os.path.join(self.directory, key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            res.append((os.stat(path).st_mtime, key, size))
+        return [(key, size) for _, key, size in sorted(res)]
+
+    def size(self):
+        """Return total size of cache entries in bytes."""
+        return sum(size for _, size in self.entries())
+
+    def clear(self):
+        """Remove all cache entries."""
+        for key, _ in self.entries():
+            shutil.rmtree(os.path.join(self.directory, key),
+                          ignore_errors=True)
+
+    def _evict(self, keep=None):
+        # Remove least recently used entries until the cache fits.
+        entries = self.entries()
+        total = sum(size for _, size in entries)
+        for key, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, key),
+                          ignore_errors=True)
+            total -= size
+
+
+def _save_matrix(path, name, mat):
+    # Save dense or CSR matrix as raw .npy files and return its kind.
+    if scipy.sparse.issparse(mat):
+        mat = scipy.sparse.csr_matrix(mat)
+        for part in ["data", "indices", "indptr"]:
+            np.save(os.path.join(path, name + "." + part + ".npy"),
+                    getattr(mat, part))
+        return {"kind": "csr", "shape": list(mat.shape)}
+    if isinstance(mat, np.ndarray):
+        np.save(os.path.join(path, name + ".npy"), mat)
+        return {"kind": "dense"}
+    return {"kind": "none"}
+
+
+def _load_matrix(path, name, matrices):
+    # Load matrix saved by _save_matrix using memory-mapping.
+    kind = matrices[name]["kind"]
+    if kind == "csr":
+        parts = [np.load(os.path.join(path, name + "." + part + ".npy"),
+                         mmap_mode="r")
+                 for part in ["data", "indices", "indptr"]]
+        return scipy.sparse.csr_matrix(
+            tuple(parts), shape=tuple(matrices[name]["shape"]))
+    if kind == "dense":
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+    return []
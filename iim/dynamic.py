@@ -0,0 +1,162 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing the Dynamic Inoperability Input-Output Model (DIIM).
+
+The recovery of the sectors is simulated with the discrete-time model
+of Lian & Haimes (2006),
+
+    q(t+1) = q(t) + K [A* q(t) + c*(t) - q(t)],
+
+where K is the diagonal matrix of sector resilience coefficients. Many
+scenarios are advanced at once as a (scenarios x sectors) array using
+the A* matrix of a prepared IIM model. Trajectories can be streamed to
+a memory-mapped .npy file, and the inoperability and economic loss
+integrals are accumulated while stepping.
+
+Reference:
+    Lian, C. & Haimes, Y. Y. (2006). Managing the risk of terrorism to
+    interdependent infrastructure systems through the dynamic
+    inoperability input-output model. Systems Engineering, 9, 91-108.
+"""
+
+import collections.abc
+import numpy as np
+
+
+def resilience_coefficients(q0, qt, t, astar):
+    """Return resilience coefficients from recovery targets.
+
+    Sector i recovers from inoperability q0[i] to qt[i] in time t[i]
+    (Lian & Haimes, 2006, eq. 10):
+    k_i = ln(q0_i / qt_i) / (t_i (1 - a*_ii)).
+    """
+    diag = np.asarray(astar.diagonal(), dtype=float).ravel()
+    return np.log(np.asarray(q0, dtype=float) / np.asarray(qt, dtype=float)) \
+        / (np.asarray(t, dtype=float) * (1.0 - diag))
+
+
+class DynamicResult:
+    """Class holding the result of a DIIM simulation."""
+    def __init__(self, nscen, n):
+        self.nsteps = 0                           # number of time steps
+        self.q = np.zeros((nscen, n))             # final inoperability
+        self.integral = np.zeros((nscen, n))      # time integral of q
+        self.economic_loss = None                 # x_i times integral of q
+        self.recovery_step = np.full((nscen, n), -1, dtype=np.int64)
+        self.trajectory = None                    # file with trajectories
+
+    def total_loss(self):
+        """Return total economic loss per scenario (None if unknown)."""
+        if self.economic_loss is None:
+            return None
+        return self.economic_loss.sum(axis=1)
+
+
+class DynamicIIM:
+    """Class providing DIIM recovery simulations for an IIM model.
+
+    The resilience coefficients K are given per sector (or as a scalar)
+    and must lie in (0, 1] for a stable recovery. If the model was read
+    from an I/O table, its as-planned output is used for the economic
+    loss unless xoutput is given.
+    """
+    def __init__(self, model, kvalue, xoutput=None, dt=1.0):
+        n = len(model)
+        self.model = model
+        self.kvalue = np.broadcast_to(
+            np.asarray(kvalue, dtype=float), (n,)).copy()
+        if np.any(self.kvalue <= 0.0) or np.any(self.kvalue > 1.0):
+            raise RuntimeError("resilience coefficients must be in (0, 1]")
+        if xoutput is None and len(model.get_xoutput()) == n:
+            xoutput = model.get_xoutput()
+        self.xoutput = None if xoutput is None \
+            else np.asarray(xoutput, dtype=float)
+        self.dt = dt  # length of a time step
+
+    def step(self, q, cstar):
+        """Return inoperability after one time step from q."""
+        astar = self.model.astar
+        qnew = q + self.kvalue * (np.transpose(astar @ np.transpose(q)) +
+                                  cstar - q)
+        return np.clip(qnew, 0.0, 1.0, out=qnew)
+
+    def run(self, q0, nsteps, cstar=None, trajectory=None, every=1,
+            threshold=1.0e-3, dtype=np.float32):
+        """Simulate recovery from q0 for nsteps time steps.
+
+        q0 is a (scenarios x sectors) array (or a vector for a single
+        scenario). cstar is None (no perturbation after t = 0), an array
+        or sequence broadcastable to q0 (constant perturbation), a
+        callable returning c*(t), or an iterator (e.g. a generator)
+        yielding c*(t) for t = 0, 1, ...
+
+        If trajectory is a filename, q at every every'th step (including
+        t = 0) is written to a memory-mapped (steps x scenarios x sectors)
+        .npy file of the given dtype. The step at which each sector first
+        falls to or below threshold is recorded in recovery_step.
+        """
+        #
+        # Algorithm:
+        #   Lian & Haimes (2006), eq. 9, with the inoperability integral
+        #   accumulated by the trapezoidal rule.
+        #
+        q = np.atleast_2d(np.array(q0, dtype=float))
+        nscen, n = q.shape
+        if n != len(self.model):
+            raise RuntimeError("q0 must have %d columns" % len(self.model))
+        cgen = _cstar_source(cstar, q.shape)
+        result = DynamicResult(nscen, n)
+        out = None
+        if trajectory is not None:
+            nout = nsteps // every + 1
+            out = np.lib.format.open_memmap(
+                trajectory, mode="w+", dtype=dtype, shape=(nout, nscen, n))
+            out[0] = q
+            result.trajectory = trajectory
+        recovered = q <= threshold
+        result.recovery_step[recovered] = 0
+        for t in range(nsteps):
+            qnew = self.step(q, cgen(t))
+            result.integral += 0.5 * self.dt * (q + qnew)
+            q = qnew
+            done = (q <= threshold) & ~recovered
+            result.recovery_step[done] = t + 1
+            recovered |= done
+            if out is not None and (t + 1) % every == 0:
+                out[(t + 1) // every] = q
+        if out is not None:
+            out.flush()
+            del out
+        result.nsteps = nsteps
+        result.q = q
+        if self.xoutput is not None:
+            result.economic_loss = result.integral * self.xoutput
+        return result
+
+
+def _cstar_source(cstar, shape):
+    # Return function giving c*(t) as an array broadcastable to shape.
+    # Sequences and arrays are constant; other iterables are streams.
+    if cstar is None:
+        zero = np.zeros(shape[1])
+        return lambda t: zero
+    if callable(cstar):
+        return cstar
+    if not isinstance(cstar, collections.abc.Iterable) or \
+            isinstance(cstar, (collections.abc.Sequence, np.ndarray)):
+        const = np.asarray(cstar, dtype=float)
+        if const.ndim > 0 and const.shape[-1] not in (1, shape[1]):
+            raise RuntimeError("c* must have %d columns" % shape[1])
+        return lambda t: const
+    it = iter(cstar)
+
+    def next_cstar(t):
+        try:
+            return np.asarray(next(it), dtype=float)
+        except StopIteration:
+            raise RuntimeError("c*(t) ended before step %d" % t)
+    return next_cstar
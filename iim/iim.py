@@ -28,47 +28,198 @@ described in the papers:
    dependency assessment using the input-output inoperability model.
    International Journal of Critical Infrastructure Protection, 2, 170-178.
 """
+import copy
 import numpy as np
-import pandas as pd
+import scipy.sparse
+import iim.nthorder as iim_nthorder
+import iim.profile as iim_profile
+import iim.reader as iim_reader
+import iim.solver as iim_solver
+
+# Supported floating-point precisions of the model matrices.
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+
+def _model_sizes(model, *args, **kwargs):
+    # Return matrix sizes of model for profiling spans.
+    return dict(iim_profile.matrix_sizes(model.astar),
+                solver=model.solver_type)
+
+
+def _amat_sizes(model, *args, **kwargs):
+    # Return size of the technical coefficients matrix for profiling spans.
+    return iim_profile.matrix_sizes(model.amat)
+
+
+def _table_sizes(model, *args, **kwargs):
+    # Return sizes of the input table for profiling spans.
+    return dict(iim_profile.matrix_sizes(model.io_table),
+                file_bytes=model.read_stats.nbytes)
+
+
+class SectorIndex(tuple):
+    """Immutable sequence of sector labels with O(1) label lookup."""
+    def __new__(cls, sectors):
+        obj = super().__new__(cls, [str(s).strip() for s in sectors])
+        obj._loc = {}
+        for i, s in enumerate(obj):
+            obj._loc.setdefault(s, i)
+        return obj
+
+    def get_loc(self, sector):
+        """Return position of sector (raises KeyError if not found)."""
+        return self._loc[sector]
 
 
 class IIM:
-    """Class providing the Inoperability Input-Output Model."""
+    """Class providing the Inoperability Input-Output Model.
+
+    The prepared model (sectors, A, A* and the S matrix solver) is
+    read-only after construction. New perturbations are applied with
+    with_perturbation(), which returns a view sharing the prepared
+    matrices, so the O(n^3) setup cost is paid only once per table.
+    """
     def __init__(
-            self, filename, psector_, cvalue_, table_="IO", mode_="Demand"):
+            self, filename, psector_, cvalue_, table_="IO", mode_="Demand",
+            solver_="LU", precision_="float64"):
+        self._init_attributes(table_, mode_, solver_, precision_)
+        self._read_io_table(filename)
+        self._prepare()
+        self._create_perturbation(psector_, cvalue_)
+
+    @classmethod
+    def from_arrays(
+            cls, sectors, table, xoutput=None, psector_=None, cvalue_=None,
+            table_="IO", mode_="Demand", solver_="LU", precision_="float64",
+            copy_arrays=True):
+        """Create IIM from sector labels and NumPy arrays.
+
+        If table_ is "IO", table is the industry*industry input-output
+        table and xoutput the as-planned production per sector. If table_
+        is "A", table is the interdependency matrix. The table may be a
+        SciPy sparse matrix. If copy_arrays is false, arrays of the right
+        type (e.g. memory-mapped tables from iim.reader) are used as is
+        and become read-only.
+        """
+        model = cls.__new__(cls)
+        model._init_attributes(table_, mode_, solver_, precision_)
+        model.sectors = SectorIndex(sectors)
+        if scipy.sparse.issparse(table):
+            model.io_table = scipy.sparse.csr_matrix(
+                table, dtype=model.dtype, copy=copy_arrays)
+        else:
+            asarray = np.array if copy_arrays else np.asarray
+            model.io_table = asarray(table, dtype=model.dtype)
+        n = len(model.sectors)
+        if model.io_table.shape != (n, n):
+            raise RuntimeError("table must be a %d x %d matrix" % (n, n))
+        if table_ == "IO":
+            if xoutput is None:
+                raise RuntimeError("xoutput is required for I/O tables")
+            asarray = np.array if copy_arrays else np.asarray
+            model.xoutput = asarray(xoutput, dtype=model.dtype)
+            if model.xoutput.shape != (n,):
+                raise RuntimeError("xoutput must have %d elements" % n)
+        model._prepare()
+        model._create_perturbation(psector_, cvalue_)
+        return model
+
+    @classmethod
+    def _from_prepared(
+            cls, sectors, io_table, xoutput, amat, astar, solver,
+            table_="IO", mode_="Demand", solver_="LU", precision_="float64"):
+        # Create unperturbed IIM from already prepared model matrices and
+        # S matrix solver (used when loading cached models).
+        model = cls.__new__(cls)
+        model._init_attributes(table_, mode_, solver_, precision_)
+        model.sectors = SectorIndex(sectors)
+        model.io_table = io_table
+        model.xoutput = xoutput
+        model.amat = amat
+        model.astar = astar
+        model.solver = solver
+        model._powers = iim_nthorder.InterdependencyPowers(astar)
+        model._create_perturbation([], [])
+        return model
+
+    def with_perturbation(self, psector_, cvalue_):
+        """Return view of the model with a new perturbation.
+
+        The view shares the prepared matrices and the S matrix solver
+        with this model; only the perturbation vector is new. This model
+        is not changed.
+        """
+        model = copy.copy(self)
+        model._create_perturbation(psector_, cvalue_)
+        return model
+
+    def _init_attributes(self, table_, mode_, solver_, precision_):
         self.sectors = []      # list of sectors
         self.io_table = []     # industry*industry input-output table
         self.xoutput = []      # as-planned production per sector
         self.amat = []         # Leontief technical coefficients
         self.astar = []        # interdependency matrix
-        self.smat = []         # S matrix
+        self.solver = None     # solver backend for the S matrix
         self.cstar = []        # degradation in demand/supply
         self.psector = []      # list of perturbed sectors
         self.cvalue = []       # list of perturbations
         self.table = table_    # type of input table
         self.mode = mode_      # type of calculation mode
-
-        self._read_io_table(filename)
-        self._create_perturbation(psector_, cvalue_)
-        self._tech_coeff_matrix()
-        self._interdepenency_matrix()
+        self.solver_type = solver_  # type of S matrix solver
+        self.refactor_type = solver_  # solver for refactorizing S
+        self.sparse = solver_ in iim_solver.SPARSE_SOLVERS  # sparse storage
+        self.precision = precision_  # floating-point precision of storage
+        if precision_ not in PRECISIONS:
+            raise RuntimeError("unknown precision: %s" % precision_)
+        self.dtype = PRECISIONS[precision_]
+        if self.dtype != np.float64 and \
+                solver_ not in iim_solver.SINGLE_PRECISION_SOLVERS:
+            raise RuntimeError(
+                "solver %s does not support %s" % (solver_, precision_))
+        self._index_cache = {}      # cached dependency/influence indices
+        self._qstar = None          # cached inoperability
+        self._powers = None         # memoized powers of A*
+        self.read_stats = None      # parse statistics of input table
+        self.max_update_rank = 32   # refactorize S beyond this update rank
+        self.drift_tol = 1.0e-8     # refactorize S beyond this residual
+        self.drift = 0.0            # relative residual of updated S solver
+        self.refactorizations = 0   # number of refactorizations of S
 
     def __len__(self):
         """Return number of sectors."""
         return len(self.sectors)
 
+    @property
+    def smat(self):
+        """Return the S matrix."""
+        return self.solver.matrix()
+
+    @iim_profile.profiled("iim.read_io_table", _table_sizes)
     def _read_io_table(self, filename):
-        # Read I/O table or A* matrix from CSV file.
+        # Read I/O table or A* matrix from CSV file. The table is parsed
+        # in chunks straight into its final storage (see iim.reader).
         #
         # Note:
         #  If I/O table is provided, last row must provide total output.
         #
-        df = pd.read_csv(filename)
-        self.io_table = np.array(df.values, dtype=float)  # df.to_numpy()
-        self.sectors = df.columns.str.strip()
-        if self.table == "IO":
-            self.xoutput = self.io_table[-1, :]
-            self.io_table = self.io_table[:-1, :]
+        sectors, self.io_table, self.xoutput, self.read_stats = \
+            iim_reader.read_io_table(
+                filename, self.table, self.dtype, self.sparse)
+        self.sectors = SectorIndex(sectors)
+
+    def _prepare(self):
+        # Build the model matrices and freeze them so that they can be
+        # shared safely between perturbation views.
+        if self.sparse and not scipy.sparse.issparse(self.io_table):
+            self.io_table = scipy.sparse.csr_matrix(self.io_table)
+        elif not self.sparse and scipy.sparse.issparse(self.io_table):
+            self.io_table = self.io_table.toarray()
+        self._tech_coeff_matrix()
+        self._interdepenency_matrix()
+        for arr in [self.io_table, self.xoutput, self.amat, self.astar]:
+            if isinstance(arr, np.ndarray):
+                arr.flags.writeable = False
+        self._powers = iim_nthorder.InterdependencyPowers(self.astar)
 
     def _create_perturbation(self, psector_, cvalue_):
         n = len(self.sectors)
@@ -77,9 +228,11 @@ class IIM:
             for ps, cs in zip(psector_, cvalue_):
                 indx = self.sectors.get_loc(ps)
                 self.cstar[indx] = cs
+        self._qstar = None
         self.psector = psector_
         self.cvalue = cvalue_
 
+    @iim_profile.profiled("iim.tech_coeff", _amat_sizes)
     def _tech_coeff_matrix(self):
         # Calculate Leontief technical coefficients matrix (A) from I-O table.
         #
@@ -87,18 +240,29 @@ class IIM:
         #   Santos & Haimes (2004), eq. 2.
         #
         n = len(self.sectors)
-        self.amat = np.zeros(shape=(n, n))
+        if self.sparse:
+            self.amat = scipy.sparse.csr_matrix((n, n))
+            if self.table == "IO":
+                xinv = scipy.sparse.diags(self._inverse_xoutput())
+                self.amat = scipy.sparse.csr_matrix(self.io_table @ xinv)
+            return
+        self.amat = np.zeros(shape=(n, n), dtype=self.dtype)
         if self.table == "IO":  # industry*industry input-output table provided
-            for i in range(n):
-                for j in range(n):
-                    if self.xoutput[j] != 0.0:
-                        self.amat[i, j] = self.io_table[i, j] / self.xoutput[j]
-                    else:
-                        self.amat[i, j] = 0.0
-    
+            # Sectors with zero output are masked out and keep a_ij = 0.
+            nz = self.xoutput != 0.0
+            self.amat[:, nz] = self.io_table[:, nz] / self.xoutput[nz]
+
+    def _inverse_xoutput(self):
+        # Return 1/x with zero for sectors with zero output.
+        xinv = np.zeros(len(self.sectors))
+        nz = self.xoutput != 0.0
+        xinv[nz] = 1.0 / self.xoutput[nz]
+        return xinv
+
+    @iim_profile.profiled("iim.interdependency", _model_sizes)
     def _interdepenency_matrix(self):
         # Calculate demand-driven or supply-driven interdependency matrix 
-        # and the S matrix from technical coefficients.
+        # from technical coefficients and set up the S matrix solver.
         #
         # Algorithm:
         #  Santos & Haimes (2004), eq. 28. (A* matrix)
@@ -106,13 +270,23 @@ class IIM:
         #  Setola et al. (2009), eq. 7. (S matrix)
         #
         n = len(self.sectors)
-        self.astar = np.zeros(shape=(n, n))
+        if self.sparse:
+            if self.table != "IO":  # interdependency matrix provided
+                self.astar = self.io_table
+            elif self.mode == "Supply":
+                self.astar = scipy.sparse.csr_matrix(self.amat.T)
+            else:
+                xinv = scipy.sparse.diags(self._inverse_xoutput())
+                self.astar = scipy.sparse.csr_matrix(xinv @ self.io_table)
+            self.solver = iim_solver.create_solver(
+                self.astar, self.solver_type)
+            return
+        self.astar = np.zeros(shape=(n, n), dtype=self.dtype)
         if self.mode == "Supply":   
             if self.table == "IO":
                 self.astar = np.transpose(self.amat)  # Leung (2007), p. 301
             else:  # interdependency matrix is provided as input
                 self.astar = self.io_table 
-            self.smat = np.linalg.inv(np.identity(n) - self.astar)
         else:  # demand-driven 
             if self.table == "IO":
                 # The algorithm:
@@ -120,25 +294,55 @@ class IIM:
                 #   pinv = np.linalg.inv(pmat)
                 #   self.astar = np.matmul(self.amat, pmat)
                 #   self.astar = np.matmul(pinv, self.astar)
-                # may create singular matrix if x_i == 0. 
-                for i in range(n):
-                    for j in range(n):
-                        if self.xoutput[i] != 0.0:
-                            self.astar[i, j] = \
-                                self.io_table[i, j] / self.xoutput[i]
+                # may create singular matrix if x_i == 0. Rows with zero
+                # output are therefore masked out and keep a*_ij = 0.
+                nz = self.xoutput != 0.0
+                self.astar[nz, :] = \
+                    self.io_table[nz, :] / self.xoutput[nz, np.newaxis]
             else:  # interdependency matrix provided
                 self.astar = self.io_table
-            self.smat = np.linalg.inv(np.identity(n) - self.astar)
+        self.solver = iim_solver.create_solver(self.astar, self.solver_type)
+
+    def _sector_indices(self):
+        # Return cached inoperability, dependency and influence vectors.
+        #
+        # Note:
+        #   The dependency and influence indices depend only on the
+        #   prepared model and are shared between perturbation views, 
+        #   while the inoperability is cached per perturbation.
+        #
+        if not self._index_cache:
+            self._index_cache["delta"] = self.dependency()
+            self._index_cache["delta_overall"] = self.overall_dependency()
+            self._index_cache["rho"] = self.influence()
+            self._index_cache["rho_overall"] = self.overall_influence()
+        if self._qstar is None:
+            self._qstar = self.inoperability()
+        return [self._qstar,
+                self._index_cache["delta"],
+                self._index_cache["delta_overall"],
+                self._index_cache["rho"],
+                self._index_cache["rho_overall"]]
+
+    def clear_cache(self):
+        """Clear cached inoperability, dependency and influence vectors."""
+        self._index_cache = {}
+        self._qstar = None
 
     def get(self, isector):
         """Return data for the i'th sector."""
         indx = self.sectors.get_loc(isector)
-        di = self.dependency()[indx]
-        odi = self.overall_dependency()[indx]
-        rj = self.influence()[indx]
-        orj = self.overall_influence()[indx]
-        qi = self.inoperability()[indx]
-        return [qi, di, odi, rj, orj]
+        return [float(v[indx]) for v in self._sector_indices()]
+
+    def get_many(self, sectors=None):
+        """Return data for several sectors (default all) as a DataFrame."""
+        columns = ["q", "delta", "delta_overall", "rho", "rho_overall"]
+        import pandas as pd  # only needed here; keeps CLI startup fast
+        df = pd.DataFrame(dict(zip(columns, self._sector_indices())),
+                          index=list(self.sectors))
+        if sectors is not None:
+            df = df.loc[sectors]
+        return df
 
     def get_sectors(self):
         """Return list of sectors."""
@@ -156,11 +360,13 @@ class IIM:
         """Return as-planned production per sector."""
         return self.xoutput
 
+    @iim_profile.profiled("iim.dependency", _model_sizes)
     def dependency(self):
         """Calculate dependency index."""
         #
         # Algorithm:
         #   Setola et al. (2009), eq. 3.
+        #   Off-diagonal row sums of A* are computed as A*1 - diag(A*).
         #
         # Note:
         #   Only defined for demand-driven IIM.
@@ -168,19 +374,17 @@ class IIM:
         n = len(self.sectors)
         delta = np.zeros(n)
         if self.mode == "Demand":  
-            for i in range(n):
-                di = 0.0
-                for j in range(n):
-                    if j != i:
-                        di += self.astar[i, j]
-                delta[i] = di
+            delta = np.asarray(self.astar.sum(axis=1, dtype=float)).ravel() - \
+                self.astar.diagonal()
         return delta / (n - 1.0)
 
+    @iim_profile.profiled("iim.influence", _model_sizes)
     def influence(self):
         """Calculate influence gain."""
         #
         # Algorithm:
         #   Setola et al. (2009), eq. 4.
+        #   Off-diagonal column sums of A* are computed as 1^T A* - diag(A*).
         #
         # Note:
         #   Only defined for demand-driven IIM.
@@ -188,19 +392,24 @@ class IIM:
         n = len(self.sectors)
         rho = np.zeros(n)
         if self.mode == "Demand":  
-            for j in range(n):
-                rj = 0.0
-                for i in range(n):
-                    if i != j:
-                        rj += self.astar[i, j]
-                rho[j] = rj
+            rho = np.asarray(self.astar.sum(axis=0, dtype=float)).ravel() - \
+                self.astar.diagonal()
         return rho / (n - 1.0)
 
+    @iim_profile.profiled("iim.overall_dependency", _model_sizes)
     def overall_dependency(self):
-        """Calculate overall dependency index."""
+        """Calculate overall dependency index.
+
+        Needs the diagonal of S, which costs n solves with the S matrix
+        solver (O(n^3) with dense LU factors) unless the solver stores S
+        or is a low-rank update. The diagonal is cached by the solver.
+        The Krylov and Neumann solvers raise RuntimeError for more than
+        max_diagonal_size sectors.
+        """
         #
         # Algorithm:
         #   Setola et al. (2009), eq. 9.
+        #   Off-diagonal row sums of S are computed as S*1 - diag(S).
         # 
         # Note:
         #   Only defined for demand-driven IIM.
@@ -208,19 +417,23 @@ class IIM:
         n = len(self.sectors)
         delta = np.zeros(n)
         if self.mode == "Demand": 
-            for i in range(n):
-                di = 0.0
-                for j in range(n):
-                    if j != i:
-                        di += self.smat[i, j]
-                delta[i] = di
+            delta = self.solver.solve(np.ones(n)) - self.solver.diagonal()
         return delta / (n - 1.0)
 
+    @iim_profile.profiled("iim.overall_influence", _model_sizes)
     def overall_influence(self):
-        """Calculate influence gain."""
+        """Calculate overall influence gain.
+
+        Needs the diagonal of S, which costs n solves with the S matrix
+        solver (O(n^3) with dense LU factors) unless the solver stores S
+        or is a low-rank update. The diagonal is cached by the solver.
+        The Krylov and Neumann solvers raise RuntimeError for more than
+        max_diagonal_size sectors.
+        """
         #
         # Algorithm:
         #   Setola et al. (2009), eq. 10.
+        #   Off-diagonal column sums of S are computed as S^T*1 - diag(S).
         # 
         # Note:
         #   Only defined for demand-driven IIM.
@@ -228,32 +441,33 @@ class IIM:
         n = len(self.sectors)
         rho = np.zeros(n)
         if self.mode == "Demand":  
-            for j in range(n):
-                rj = 0.0
-                for i in range(n):
-                    if i != j:
-                        rj += self.smat[i, j]
-                rho[j] = rj
+            rho = self.solver.solve_transpose(np.ones(n)) - \
+                self.solver.diagonal()
         return rho / (n - 1.0)
 
     def interdependency_index(self, isector, jsector, order=1):
         """Return n-th order interdependency index between two sectors."""
         i = self.sectors.get_loc(isector)
         j = self.sectors.get_loc(jsector)
-        amat = np.linalg.matrix_power(self.astar, order)
-        return amat[i, j]
+        return self._powers.power(order)[i, j]
 
     def max_nth_order_interdependency(self, n):
         """Return maximum nth-order interdependency index for each sector."""
-        assert n >= 1
-        amat = np.linalg.matrix_power(self.astar, n)
+        return self.top_nth_order_interdependency(n, 1)
+
+    @iim_profile.profiled("iim.top_nth_order", _model_sizes)
+    def top_nth_order_interdependency(self, n, k=1):
+        """Return the k largest nth-order interdependency indices for each
+        sector as rows of [sector_i, sector_j, a_ij], sorted by decreasing
+        a_ij within each sector."""
+        indx, vals = self._powers.top_k(n, k)
         res = []
         for i in range(len(self.sectors)):
-            j = np.argmax(amat[i, :], axis=0)
-            tmp = [self.sectors[i], self.sectors[j], amat[i, j]]
-            res.append(tmp)
+            for j, aij in zip(indx[i], vals[i]):
+                res.append([self.sectors[i], self.sectors[j], aij])
         return res
 
+    @iim_profile.profiled("iim.inoperability", _model_sizes)
     def inoperability(self):
         """Calculate overall risk of inoperability of the infrastructures."""
         #
@@ -261,6 +475,318 @@ class IIM:
         #   Haimes & Jiang (2001), eq. 14.
         #   Haimes et al. (2005), eq. 38.
         #
-        q = np.matmul(self.smat, self.cstar)
+        q = self.solver.solve(self.cstar)
         q[q > 1.0] = 1.0  # upper limit
         return q
+
+    def inoperability_gradient(self, weights=None):
+        """Return gradient of the objective w^T q with respect to A*.
+
+        Element (i, j) of the returned (sectors x sectors) array is the
+        derivative of sum_k w_k q_k with respect to a*_ij. The weights w
+        default to ones, i.e. the total inoperability. Sectors at the
+        upper limit q = 1 do not contribute to the objective's gradient.
+        """
+        #
+        # Algorithm:
+        #   dq/da*_ij = S[:, i] q_j, since dS = S dA* S. Hence the gradient
+        #   of w^T q is the outer product of S^T w and q, obtained with one
+        #   extra (transposed) solve.
+        #
+        lam, q = self._gradient_factors(weights)
+        return np.outer(lam, q)
+
+    def top_sensitivities(self, k=10, weights=None, nonzero=False,
+                          block_size=1024):
+        """Return the k A* coefficients with the largest absolute gradient
+        of the objective w^T q as rows of [sector_i, sector_j, a*_ij,
+        gradient], sorted by decreasing absolute gradient.
+
+        If nonzero is true, only non-zero coefficients of A* are ranked.
+        The gradient matrix is never materialized.
+        """
+        #
+        # Algorithm:
+        #   |g_ij| = |lam_i| |q_j| is a rank-one product, so its k largest
+        #   elements are found among the k largest |lam_i| times the k
+        #   largest |q_j|. If only non-zero coefficients are ranked, A* is
+        #   scanned in blocks of rows, keeping the k best candidates.
+        #
+        lam, q = self._gradient_factors(weights)
+        n = len(self.sectors)
+        k = min(k, n * n)
+        if nonzero:
+            rows, cols = self._top_nonzero_gradients(lam, q, k, block_size)
+        else:
+            ilam = _top_indices(np.abs(lam), k)
+            iq = _top_indices(np.abs(q), k)
+            grad = np.abs(np.outer(lam[ilam], q[iq])).ravel()
+            best = _top_indices(grad, k)
+            rows, cols = ilam[best // len(iq)], iq[best % len(iq)]
+        grad = lam[rows] * q[cols]
+        order = np.argsort(-np.abs(grad), kind="stable")
+        res = []
+        for i, j, gij in zip(rows[order], cols[order], grad[order]):
+            res.append([self.sectors[i], self.sectors[j],
+                        float(self.astar[i, j]), float(gij)])
+        return res
+
+    def _gradient_factors(self, weights):
+        # Return S^T w and the unclipped inoperability q = S c*, with the
+        # weights of sectors at the upper limit set to zero.
+        q = self.solver.solve(self.cstar)
+        if weights is None:
+            weights = np.ones(len(q))
+        w = np.where(q < 1.0, np.asarray(weights, dtype=float), 0.0)
+        return self.solver.solve_transpose(w), q
+
+    def _top_nonzero_gradients(self, lam, q, k, block_size):
+        # Return row and column indices of the k largest |lam_i q_j| over
+        # the non-zero elements of A*.
+        rows = np.zeros(0, dtype=np.int64)
+        cols = np.zeros(0, dtype=np.int64)
+        vals = np.zeros(0)
+        for r in range(0, len(lam), block_size):
+            block = self.astar[r:r + block_size]
+            if scipy.sparse.issparse(block):
+                bi, bj = block.nonzero()
+            else:
+                bi, bj = np.nonzero(np.asarray(block))
+            bi = bi + r
+            rows = np.concatenate([rows, bi])
+            cols = np.concatenate([cols, bj])
+            vals = np.concatenate([vals, np.abs(lam[bi] * q[bj])])
+            best = _top_indices(vals, k)
+            rows, cols, vals = rows[best], cols[best], vals[best]
+        return rows, cols
+
+    def update_interdependency(self, isector, jsector, aij):
+        """Return model with the interdependency a*_ij between two sectors
+        set to aij (see low_rank_update())."""
+        i = self.sectors.get_loc(isector)
+        j = self.sectors.get_loc(jsector)
+        n = len(self.sectors)
+        u = np.zeros(n)
+        v = np.zeros(n)
+        u[i] = 1.0
+        v[j] = aij - self.astar[i, j]
+        return self.low_rank_update(u, v)
+
+    def update_interdependency_row(self, isector, values):
+        """Return model with the row of A* for a sector set to values."""
+        i = self.sectors.get_loc(isector)
+        u = np.zeros(len(self.sectors))
+        u[i] = 1.0
+        return self.low_rank_update(u, np.asarray(values, dtype=float) -
+                                    self._astar_vector(i, 0))
+
+    def update_interdependency_column(self, jsector, values):
+        """Return model with the column of A* for a sector set to values."""
+        j = self.sectors.get_loc(jsector)
+        v = np.zeros(len(self.sectors))
+        v[j] = 1.0
+        return self.low_rank_update(np.asarray(values, dtype=float) -
+                                    self._astar_vector(j, 1), v)
+
+    @iim_profile.profiled("iim.low_rank_update", _model_sizes)
+    def low_rank_update(self, u, v):
+        """Return model with the rank-k change U V^T added to A*.
+
+        U and V are (sectors x k) arrays, or vectors for k = 1. Like
+        with_perturbation(), the returned model has the perturbation of
+        this model, which is not changed. Its A* is a new matrix, and its
+        S matrix solver wraps the solver of this model using the Woodbury
+        identity at the cost of 2k solves with the shared factorization.
+        If the accumulated rank exceeds max_update_rank or the relative
+        residual of the updated solver (drift) exceeds drift_tol, S is
+        refactorized from the new A*. The I/O table and the A matrix are
+        not changed.
+        """
+        n = len(self.sectors)
+        u = np.asarray(u, dtype=float).reshape(n, -1)
+        v = np.asarray(v, dtype=float).reshape(n, -1)
+        model = copy.copy(self)
+        model.astar = self._updated_astar(u, v)
+        if isinstance(self.solver, iim_solver.LowRankUpdateSolver):
+            solver = self.solver.update(u, v)
+        else:
+            solver = iim_solver.LowRankUpdateSolver(self.solver, u, v)
+        model.drift = model._solver_residual(solver) \
+            if solver.rank <= self.max_update_rank else np.inf
+        if model.drift > self.drift_tol:
+            solver = iim_solver.create_solver(model.astar,
+                                              self.refactor_type)
+            model.drift = 0.0
+            model.refactorizations += 1
+        model.solver = solver
+        model._powers = iim_nthorder.InterdependencyPowers(model.astar)
+        model.clear_cache()
+        return model
+
+    def _astar_vector(self, k, axis):
+        # Return row (axis = 0) or column (axis = 1) k of A* as a vector.
+        vec = self.astar[k, :] if axis == 0 else self.astar[:, k]
+        if scipy.sparse.issparse(vec):
+            vec = vec.toarray()
+        return np.asarray(vec, dtype=float).ravel()
+
+    def _updated_astar(self, u, v):
+        # Return copy of A* with U V^T added. A* itself is shared with
+        # perturbation views and the solver and is never modified.
+        delta = scipy.sparse.csr_matrix(u) @ scipy.sparse.csr_matrix(v).T
+        if scipy.sparse.issparse(self.astar):
+            astar = scipy.sparse.csr_matrix(self.astar + delta,
+                                            dtype=self.dtype)
+            astar.eliminate_zeros()
+            return astar
+        astar = np.array(self.astar)
+        delta = delta.tocoo()
+        np.add.at(astar, (delta.row, delta.col), delta.data)
+        astar.flags.writeable = False
+        return astar
+
+    def _solver_residual(self, solver):
+        # Return relative residual max|b - (I - A*) x| / max|b| of S b = x
+        # for b = (1, ..., 1).
+        b = np.ones(len(self.sectors))
+        x = solver.solve(b)
+        return np.abs(b - x + self.astar @ x).max()
+
+    def propagation(self, tol=1.0e-10, max_order=1000):
+        """Return order-by-order decomposition of the inoperability.
+
+        Row k of the returned (orders x sectors) array is the k'th order
+        contribution A*^k c* to the unclipped inoperability, with row 0
+        being the direct perturbation. Terms are added until the largest
+        element of a term is at most tol or max_order is reached.
+        """
+        #
+        # Algorithm:
+        #   Neumann series q = S c* = sum_k A*^k c*, which converges since
+        #   the spectral radius of A* is less than one. Each term is 
+        #   obtained from the previous one by a single matrix-vector product.
+        #
+        term = self.cstar.copy()
+        terms = [term]
+        for _ in range(max_order):
+            if np.abs(term).max(initial=0.0) <= tol:
+                break
+            term = self.astar @ term
+            terms.append(term)
+        return np.array(terms)
+
+    @iim_profile.profiled("iim.key_sector_sweep", _model_sizes)
+    def key_sector_sweep(self, magnitudes=(1.0,), block_size=512):
+        """Return ranking of sectors perturbed one at a time.
+
+        Each sector j is perturbed alone with c* = magnitude * e_j for each
+        of the given magnitudes. Returns rows of [sector, magnitude, q_tot,
+        q_max, sector_max], where q_tot is the total and q_max the largest
+        inoperability (in sector_max) after clipping. Rows are sorted by
+        magnitude and then by decreasing q_tot.
+        """
+        #
+        # Algorithm:
+        #   The unclipped inoperability of c* = m e_j is m S[:, j], so the
+        #   sweep over all sectors needs the columns of S only, obtained in
+        #   blocks of block_size columns by one batched solve each. The
+        #   clipping is applied to each block for all magnitudes at once.
+        #
+        n = len(self.sectors)
+        mags = np.asarray(magnitudes, dtype=float)
+        qtot = np.zeros((len(mags), n))
+        qmax = np.zeros((len(mags), n))
+        imax = np.zeros((len(mags), n), dtype=np.int64)
+        for k in range(0, n, block_size):
+            m = min(block_size, n - k)
+            if isinstance(self.solver, iim_solver.InverseSolver):
+                cols = self.solver.matrix()[:, k:k + m]
+            else:
+                rhs = np.zeros(shape=(n, m))
+                rhs[k:k + m, :] = np.identity(m)
+                cols = self.solver.solve(rhs)
+            q = np.minimum(mags[:, np.newaxis, np.newaxis] * cols, 1.0)
+            qtot[:, k:k + m] = q.sum(axis=1)
+            imax[:, k:k + m] = np.argmax(q, axis=1)
+            qmax[:, k:k + m] = np.take_along_axis(
+                q, imax[:, np.newaxis, k:k + m], axis=1)[:, 0, :]
+        res = []
+        for i, mag in enumerate(mags):
+            for j in np.argsort(-qtot[i], kind="stable"):
+                res.append([self.sectors[j], float(mag), float(qtot[i, j]),
+                            float(qmax[i, j]), self.sectors[imax[i, j]]])
+        return res
+
+    def perturbation_batch(self, psectors, cvalues):
+        """Return sparse (scenarios x sectors) perturbation matrix.
+
+        Row k holds the perturbation given by the perturbed sectors
+        psectors[k] and the corresponding values cvalues[k].
+        """
+        rows = []
+        cols = []
+        vals = []
+        for k, (psector_, cvalue_) in enumerate(zip(psectors, cvalues)):
+            if len(psector_) != len(cvalue_):
+                raise RuntimeError("psector and cvalue have different sizes")
+            for ps, cs in zip(psector_, cvalue_):
+                rows.append(k)
+                cols.append(self.sectors.get_loc(ps))
+                vals.append(cs)
+        shape = (len(psectors), len(self.sectors))
+        return scipy.sparse.csr_matrix((vals, (rows, cols)), shape=shape)
+
+    def iter_inoperability_batch(self, cstar, chunk_size=1024):
+        """Yield inoperability for chunks of perturbation vectors.
+
+        The perturbations are given as a (scenarios x sectors) dense array
+        or sparse matrix. Each chunk of at most chunk_size scenarios is
+        solved with a single multiple right-hand side solve and yielded as
+        a dense (chunk x sectors) array.
+        """
+        #
+        # Algorithm:
+        #   Q^T = S C^T, with the upper limit q <= 1.0 applied in place.
+        #
+        n = len(self.sectors)
+        if scipy.sparse.issparse(cstar):
+            cstar = scipy.sparse.csr_matrix(cstar)
+        else:
+            cstar = np.atleast_2d(np.asarray(cstar, dtype=float))
+        if cstar.ndim != 2 or cstar.shape[1] != n:
+            raise RuntimeError("perturbation batch must have %d columns" % n)
+        nscen = cstar.shape[0]
+        chunk_size = max(1, int(chunk_size))
+        for k in range(0, nscen, chunk_size):
+            cchunk = cstar[k:k + chunk_size]
+            if scipy.sparse.issparse(cchunk):
+                cchunk = cchunk.toarray()
+            q = np.transpose(self.solver.solve(np.transpose(cchunk)))
+            np.minimum(q, 1.0, out=q)  # upper limit
+            yield q
+
+    @iim_profile.profiled("iim.inoperability_batch", _model_sizes)
+    def inoperability_batch(self, cstar, chunk_size=None):
+        """Calculate inoperability for a batch of perturbation vectors.
+
+        Returns a (scenarios x sectors) array with one inoperability
+        vector per row of cstar. If chunk_size is given, the scenarios are
+        solved in chunks of that size to bound the size of the work arrays.
+        """
+        nscen = cstar.shape[0] if scipy.sparse.issparse(cstar) \
+            else np.atleast_2d(np.asarray(cstar)).shape[0]
+        q = np.zeros(shape=(nscen, len(self.sectors)))
+        if chunk_size is None:
+            chunk_size = max(nscen, 1)
+        k = 0
+        for qchunk in self.iter_inoperability_batch(cstar, chunk_size):
+            q[k:k + len(qchunk), :] = qchunk
+            k += len(qchunk)
+        return q
+
+
+def _top_indices(x, k):
+    # Return indices of the k largest elements of x (unordered).
+    if k >= len(x):
+        return np.arange(len(x))
+    return np.argpartition(-x, k - 1)[:k]
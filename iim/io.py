@@ -4,10 +4,22 @@
 # LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
 # and conditions.
 
-"""Module providing I/O methods for IIM."""
+"""Module providing I/O methods for IIM.
 
+Results can be printed as a fixed-width text table or written in the
+machine-readable CSV, JSON and NPZ formats. Matplotlib is only imported
+by the plotting functions when they are called, so the text output
+functions load quickly.
+"""
+
+import csv
+import json
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
+
+# Per-sector result vectors, in output order.
+RESULT_FIELDS = ["q", "delta", "delta_overall", "rho", "rho_overall"]
 
 
 def print_header(mode):
@@ -34,8 +46,216 @@ def print_results(psector, iim_model, txt):
     print("q_tot = %.3f" % iim_model.inoperability().sum())
 
 
+def collect_results(model, mode=None):
+    """Return dict with perturbation, sectors and results of IIM model."""
+    return {"mode": mode if mode is not None else model.mode,
+            "psector": list(model.psector or []),
+            "cvalue": [float(c) for c in (model.cvalue or [])],
+            "sectors": [str(s) for s in model.get_sectors()],
+            "q": model.inoperability(),
+            "delta": model.dependency(),
+            "delta_overall": model.overall_dependency(),
+            "rho": model.influence(),
+            "rho_overall": model.overall_influence()}
+
+
+def write_results(results, fmt, filename=None):
+    """Write IIM results in CSV, JSON or NPZ format.
+
+    CSV and JSON are written to standard output if no filename is given.
+    """
+    if fmt == "npz":
+        if filename is None:
+            raise RuntimeError("NPZ output requires an output file")
+        np.savez(filename, sectors=np.array(results["sectors"], dtype=str),
+                 psector=np.array(results["psector"], dtype=str),
+                 cvalue=np.array(results["cvalue"], dtype=float),
+                 mode=np.array(results["mode"]),
+                 **{k: np.asarray(results[k]) for k in RESULT_FIELDS})
+        return
+    fout = open(filename, "w", newline="") if filename else sys.stdout
+    try:
+        if fmt == "csv":
+            writer = csv.writer(fout, dialect="excel")
+            writer.writerow(["Sector"] + RESULT_FIELDS)
+            columns = [results[k] for k in RESULT_FIELDS]
+            for i, sector in enumerate(results["sectors"]):
+                writer.writerow(
+                    [sector] + [repr(float(c[i])) for c in columns])
+        elif fmt == "json":
+            data = dict(results)
+            for k in RESULT_FIELDS:
+                data[k] = [float(v) for v in results[k]]
+            json.dump(data, fout)
+            fout.write("\n")
+        else:
+            raise RuntimeError("unknown output format: %s" % fmt)
+    finally:
+        if filename:
+            fout.close()
+
+
+def read_results(filename):
+    """Read IIM results written by write_results.
+
+    The format is given by the file extension (.csv, .json or .npz).
+    Returns a dict with the sectors and the result vectors as arrays;
+    the perturbation and mode are only available from JSON and NPZ.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".npz":
+        with np.load(filename) as data:
+            res = {k: data[k] for k in RESULT_FIELDS}
+            res["sectors"] = [str(s) for s in data["sectors"]]
+            res["psector"] = [str(s) for s in data["psector"]]
+            res["cvalue"] = list(data["cvalue"])
+            res["mode"] = str(data["mode"])
+        return res
+    if ext == ".json":
+        with open(filename) as fin:
+            res = json.load(fin)
+        for k in RESULT_FIELDS:
+            res[k] = np.array(res[k], dtype=float)
+        return res
+    if ext == ".csv":
+        with open(filename, newline="") as fin:
+            reader = csv.reader(fin)
+            header = next(reader)
+            rows = [row for row in reader if row]
+        res = {"sectors": [row[0] for row in rows]}
+        values = np.array([row[1:] for row in rows], dtype=float)
+        values = values.reshape(len(rows), len(header) - 1)
+        for j, k in enumerate(header[1:]):
+            res[k] = values[:, j]
+        return res
+    raise RuntimeError("unknown results format: %s" % filename)
+
+
+def read_scenarios(filename):
+    """Read named scenarios from CSV or JSONL file.
+
+    CSV files have the columns scenario, sector and cvalue, with one row
+    per perturbed sector. JSONL files have one object per line of the form
+    {"name": name, "cvalue": {sector: cvalue, ...}}. Returns a list of
+    (name, psector, cvalue) tuples in file order.
+    """
+    scenarios = {}
+    ext = os.path.splitext(filename)[1].lower()
+    with open(filename, newline="") as fin:
+        if ext == ".jsonl":
+            for line in fin:
+                if line.strip():
+                    data = json.loads(line)
+                    cmap = scenarios.setdefault(str(data["name"]), {})
+                    for ps, cs in data["cvalue"].items():
+                        cmap[ps.strip()] = float(cs)
+        elif ext == ".csv":
+            reader = csv.reader(fin)
+            header = [h.strip() for h in next(reader)]
+            if header != ["scenario", "sector", "cvalue"]:
+                raise RuntimeError(
+                    "scenario file must have columns scenario,sector,cvalue")
+            for row in reader:
+                if row:
+                    cmap = scenarios.setdefault(row[0].strip(), {})
+                    cmap[row[1].strip()] = float(row[2])
+        else:
+            raise RuntimeError("unknown scenario format: %s" % filename)
+    return [(name, list(cmap), list(cmap.values()))
+            for name, cmap in scenarios.items()]
+
+
+def write_batch_results(results, fmt, filename=None):
+    """Write results of several scenarios in CSV, JSON or NPZ format.
+
+    The inoperability is a (sectors x scenarios) array with one column
+    per scenario, written after the indices as in scripts/iim_collect.py.
+    CSV and JSON are written to standard output if no filename is given.
+    """
+    indices = RESULT_FIELDS[1:]
+    if fmt == "npz":
+        if filename is None:
+            raise RuntimeError("NPZ output requires an output file")
+        np.savez(filename, sectors=np.array(results["sectors"], dtype=str),
+                 scenarios=np.array(results["scenarios"], dtype=str),
+                 mode=np.array(results["mode"]),
+                 **{k: np.asarray(results[k]) for k in RESULT_FIELDS})
+        return
+    fout = open(filename, "w", newline="") if filename else sys.stdout
+    try:
+        if fmt == "csv":
+            writer = csv.writer(fout, dialect="excel")
+            writer.writerow(["Sector"] + indices + results["scenarios"])
+            q = results["q"]
+            for i, sector in enumerate(results["sectors"]):
+                writer.writerow(
+                    [sector] + [repr(float(results[k][i])) for k in indices] +
+                    [repr(float(v)) for v in q[i, :]])
+        elif fmt == "json":
+            data = dict(results)
+            for k in indices:
+                data[k] = [float(v) for v in results[k]]
+            data["q"] = np.asarray(results["q"]).tolist()
+            json.dump(data, fout)
+            fout.write("\n")
+        else:
+            raise RuntimeError("unknown output format: %s" % fmt)
+    finally:
+        if filename:
+            fout.close()
+
+
+SWEEP_FIELDS = ["sector", "magnitude", "q_tot", "q_max", "sector_max"]
+
+
+def print_sweep(rows):
+    """Print ranked key-sector sweep as fixed-width text table."""
+    print("\nRank\tSector\t\tMagnitude\tq_tot\t\tq_max\t\tSector(max)")
+    print(90 * "-")
+    rank = 0
+    magnitude = None
+    for sector, mag, qtot, qmax, smax in rows:
+        rank = rank + 1 if mag == magnitude else 1
+        magnitude = mag
+        print("%-4d\t%-8s\t%8.6f\t%8.6f\t%8.6f\t%s"
+              % (rank, sector, mag, qtot, qmax, smax))
+
+
+def write_sweep(rows, fmt, filename=None):
+    """Write ranked key-sector sweep in CSV, JSON or NPZ format.
+
+    CSV and JSON are written to standard output if no filename is given.
+    """
+    columns = [[row[k] for row in rows] for k in range(len(SWEEP_FIELDS))]
+    if fmt == "npz":
+        if filename is None:
+            raise RuntimeError("NPZ output requires an output file")
+        np.savez(filename, **{k: np.array(c, dtype=str if k.startswith(
+            "sector") else float) for k, c in zip(SWEEP_FIELDS, columns)})
+        return
+    fout = open(filename, "w", newline="") if filename else sys.stdout
+    try:
+        if fmt == "csv":
+            writer = csv.writer(fout, dialect="excel")
+            writer.writerow(SWEEP_FIELDS)
+            for sector, mag, qtot, qmax, smax in rows:
+                writer.writerow([sector, repr(mag), repr(qtot), repr(qmax),
+                                 smax])
+        elif fmt == "json":
+            json.dump({k: [str(v) if k.startswith("sector") else v
+                           for v in c]
+                       for k, c in zip(SWEEP_FIELDS, columns)}, fout)
+            fout.write("\n")
+        else:
+            raise RuntimeError("unknown output format: %s" % fmt)
+    finally:
+        if filename:
+            fout.close()
+
+
 def plot(xdata, ydata, xlabel=None, ylabel=None, title=None):
     """Helper function for creating IIM plots."""
+    import matplotlib.pyplot as plt
     _, ax = plt.subplots(figsize=(15,5))
     ax.bar(xdata, ydata)
     ax.yaxis.grid(color='gray', linestyle='dashed')
@@ -48,6 +268,7 @@ def plot(xdata, ydata, xlabel=None, ylabel=None, title=None):
 def plot_group(xtick_labels, y1, y2, 
                xlabel=None, ylabel=None, legend=None, title=None):
     """Helper function for creating grouped IIM plots."""
+    import matplotlib.pyplot as plt
     _, ax = plt.subplots(figsize=(15,5))
     ax.yaxis.grid(color='gray', linestyle='dashed')
 
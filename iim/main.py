@@ -7,8 +7,10 @@
 """This is main for IIM."""
 
 import argparse
+import contextlib
 import iim.io as iim_io
 import iim.iim as iim
+import iim.profile as iim_profile
 
 
 def _restricted_float(x):
@@ -23,11 +25,25 @@ def _restricted_float(x):
     return x
 
 
-def _check_input(psector, cvalue):
-    if len(psector) != len(cvalue):
+def _check_input(psector, cvalue, scenarios=None, sweep=None):
+    if scenarios is not None and sweep is not None:
+        raise RuntimeError("--scenarios and --sweep cannot be combined")
+    if scenarios is not None and (psector or cvalue):
+        raise RuntimeError("--scenarios and -s/-c cannot be combined")
+    if scenarios is None and sweep is None and not psector:
+        raise RuntimeError("either -s/-c, --scenarios or --sweep is required")
+    if len(psector or []) != len(cvalue or []):
         raise RuntimeError("psector and cvalue have different sizes")
 
 
+def _check_scenarios(scenarios):
+    for name, _, cvalue in scenarios:
+        for cs in cvalue:
+            if cs < 0.0 or cs > 1.0:
+                raise RuntimeError("scenario %s: %r not in range [0.0, 1.0]"
+                                   % (name, cs))
+
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -40,14 +56,29 @@ def parse_arguments():
     parser.add_argument("-s", "--sector",
                         action="append",
                         dest="psector",
-                        required=True,
+                        required=False,
                         help="name of perturbed sector")
     parser.add_argument("-c", "--cvalue",
                         action="append",
                         dest="cvalue",
-                        required=True,
+                        required=False,
                         type=_restricted_float,
                         help="fraction of perturbation [0-1]")
+    parser.add_argument("--scenarios",
+                        action="store",
+                        dest="scenarios",
+                        default=None,
+                        required=False,
+                        help="CSV or JSONL file of named perturbations")
+    parser.add_argument("--sweep",
+                        action="store",
+                        dest="sweep",
+                        nargs="+",
+                        type=_restricted_float,
+                        default=None,
+                        required=False,
+                        help="rank sectors perturbed one at a time with "
+                             "the given fractions of perturbation [0-1]")
     parser.add_argument("-t", "--table",
                         action="store",
                         dest="table",
@@ -62,21 +93,135 @@ def parse_arguments():
                         default="Demand",
                         required=False,
                         help="calculation mode")
+    parser.add_argument("--cache",
+                        action="store",
+                        dest="cache",
+                        default=None,
+                        required=False,
+                        help="directory for cache of prepared models")
+    parser.add_argument("--solver",
+                        action="store",
+                        dest="solver",
+                        choices=["LU", "Inverse", "SparseLU", "Krylov",
+                                 "Neumann"],
+                        default="LU",
+                        required=False,
+                        help="solver for the S matrix")
+    parser.add_argument("--precision",
+                        action="store",
+                        dest="precision",
+                        choices=["float64", "float32"],
+                        default="float64",
+                        required=False,
+                        help="floating-point precision of model matrices")
+    parser.add_argument("--format",
+                        action="store",
+                        dest="format",
+                        choices=["text", "csv", "json", "npz"],
+                        default="text",
+                        required=False,
+                        help="output format")
+    parser.add_argument("-o", "--output",
+                        action="store",
+                        dest="output",
+                        default=None,
+                        required=False,
+                        help="name of output file (default: stdout)")
+    parser.add_argument("--profile",
+                        action="store",
+                        dest="profile",
+                        default=None,
+                        required=False,
+                        help="write profiling spans as JSON to file")
     args = parser.parse_args()
-    _check_input(args.psector, args.cvalue)
+    _check_input(args.psector, args.cvalue, args.scenarios, args.sweep)
+    args.psector = args.psector or []
+    args.cvalue = args.cvalue or []
     return args
 
 
 def main():
     """Driver for IIM solver."""
     args = parse_arguments()
+    with iim_profile.profiling(args.profile):
+        with iim_profile.span("main.model"):
+            model = load_model(args)
+        with iim_profile.span("main.output"):
+            write_output(model, args)
+
+
+def load_model(args):
+    """Return IIM model for the command line arguments."""
+    if args.cache:
+        import iim.cache as iim_cache  # not needed without --cache
+        return iim_cache.ModelCache(args.cache).get(
+            args.filename, args.psector, args.cvalue, args.table, args.mode,
+            args.solver, args.precision)
+    return iim.IIM(
+        args.filename, args.psector, args.cvalue, args.table, args.mode,
+        args.solver, args.precision)
+
+
+def write_output(model, args):
+    """Evaluate model and write results for the command line arguments."""
+    if args.scenarios:
+        run_scenarios(model, args)
+    elif args.sweep:
+        run_sweep(model, args)
+    elif args.format != "text":
+        iim_io.write_results(
+            iim_io.collect_results(model), args.format, args.output)
+    elif args.output:
+        with open(args.output, "w") as fout:
+            with contextlib.redirect_stdout(fout):
+                print_text_results(model, args)
+    else:
+        print_text_results(model, args)
+
+
+def run_scenarios(model, args):
+    """Evaluate all scenarios of the scenario file in one batched solve."""
+    scenarios = iim_io.read_scenarios(args.scenarios)
+    _check_scenarios(scenarios)
+    names = [name for name, _, _ in scenarios]
+    cstar = model.perturbation_batch([ps for _, ps, _ in scenarios],
+                                     [cs for _, _, cs in scenarios])
+    results = iim_io.collect_results(model)
+    results["q"] = model.inoperability_batch(cstar).T
+    results["scenarios"] = names
+    del results["psector"], results["cvalue"]
+    fmt = "csv" if args.format == "text" else args.format
+    iim_io.write_batch_results(results, fmt, args.output)
+
+
+def run_sweep(model, args):
+    """Rank all sectors perturbed one at a time."""
+    rows = model.key_sector_sweep(args.sweep)
+    if args.format != "text":
+        iim_io.write_sweep(rows, args.format, args.output)
+    elif args.output:
+        with open(args.output, "w") as fout:
+            with contextlib.redirect_stdout(fout):
+                print_text_sweep(rows, args)
+    else:
+        print_text_sweep(rows, args)
+
+
+def print_text_sweep(rows, args):
+    """Print key-sector sweep as fixed-width text table."""
     if args.mode == "Supply":
         iim_io.print_header("Supply-Driven")
     else:
         iim_io.print_header("Demand-Driven")
+    iim_io.print_sweep(rows)
+
 
-    model = iim.IIM(
-        args.filename, args.psector, args.cvalue, args.table, args.mode)
+def print_text_results(model, args):
+    """Print results as fixed-width text table."""
+    if args.mode == "Supply":
+        iim_io.print_header("Supply-Driven")
+    else:
+        iim_io.print_header("Demand-Driven")
 
     sectors = model.get_sectors()
     delta = model.dependency()
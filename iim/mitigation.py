@@ -0,0 +1,232 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing budget-constrained mitigation of IIM inoperability.
+
+The objective is the weighted inoperability w^T min(S c*, 1). Mitigation
+reduces the perturbation c* of sectors or hardens links by lowering
+coefficients of A*. Candidates are ranked with the gradient of the
+objective, which for c* is S^T w and for a*_ij is (S^T w)_i q_j, so all
+candidates are scored with two solves and vectorized products. Applied
+link changes update the S matrix solver with low-rank updates; the model
+is never rebuilt.
+"""
+
+import numpy as np
+
+
+class MitigationResult:
+    """Class holding the result of a mitigation optimization."""
+    def __init__(self, objective0, cstar):
+        self.objective0 = objective0  # objective without mitigation
+        self.objective = objective0   # objective with mitigation
+        self.cstar = cstar            # mitigated perturbation
+        self.reduction = np.zeros(len(cstar))  # reduction of c*
+        self.cost = 0.0               # total cost of mitigation
+        self.selected = []            # selected candidates, in order
+        self.history = [objective0]   # objective after each selection
+        self.model = None             # mitigated model (greedy only)
+
+    def improvement(self):
+        """Return reduction of the objective."""
+        return self.objective0 - self.objective
+
+
+class MitigationOptimizer:
+    """Class providing mitigation of inoperability within a budget.
+
+    The weights w of the objective w^T q default to ones, i.e. the total
+    inoperability. The model is not modified.
+    """
+    def __init__(self, model, weights=None):
+        self.model = model
+        n = len(model)
+        self.weights = np.ones(n) if weights is None \
+            else np.asarray(weights, dtype=float)
+        if self.weights.shape != (n,):
+            raise RuntimeError("weights must have %d elements" % n)
+
+    def objective(self, cstar=None, model=None):
+        """Return weighted inoperability for perturbation cstar."""
+        model = self.model if model is None else model
+        cstar = model.cstar if cstar is None else cstar
+        q = np.minimum(model.solver.solve(cstar), 1.0)
+        return float(self.weights @ q)
+
+    def _gradient(self, model, cstar):
+        # Return unclipped q = S c* and lam = S^T w, with zero weights for
+        # sectors at the upper limit.
+        q = model.solver.solve(cstar)
+        w = np.where(q < 1.0, self.weights, 0.0)
+        return q, model.solver.solve_transpose(w)
+
+    def greedy(self, budget, cstar_candidates=(), link_candidates=()):
+        """Select interventions greedily by objective reduction per cost.
+
+        Candidates reducing the perturbation are given as (sector,
+        reduction, cost) and candidates hardening links as (sector_i,
+        sector_j, a*_ij, cost), where a*_ij is the new interdependency.
+        In each step the affordable candidate with the largest estimated
+        reduction per cost is applied, and the objective and its gradient
+        are updated. Returns a MitigationResult, where selected holds
+        ("cstar", index) or ("link", index) items.
+        """
+        #
+        # Algorithm:
+        #   Reductions of c* are linear in q, so their estimated reduction
+        #   lam_j * delta_j is exact unless the set of clipped sectors
+        #   changes. For links the first-order estimate -lam_i q_j da*_ij
+        #   is used; the applied change is exact (low-rank update of S).
+        #
+        model = self.model.with_perturbation(
+            self.model.psector, self.model.cvalue)
+        sectors = model.sectors
+        cstar = model.cstar.copy()
+        cidx = np.array([sectors.get_loc(c[0]) for c in cstar_candidates],
+                        dtype=np.int64)
+        cdelta = np.array([c[1] for c in cstar_candidates], dtype=float)
+        ccost = np.array([c[2] for c in cstar_candidates], dtype=float)
+        li = np.array([sectors.get_loc(c[0]) for c in link_candidates],
+                      dtype=np.int64)
+        lj = np.array([sectors.get_loc(c[1]) for c in link_candidates],
+                      dtype=np.int64)
+        lnew = np.array([c[2] for c in link_candidates], dtype=float)
+        lcost = np.array([c[3] for c in link_candidates], dtype=float)
+        if np.any(ccost <= 0.0) or np.any(lcost <= 0.0):
+            raise RuntimeError("candidate costs must be positive")
+        cused = np.zeros(len(cidx), dtype=bool)
+        lused = np.zeros(len(li), dtype=bool)
+
+        q, lam = self._gradient(model, cstar)
+        result = MitigationResult(self.objective(cstar, model), cstar)
+        lold = np.zeros(len(li))
+        remaining = float(budget)
+        while True:
+            cgain = lam[cidx] * np.minimum(cdelta, cstar[cidx])
+            cgain[cused | (ccost > remaining)] = 0.0
+            if len(li):
+                lold = np.asarray(model.astar[li, lj], dtype=float).ravel()
+            lgain = lam[li] * q[lj] * (lold - lnew)
+            lgain[lused | (lcost > remaining)] = 0.0
+            cratio = cgain / ccost if len(cidx) else np.zeros(0)
+            lratio = lgain / lcost if len(li) else np.zeros(0)
+            cbest = cratio.max(initial=0.0)
+            lbest = lratio.max(initial=0.0)
+            if max(cbest, lbest) <= 0.0:
+                break
+            if cbest >= lbest:
+                k = int(np.argmax(cratio))
+                cstar[cidx[k]] = max(cstar[cidx[k]] - cdelta[k], 0.0)
+                cused[k] = True
+                remaining -= ccost[k]
+                result.cost += ccost[k]
+                result.selected.append(("cstar", k))
+            else:
+                k = int(np.argmax(lratio))
+                model = model.update_interdependency(
+                    sectors[li[k]], sectors[lj[k]], lnew[k])
+                lused[k] = True
+                remaining -= lcost[k]
+                result.cost += lcost[k]
+                result.selected.append(("link", k))
+            q, lam = self._gradient(model, cstar)
+            result.history.append(float(
+                self.weights @ np.minimum(q, 1.0)))
+        result.objective = result.history[-1]
+        result.reduction = model.cstar - cstar
+        result.cstar = cstar
+        psector = list(model.psector or [])
+        result.model = model.with_perturbation(
+            psector, [float(cstar[sectors.get_loc(ps)]) for ps in psector])
+        return result
+
+    def allocate(self, costs, budget, max_reduction=None, method="lp",
+                 maxiter=200, tol=1.0e-10):
+        """Return continuous reductions of c* within the budget.
+
+        Reducing c*_j by r_j costs costs[j] * r_j, with 0 <= r_j <=
+        max_reduction[j] (default c*_j). Method "lp" solves the linear
+        program obtained from the gradient at c*, which is exact if no
+        sector is clipped; with a single budget constraint it is solved
+        in closed form as a fractional knapsack problem. Method "pgd"
+        refines the LP allocation with projected gradient iterations on
+        the clipped objective. Returns a MitigationResult.
+        """
+        model = self.model
+        n = len(model)
+        costs = np.broadcast_to(np.asarray(costs, dtype=float), (n,))
+        if np.any(costs <= 0.0):
+            raise RuntimeError("costs must be positive")
+        upper = model.cstar.copy() if max_reduction is None else \
+            np.minimum(np.asarray(max_reduction, dtype=float), model.cstar)
+        if method not in ["lp", "pgd"]:
+            raise RuntimeError("unknown method: %s" % method)
+
+        _, lam = self._gradient(model, model.cstar)
+        red = _knapsack(lam / costs, costs, upper, budget)
+        if method == "pgd":
+            red = self._projected_gradient(red, costs, upper, budget,
+                                           maxiter, tol)
+        cstar = model.cstar - red
+        result = MitigationResult(self.objective(), cstar)
+        result.objective = self.objective(cstar)
+        result.history.append(result.objective)
+        result.cost = float(costs @ red)
+        result.reduction = red
+        return result
+
+    def _projected_gradient(self, red, costs, upper, budget, maxiter, tol):
+        #
+        # Algorithm:
+        #   Projected gradient descent with backtracking line search on
+        #   f(r) = w^T min(S (c* - r), 1), projecting onto the box and
+        #   budget constraints by bisection on the budget multiplier.
+        #
+        cstar = self.model.cstar
+        fval = self.objective(cstar - red)
+        step = 1.0
+        for _ in range(maxiter):
+            _, lam = self._gradient(self.model, cstar - red)
+            while step > 1.0e-12:
+                trial = _project(red + step * lam, costs, upper, budget)
+                ftrial = self.objective(cstar - trial)
+                if ftrial < fval - tol:
+                    break
+                step *= 0.5
+            else:
+                break
+            red, fval = trial, ftrial
+            step *= 2.0
+        return red
+
+
+def _knapsack(ratio, costs, upper, budget):
+    # Return solution of max sum ratio_j costs_j r_j subject to
+    # costs^T r <= budget and 0 <= r <= upper (fractional knapsack).
+    red = np.zeros(len(ratio))
+    remaining = float(budget)
+    for j in np.argsort(-ratio, kind="stable"):
+        if ratio[j] <= 0.0 or remaining <= 0.0:
+            break
+        red[j] = min(upper[j], remaining / costs[j])
+        remaining -= costs[j] * red[j]
+    return red
+
+
+def _project(y, costs, upper, budget, tol=1.0e-12):
+    # Return Euclidean projection of y onto {0 <= r <= upper,
+    # costs^T r <= budget}.
+    r = np.clip(y, 0.0, upper)
+    if costs @ r <= budget:
+        return r
+    low, high = 0.0, np.max(np.maximum(y, 0.0) / costs)
+    while high - low > tol * max(high, 1.0):
+        tau = 0.5 * (low + high)
+        if costs @ np.clip(y - tau * costs, 0.0, upper) > budget:
+            low = tau
+        else:
+            high = tau
+    return np.clip(y - high * costs, 0.0, upper)
@@ -0,0 +1,199 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing Monte Carlo uncertainty analysis for IIM.
+
+Uncertain perturbations c* and multiplicative noise on the A* matrix are
+sampled and the resulting inoperability is accumulated online per sector
+(mean, standard deviation, histogram based percentiles and exceedance
+probabilities), so that the individual draws are never stored. Draws
+are split into tasks with independent, reproducible random streams and
+can be run on a process pool.
+"""
+
+import concurrent.futures
+import numpy as np
+import scipy.sparse
+import iim.solver as iim_solver
+
+
+class UniformPerturbation:
+    """Perturbation c* sampled uniformly in [low, high] per sector."""
+    def __init__(self, low, high):
+        self.low = np.asarray(low, dtype=float)    # lower bound of c*
+        self.high = np.asarray(high, dtype=float)  # upper bound of c*
+
+    def __call__(self, rng, size):
+        """Return (size x sectors) array of sampled perturbations."""
+        n = np.broadcast(self.low, self.high).shape[-1]
+        return rng.uniform(self.low, self.high, size=(size, n))
+
+
+class MonteCarloResult:
+    """Class holding online statistics of sampled inoperability."""
+    def __init__(self, sectors, nbins, thresholds):
+        n = len(sectors)
+        self.sectors = sectors     # list of sectors
+        self.ndraws = 0            # number of draws
+        self.mean = np.zeros(n)    # mean inoperability
+        self.m2 = np.zeros(n)      # sum of squared deviations from mean
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.exceed = np.zeros((len(self.thresholds), n), dtype=np.int64)
+        self.hist = np.zeros((n, nbins), dtype=np.int64)  # q histogram
+
+    def add(self, q):
+        """Add (draws x sectors) array of inoperability samples."""
+        #
+        # Algorithm:
+        #   Chan, T. F., Golub, G. H. & LeVeque, R. J. (1979), pairwise
+        #   update of mean and sum of squared deviations.
+        #
+        nb = q.shape[0]
+        if nb == 0:
+            return
+        mean_b = q.mean(axis=0)
+        m2_b = ((q - mean_b)**2).sum(axis=0)
+        self._merge(nb, mean_b, m2_b)
+        for k, t in enumerate(self.thresholds):
+            self.exceed[k, :] += (q > t).sum(axis=0)
+        n, nbins = self.hist.shape
+        indx = np.clip((q * nbins).astype(np.int64), 0, nbins - 1)
+        indx += np.arange(n) * nbins
+        self.hist += np.bincount(
+            indx.ravel(), minlength=n * nbins).reshape(n, nbins)
+
+    def merge(self, other):
+        """Merge statistics from another result."""
+        if other.ndraws == 0:
+            return
+        self._merge(other.ndraws, other.mean, other.m2)
+        self.exceed += other.exceed
+        self.hist += other.hist
+
+    def _merge(self, nb, mean_b, m2_b):
+        na = self.ndraws
+        ntot = na + nb
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * nb / ntot
+        self.m2 = self.m2 + m2_b + delta**2 * na * nb / ntot
+        self.ndraws = ntot
+
+    def std(self):
+        """Return sample standard deviation of inoperability."""
+        if self.ndraws < 2:
+            return np.zeros(len(self.mean))
+        return np.sqrt(self.m2 / (self.ndraws - 1.0))
+
+    def percentile(self, p):
+        """Return p'th percentile of inoperability per sector.
+
+        The percentile is interpolated linearly within histogram bins on
+        [0, 1], giving an accuracy of the order of 1/nbins.
+        """
+        n, nbins = self.hist.shape
+        cdf = np.cumsum(self.hist, axis=1)
+        target = p / 100.0 * self.ndraws
+        k = np.minimum((cdf < target).sum(axis=1), nbins - 1)
+        rows = np.arange(n)
+        below = np.where(k > 0, cdf[rows, k - 1], 0)
+        count = self.hist[rows, k]
+        frac = np.divide(target - below, count,
+                         out=np.zeros(n), where=count > 0)
+        return (k + np.clip(frac, 0.0, 1.0)) / nbins
+
+    def exceedance(self):
+        """Return (thresholds x sectors) array of P(q > threshold)."""
+        return self.exceed / max(self.ndraws, 1)
+
+
+class MonteCarlo:
+    """Class providing Monte Carlo sampling of IIM inoperability.
+
+    If perturbation is None, the perturbation of the model is used for
+    every draw. If astar_sigma is positive, each draw multiplies the
+    elements of A* by lognormal noise with unit mean and log-standard
+    deviation astar_sigma; otherwise the factorization of the model is
+    reused for all draws.
+    """
+    def __init__(self, model, perturbation=None, astar_sigma=0.0,
+                 nbins=1000, thresholds=(0.01, 0.1, 0.5)):
+        self.model = model                # prepared IIM model
+        self.perturbation = perturbation  # sampler of c*
+        self.astar_sigma = astar_sigma    # noise on A*
+        self.nbins = nbins                # histogram bins on [0, 1]
+        self.thresholds = thresholds      # exceedance thresholds
+
+    def run(self, ndraws, nproc=1, seed=None, chunk_size=10000):
+        """Run ndraws samples and return a MonteCarloResult.
+
+        The draws are split into tasks of chunk_size samples, each with
+        its own random stream spawned from seed, so the result does not
+        depend on the number of processes.
+        """
+        ntasks = -(-ndraws // chunk_size) if ndraws > 0 else 0
+        sizes = [min(chunk_size, ndraws - k * chunk_size)
+                 for k in range(ntasks)]
+        seeds = np.random.SeedSequence(seed).spawn(ntasks)
+        result = self._new_result()
+        if nproc == 1:
+            for size, ss in zip(sizes, seeds):
+                result.merge(self._run_task(size, ss))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=nproc, initializer=_init_worker,
+                    initargs=(self,)) as pool:
+                for res in pool.map(_run_worker_task, sizes, seeds):
+                    result.merge(res)
+        return result
+
+    def _new_result(self):
+        return MonteCarloResult(
+            self.model.get_sectors(), self.nbins, self.thresholds)
+
+    def _sample_cstar(self, rng, size):
+        if self.perturbation is None:
+            return np.tile(self.model.cstar, (size, 1))
+        return self.perturbation(rng, size)
+
+    def _run_task(self, size, seed_seq):
+        rng = np.random.default_rng(seed_seq)
+        result = self._new_result()
+        cstar = self._sample_cstar(rng, size)
+        if self.astar_sigma > 0.0:
+            q = np.zeros(cstar.shape)
+            for k in range(size):
+                solver = iim_solver.create_solver(
+                    self._sample_astar(rng), self.model.refactor_type)
+                q[k, :] = solver.solve(cstar[k, :])
+            np.minimum(q, 1.0, out=q)  # upper limit
+            result.add(q)
+        else:
+            for q in self.model.iter_inoperability_batch(cstar):
+                result.add(q)
+        return result
+
+    def _sample_astar(self, rng):
+        # Multiply A* by lognormal noise with unit mean.
+        sigma = self.astar_sigma
+        astar = self.model.astar
+        if scipy.sparse.issparse(astar):
+            astar = scipy.sparse.csr_matrix(astar, copy=True)
+            astar.data *= rng.lognormal(
+                -0.5 * sigma**2, sigma, size=astar.data.shape)
+            return astar
+        return astar * rng.lognormal(-0.5 * sigma**2, sigma, size=astar.shape)
+
+
+_worker_engine = None  # MonteCarlo engine in pool worker
+
+
+def _init_worker(engine):
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _run_worker_task(size, seed_seq):
+    return _worker_engine._run_task(size, seed_seq)
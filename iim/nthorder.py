@@ -0,0 +1,94 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing incremental n-th order interdependency analysis.
+
+The n-th order interdependency indices are the elements of A*^n
+(Setola et al., 2009). Powers are computed incrementally, A*^k =
+A*^(k-1) A*, starting from the highest power already available, and
+memoized under a memory budget.
+"""
+
+import numpy as np
+import scipy.sparse
+
+
+def _nbytes(mat):
+    # Return number of bytes used by a dense or sparse matrix.
+    if scipy.sparse.issparse(mat):
+        mat = scipy.sparse.csr_matrix(mat)
+        return mat.data.nbytes + mat.indices.nbytes + mat.indptr.nbytes
+    return mat.nbytes
+
+
+class InterdependencyPowers:
+    """Class providing memoized powers of the A* matrix."""
+    def __init__(self, astar, max_bytes=512 * 1024**2, block_size=1024):
+        self.astar = astar            # interdependency matrix
+        self.max_bytes = max_bytes    # memory budget for memoized powers
+        self.block_size = block_size  # rows per block in top-k selection
+        self._powers = {1: astar}     # memoized powers
+        self._last = (1, astar)       # most recently computed power
+
+    def cached_orders(self):
+        """Return list of memoized orders."""
+        return sorted(self._powers)
+
+    def power(self, order):
+        """Return A*^order."""
+        if order < 1:
+            raise RuntimeError("order must be at least 1")
+        if order in self._powers:
+            return self._powers[order]
+        if self._last[0] == order:
+            return self._last[1]
+        candidates = [(j, m) for j, m in self._powers.items() if j < order]
+        if self._last[0] < order:
+            candidates.append(self._last)
+        k, amat = max(candidates, key=lambda item: item[0])
+        while k < order:
+            amat = amat @ self.astar
+            k += 1
+            self._memoize(k, amat)
+        self._last = (k, amat)
+        return amat
+
+    def _memoize(self, order, amat):
+        used = sum(_nbytes(m) for j, m in self._powers.items() if j > 1)
+        if used + _nbytes(amat) <= self.max_bytes:
+            self._powers[order] = amat
+
+    def iter_powers(self, max_order):
+        """Yield (order, A*^order) for orders 1 to max_order."""
+        for k in range(1, max_order + 1):
+            yield k, self.power(k)
+
+    def top_k(self, order, k=1):
+        """Return indices and values of the k largest elements per row.
+
+        Returns two (sectors x k) arrays with column indices and values
+        of A*^order, sorted by decreasing value. For k = 1 ties are
+        resolved by the lowest column index.
+        """
+        amat = self.power(order)
+        n = amat.shape[0]
+        k = min(k, amat.shape[1])
+        indx = np.zeros((n, k), dtype=np.int64)
+        vals = np.zeros((n, k))
+        for r in range(0, n, self.block_size):
+            rows = amat[r:r + self.block_size]
+            if scipy.sparse.issparse(rows):
+                rows = rows.toarray()
+            rows = np.asarray(rows)
+            if k == 1:
+                part = np.argmax(rows, axis=1)[:, np.newaxis]
+            else:
+                part = np.argpartition(-rows, k - 1, axis=1)[:, :k]
+            pvals = np.take_along_axis(rows, part, axis=1)
+            rank = np.argsort(-pvals, axis=1, kind="stable")
+            indx[r:r + len(rows)] = np.take_along_axis(part, rank, axis=1)
+            vals[r:r + len(rows)] = np.take_along_axis(pvals, rank, axis=1)
+        return indx, vals
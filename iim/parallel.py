@@ -0,0 +1,221 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing parallel execution of IIM scenarios on a process pool.
+
+The A* matrix and the arrays of the S matrix solver (LU factorization or
+S) of a prepared model are copied once into shared memory; the iterative
+solvers need A* only. The workers
+attach to these arrays without copying and restore the solver from them,
+so only the tasks and their results are pickled. Results are returned in
+task order, with a bounded number of tasks in flight.
+"""
+
+import collections
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+import numpy as np
+import scipy.sparse
+import iim.iim as iim
+import iim.solver as iim_solver
+
+
+# Solvers restored in the workers from shared arrays without refactorizing
+# I - A*. SuperLU factors (SparseLU) cannot be rebuilt from their arrays.
+SHARED_SOLVERS = (iim_solver.InverseSolver, iim_solver.LUSolver,
+                  iim_solver.KrylovSolver, iim_solver.NeumannSolver)
+
+
+class SharedArrays:
+    """Class holding NumPy arrays copied into shared memory."""
+    def __init__(self, arrays):
+        self.spec = {}  # name -> (shared memory name, shape, dtype, order)
+        self._shm = []
+        try:
+            for name, arr in arrays.items():
+                arr = np.asarray(arr)
+                shm = shared_memory.SharedMemory(
+                    create=True, size=max(arr.nbytes, 1))
+                self._shm.append(shm)
+                # Keep the memory layout, e.g. Fortran order of LU factors.
+                order = "F" if arr.flags.f_contiguous and \
+                    not arr.flags.c_contiguous else "C"
+                view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf,
+                                  order=order)
+                view[...] = arr
+                del view
+                self.spec[name] = (shm.name, arr.shape, arr.dtype.str, order)
+        except Exception:
+            self.close()
+            raise
+
+    def nbytes(self):
+        """Return total size of the shared arrays in bytes."""
+        return sum(shm.size for shm in self._shm)
+
+    def close(self):
+        """Release and remove the shared memory blocks."""
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
+
+
+def attach_arrays(spec):
+    """Attach to arrays in shared memory described by SharedArrays.spec.
+
+    Returns (arrays, handles), where arrays are read-only views and the
+    shared memory handles must be kept alive as long as the views are used.
+    """
+    arrays = {}
+    handles = []
+    for name, (shm_name, shape, dtype, order) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf,
+                         order=order)
+        arr.setflags(write=False)
+        arrays[name] = arr
+    return arrays, handles
+
+
+def inoperability_task(model, task):
+    """Return inoperability for task given as (psector, cvalue)."""
+    psector_, cvalue_ = task
+    return model.with_perturbation(psector_, cvalue_).inoperability()
+
+
+class ParallelRunner:
+    """Class providing parallel evaluation of tasks on a prepared IIM model.
+
+    Each task is evaluated as func(model, task) in a worker process, where
+    func must be a picklable (module level) function and model is an
+    unperturbed IIM sharing A* and the S matrix solver with the parent
+    model. The I/O table, as-planned output and A matrix are not shared.
+    Only the solvers in SHARED_SOLVERS can be shared with the workers;
+    other solvers (SparseLU, low-rank updates) raise RuntimeError for
+    more than one process.
+    Use as a context manager, or call close() to release the workers and
+    the shared memory.
+    """
+    def __init__(self, model, nproc=None, max_pending=None, chunk_size=1):
+        self.model = model
+        self.nproc = nproc or os.cpu_count() or 1  # number of processes
+        # Maximum number of chunks in flight, bounding the memory held by
+        # queued tasks and unconsumed results.
+        self.max_pending = max_pending or 2 * self.nproc
+        self.chunk_size = chunk_size  # tasks per worker call
+        self._shared = None
+        self._pool = None
+        if self.nproc > 1:
+            self._start()
+
+    def _start(self):
+        if not isinstance(self.model.solver, SHARED_SOLVERS):
+            raise RuntimeError(
+                "%s cannot be shared with worker processes; use the LU, "
+                "Inverse, Krylov or Neumann solver"
+                % type(self.model.solver).__name__)
+        arrays, meta = _model_arrays(self.model)
+        self._shared = SharedArrays(arrays)
+        try:
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.nproc, initializer=_init_worker,
+                initargs=(self._shared.spec, meta))
+        except Exception:
+            self._shared.close()
+            raise
+
+    def close(self):
+        """Shut down the workers and release the shared memory."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def imap(self, func, tasks):
+        """Yield func(model, task) for each task, in task order."""
+        if self._pool is None:
+            for task in tasks:
+                yield func(self.model, task)
+            return
+        pending = collections.deque()
+        for chunk in _iter_chunks(tasks, self.chunk_size):
+            pending.append(self._pool.submit(_run_worker_chunk, func, chunk))
+            if len(pending) >= self.max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def map(self, func, tasks):
+        """Return list of func(model, task) for all tasks."""
+        return list(self.imap(func, tasks))
+
+
+def _model_arrays(model):
+    # Return arrays to share and metadata needed to restore the model.
+    arrays = {}
+    astar = model.astar
+    if scipy.sparse.issparse(astar):
+        astar = scipy.sparse.csr_matrix(astar)
+        for part in ["data", "indices", "indptr"]:
+            arrays["astar." + part] = getattr(astar, part)
+    else:
+        arrays["astar"] = astar
+    for name, arr in model.solver.state().items():
+        arrays["solver." + name] = arr
+    meta = {"sectors": [str(s) for s in model.get_sectors()],
+            "shape": astar.shape,
+            "table": model.table,
+            "mode": model.mode,
+            "solver": model.solver_type,
+            "precision": model.precision}
+    return arrays, meta
+
+
+def _iter_chunks(tasks, chunk_size):
+    chunk = []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_worker_model = None    # IIM model in pool worker
+_worker_handles = None  # shared memory handles kept alive in pool worker
+
+
+def _init_worker(spec, meta):
+    global _worker_model, _worker_handles
+    arrays, _worker_handles = attach_arrays(spec)
+    if "astar" in arrays:
+        astar = arrays["astar"]
+    else:
+        astar = scipy.sparse.csr_matrix(
+            (arrays["astar.data"], arrays["astar.indices"],
+             arrays["astar.indptr"]), shape=tuple(meta["shape"]))
+    state = {name[len("solver."):]: arr for name, arr in arrays.items()
+             if name.startswith("solver.")}
+    solver = iim_solver.restore_solver(astar, state, meta["solver"])
+    _worker_model = iim.IIM._from_prepared(
+        meta["sectors"], [], [], [], astar, solver, meta["table"],
+        meta["mode"], meta["solver"], meta["precision"])
+
+
+def _run_worker_chunk(func, chunk):
+    return [func(_worker_model, task) for task in chunk]
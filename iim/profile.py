@@ -0,0 +1,221 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing lightweight profiling of the IIM pipeline.
+
+Code is instrumented with named spans, either with the profiled()
+decorator or the span() context manager. A finished span records its
+wall and CPU time, the peak memory allocated within it (if tracemalloc
+is tracing, from Python 3.9) and matrix sizes, and is passed to every
+registered hook as a dict. Without hooks, spans are no-ops costing one
+function call.
+
+Profiler is a hook collecting the spans of a run, e.g.
+
+    with Profiler() as prof:
+        model = iim.IIM("examples/ssb_io.csv", ["RD"], [0.1])
+        model.inoperability()
+    prof.write("profile.json")
+"""
+
+import contextlib
+import functools
+import json
+import threading
+import time
+import tracemalloc
+
+_hooks = []                 # functions called with each finished span
+_local = threading.local()  # stack of open spans per thread
+
+# Peak memory per span needs tracemalloc.reset_peak() (Python 3.9).
+_RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+
+def add_hook(hook):
+    """Register function called with the record of each finished span."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """Unregister hook added with add_hook()."""
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def enabled():
+    """Return true if spans are recorded."""
+    return bool(_hooks)
+
+
+class _NullSpan:
+    # Span used when profiling is disabled.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    # Span recording time, memory and attributes of a block of code.
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.peak = 0  # highest traced memory seen by nested spans
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.tracing = _RESET_PEAK and tracemalloc.is_tracing()
+        if self.tracing:
+            mem, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                # Keep the peak of the parent before it is reset.
+                self.parent.peak = max(self.parent.peak, peak)
+            self.mem0 = mem
+            tracemalloc.reset_peak()
+        self.cpu0 = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu0
+        _local.stack.pop()
+        record = {"name": self.name,
+                  "parent": self.parent.name if self.parent else None,
+                  "depth": len(_local.stack),
+                  "start": self.start,
+                  "wall": wall,
+                  "cpu": cpu,
+                  "bytes": None,
+                  "attrs": self.attrs}
+        if self.tracing:
+            peak = max(tracemalloc.get_traced_memory()[1], self.peak)
+            record["bytes"] = peak - self.mem0
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+        for hook in list(_hooks):
+            hook(record)
+        return False
+
+
+def span(name, **attrs):
+    """Return context manager recording a span named name."""
+    if not _hooks:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+
+def profiled(name, sizes=None):
+    """Decorator recording each call as a span named name.
+
+    If given, sizes(*args, **kwargs) is called after the call to return
+    a dict of matrix sizes for the span; it is not evaluated when
+    profiling is disabled.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+            with _Span(name, {}) as sp:
+                res = func(*args, **kwargs)
+                if sizes is not None:
+                    sp.set(**sizes(*args, **kwargs))
+            return res
+        return wrapper
+    return decorator
+
+
+def matrix_sizes(mat):
+    """Return dict with shape and number of stored elements of matrix."""
+    shape = list(mat.shape) if hasattr(mat, "shape") else [len(mat)]
+    nnz = getattr(mat, "nnz", None)
+    if nnz is None:
+        nnz = 1
+        for dim in shape:
+            nnz *= dim
+    return {"shape": shape, "nnz": int(nnz)}
+
+
+class Profiler:
+    """Class collecting spans while used as a context manager.
+
+    If memory is true, tracemalloc is started (unless already tracing)
+    so that spans record the peak memory allocated within them.
+    """
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.spans = []  # records of finished spans
+        self._started = False
+
+    def __call__(self, record):
+        self.spans.append(record)
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc):
+        remove_hook(self)
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+        return False
+
+    def summary(self):
+        """Return rows of [name, calls, wall, cpu, max bytes] per span
+        name, sorted by decreasing total wall time."""
+        res = {}
+        for rec in self.spans:
+            row = res.setdefault(rec["name"], [rec["name"], 0, 0.0, 0.0, None])
+            row[1] += 1
+            row[2] += rec["wall"]
+            row[3] += rec["cpu"]
+            if rec["bytes"] is not None:
+                row[4] = max(row[4] or 0, rec["bytes"])
+        return sorted(res.values(), key=lambda row: -row[2])
+
+    def write(self, filename):
+        """Write spans and summary as JSON."""
+        t0 = min((rec["start"] for rec in self.spans), default=0.0)
+        spans = [dict(rec, start=rec["start"] - t0) for rec in self.spans]
+        summary = [dict(zip(["name", "calls", "wall", "cpu", "bytes"], row))
+                   for row in self.summary()]
+        with open(filename, "w") as fout:
+            json.dump({"spans": spans, "summary": summary}, fout, indent=2)
+            fout.write("\n")
+
+
+@contextlib.contextmanager
+def profiling(filename=None, memory=True):
+    """Context manager collecting the spans recorded within it with a
+    Profiler and writing them as JSON to filename. Does nothing if
+    filename is None."""
+    if filename is None:
+        yield None
+        return
+    with Profiler(memory) as prof:
+        yield prof
+    prof.write(filename)
@@ -0,0 +1,129 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing chunked reading of IIM input tables.
+
+The CSV file is parsed in chunks of rows straight into a preallocated
+(optionally memory-mapped) array or into a sparse matrix builder, so
+peak memory stays close to the size of the final matrix. The header
+gives the number of sectors n, hence an I/O table has n + 1 data rows
+(the last row being the total output) and an A* matrix has n rows.
+"""
+
+import csv
+import os
+import time
+import numpy as np
+import scipy.sparse
+
+
+class ReadStats:
+    """Class holding parse statistics for an input table."""
+    def __init__(self):
+        self.rows = 0        # number of data rows parsed
+        self.nbytes = 0      # number of bytes read
+        self.seconds = 0.0   # wall time used
+
+    def throughput(self):
+        """Return parse throughput in MB/s."""
+        if self.seconds <= 0.0:
+            return 0.0
+        return self.nbytes / self.seconds / 1.0e6
+
+    def __str__(self):
+        return "%d rows, %.1f MB in %.3f s (%.1f MB/s)" % (
+            self.rows, self.nbytes / 1.0e6, self.seconds, self.throughput())
+
+
+def read_io_table(filename, table_="IO", dtype=np.float64, sparse=False,
+                  chunk_rows=256, mmap_file=None):
+    """Read I/O table or A* matrix from CSV file.
+
+    Returns (sectors, io_table, xoutput, stats), where xoutput is the
+    trailing total output row for I/O tables and an empty list for A*
+    matrices. If sparse is true, io_table is a CSR matrix. If mmap_file
+    is given, the dense table is written to a memory-mapped .npy file.
+    """
+    stats = ReadStats()
+    start = time.perf_counter()
+    with open(filename, newline="", encoding="utf-8-sig") as fin:
+        header = next(csv.reader([fin.readline()]))
+        sectors = [s.strip() for s in header]
+        n = len(sectors)
+        nrows = n + 1 if table_ == "IO" else n
+        if sparse:
+            builder = _SparseBuilder(n, dtype)
+        elif mmap_file is not None:
+            builder = np.lib.format.open_memmap(
+                mmap_file, mode="w+", dtype=dtype, shape=(nrows, n))
+        else:
+            builder = np.empty((nrows, n), dtype=dtype)
+        row = 0
+        for chunk in _iter_chunks(fin, chunk_rows):
+            data = np.loadtxt(chunk, delimiter=",", dtype=dtype, ndmin=2)
+            if data.shape[1] != n:
+                raise RuntimeError(
+                    "row %d has %d columns, expected %d"
+                    % (row + 1, data.shape[1], n))
+            if row + len(data) > nrows:
+                raise RuntimeError("too many rows, expected %d" % nrows)
+            if sparse:
+                builder.append(data)
+            else:
+                builder[row:row + len(data), :] = data
+            row += len(data)
+    if row != nrows:
+        raise RuntimeError("expected %d rows, got %d" % (nrows, row))
+    if sparse:
+        io_table, xrow = builder.finish(table_ == "IO")
+    else:
+        io_table, xrow = builder, None
+        if table_ == "IO":
+            io_table, xrow = builder[:-1, :], builder[-1, :]
+    stats.rows = row
+    stats.nbytes = os.path.getsize(filename)
+    stats.seconds = time.perf_counter() - start
+    xoutput = xrow if table_ == "IO" else []
+    return sectors, io_table, xoutput, stats
+
+
+def _iter_chunks(fin, chunk_rows):
+    # Yield lists of at most chunk_rows non-blank lines. Lines with quoted
+    # fields are parsed with the csv module and passed on unquoted.
+    chunk = []
+    for line in fin:
+        if line.strip():
+            if '"' in line:
+                line = ",".join(next(csv.reader([line])))
+            chunk.append(line)
+            if len(chunk) == chunk_rows:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class _SparseBuilder:
+    # Builder of a CSR matrix from dense chunks of rows. Only the non-zero
+    # elements of each chunk are kept.
+    def __init__(self, n, dtype):
+        self.n = n
+        self.dtype = dtype
+        self.blocks = []
+        self.rows = 0
+
+    def append(self, data):
+        self.blocks.append(scipy.sparse.csr_matrix(data, dtype=self.dtype))
+        self.rows += len(data)
+
+    def finish(self, has_xoutput):
+        # Return the square CSR matrix and the trailing row (if any).
+        mat = scipy.sparse.vstack(self.blocks, format="csr", dtype=self.dtype)
+        self.blocks = []
+        if not has_xoutput:
+            return mat, None
+        xoutput = mat[self.n:, :].toarray().ravel()
+        return mat[:self.n, :], xoutput
@@ -0,0 +1,178 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing a multi-regional Inoperability Input-Output Model.
+
+The multi-regional A* matrix has one dense diagonal block per region,
+given by the interdependency matrix of the region's own IIM, and sparse
+off-diagonal trade blocks coupling sectors in different regions. With
+I - A* = D - T, where D is block diagonal and T holds the trade, S is
+obtained by block elimination: the regional blocks are factorized one
+at a time, and the trade coupling, written as T = U V^T with one column
+per sector engaged in trade, is solved through its Schur complement
+(capacitance matrix) C = I - V^T D^-1 U. Hence the cost grows with the
+number of regions and traded sectors rather than as (regions*sectors)^3.
+
+Sectors of the combined model are labelled "region:sector".
+"""
+
+import csv
+import numpy as np
+import scipy.sparse
+import iim.iim as iim
+import iim.nthorder as iim_nthorder
+import iim.solver as iim_solver
+
+SEPARATOR = ":"  # separator between region and sector in labels
+
+
+def read_trade(filename):
+    """Read trade linkages from CSV file.
+
+    The file has the columns region_i, sector_i, region_j, sector_j and
+    value, where value is the interdependency a*_ij of sector_i in
+    region_i on sector_j in region_j. Returns a list of tuples.
+    """
+    trade = []
+    with open(filename, newline="") as fin:
+        reader = csv.reader(fin)
+        header = [h.strip() for h in next(reader)]
+        if header != ["region_i", "sector_i", "region_j", "sector_j",
+                      "value"]:
+            raise RuntimeError("trade file must have columns region_i,"
+                               "sector_i,region_j,sector_j,value")
+        for row in reader:
+            if row:
+                trade.append(tuple(r.strip() for r in row[:4]) +
+                             (float(row[4]),))
+    return trade
+
+
+class MultiRegionalIIM(iim.IIM):
+    """Class providing the multi-regional IIM.
+
+    The regions are given as a list of (name, model) pairs, where model
+    is an IIM or the name of a CSV file read as an IIM with the given
+    table_ and mode_. The trade is a list of (region_i, sector_i,
+    region_j, sector_j, a*_ij) linkages, e.g. from read_trade(). If more
+    than max_rank sectors are engaged in trade, the combined A* matrix is
+    factorized with a sparse LU factorization instead.
+
+    All IIM methods apply to the combined model, with sectors labelled
+    "region:sector"; region_indices() and regional_dependency() report
+    results per region. The combined A* is stored sparse, and solver_type
+    is "BlockDiagonal", "LowRankUpdate" or "SparseLU" by the solver used;
+    S is refactorized with SparseLU after low-rank updates of A*. There is
+    no combined I/O table or A matrix (None).
+    """
+    def __init__(self, regions, trade=(), psector_=None, cvalue_=None,
+                 table_="IO", mode_="Demand", max_rank=2048):
+        self._init_attributes(table_, mode_, "SparseLU", "float64")
+        self.io_table = None  # no combined I/O table
+        self.amat = None      # no combined technical coefficients
+        self.regions = []  # list of region names
+        models = []
+        for name, model in regions:
+            if not isinstance(model, iim.IIM):
+                model = iim.IIM(model, [], [], table_, mode_)
+            if model.precision != "float64":
+                raise RuntimeError("regional models must be float64")
+            self.regions.append(name)
+            models.append(model)
+        self.region_models = models  # IIM model per region
+        self.region_offsets = np.cumsum([0] + [len(m) for m in models])
+        self.sectors = iim.SectorIndex(
+            [name + SEPARATOR + str(s)
+             for name, m in zip(self.regions, models)
+             for s in m.get_sectors()])
+        if all(len(m.get_xoutput()) == len(m) for m in models):
+            self.xoutput = np.concatenate([m.get_xoutput() for m in models])
+        self.max_rank = max_rank
+        self._assemble(trade)
+        self._powers = iim_nthorder.InterdependencyPowers(self.astar)
+        self._create_perturbation(psector_, cvalue_)
+
+    def _assemble(self, trade):
+        # Build the combined sparse A* and the block elimination solver.
+        n = len(self.sectors)
+        rows, cols, vals = [], [], []
+        for ri, si, rj, sj, aij in trade:
+            if ri == rj:
+                raise RuntimeError("trade linkage within region %s" % ri)
+            rows.append(self.sectors.get_loc(ri + SEPARATOR + si))
+            cols.append(self.sectors.get_loc(rj + SEPARATOR + sj))
+            vals.append(aij)
+        tmat = scipy.sparse.csr_matrix((vals, (rows, cols)), shape=(n, n))
+        tmat.sum_duplicates()
+        tmat.eliminate_zeros()
+        blocks = scipy.sparse.block_diag(
+            [scipy.sparse.csr_matrix(m.astar) for m in self.region_models],
+            format="csr")
+        self.astar = scipy.sparse.csr_matrix(blocks + tmat)
+        self.trade = tmat  # off-diagonal trade part of A*
+
+        trade_rows = np.unique(tmat.nonzero()[0])
+        trade_cols = np.unique(tmat.nonzero()[1])
+        rank = min(len(trade_rows), len(trade_cols))
+        if rank > self.max_rank:
+            self.solver = iim_solver.create_solver(self.astar, "SparseLU")
+            return
+        base = iim_solver.BlockDiagonalSolver(
+            [m.solver for m in self.region_models])
+        if rank == 0:
+            self.solver = base
+            self.solver_type = "BlockDiagonal"
+            return
+        #
+        # Algorithm:
+        #   T = U V^T with U = [e_i] and V^T = T[i, :] for the traded rows
+        #   (or U = T[:, j] and V = [e_j] for the traded columns, if
+        #   fewer).
+        #
+        if len(trade_rows) <= len(trade_cols):
+            u = np.zeros((n, rank))
+            u[trade_rows, np.arange(rank)] = 1.0
+            v = tmat[trade_rows, :].toarray().T
+        else:
+            u = tmat[:, trade_cols].toarray()
+            v = np.zeros((n, rank))
+            v[trade_cols, np.arange(rank)] = 1.0
+        self.solver = iim_solver.LowRankUpdateSolver(base, u, v)
+        self.solver_type = "LowRankUpdate"
+
+    def _region_slices(self):
+        return [slice(self.region_offsets[k], self.region_offsets[k + 1])
+                for k in range(len(self.regions))]
+
+    def region_indices(self):
+        """Return rows of [region, q_mean, q_max, delta, delta_overall,
+        rho, rho_overall] with the indices averaged over the sectors of
+        each region."""
+        q, delta, delta_overall, rho, rho_overall = self._sector_indices()
+        res = []
+        for name, rows in zip(self.regions, self._region_slices()):
+            res.append([name, float(q[rows].mean()), float(q[rows].max())] +
+                       [float(v[rows].mean()) for v in
+                        [delta, delta_overall, rho, rho_overall]])
+        return res
+
+    def regional_dependency(self, overall=False):
+        """Return (regions x regions) matrix of the mean total dependency
+        of the sectors in region r on the sectors in region s, from A*
+        or (if overall is true) from S."""
+        nreg = len(self.regions)
+        slices = self._region_slices()
+        res = np.zeros((nreg, nreg))
+        for s, cols in enumerate(slices):
+            ones = np.zeros(len(self.sectors))
+            ones[cols] = 1.0
+            if overall:
+                rowsum = self.solver.solve(ones)
+            else:
+                rowsum = np.asarray(self.astar @ ones).ravel()
+            for r, rows in enumerate(slices):
+                res[r, s] = rowsum[rows].mean()
+        return res
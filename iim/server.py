@@ -0,0 +1,438 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing a local HTTP/JSON server for IIM queries.
+
+The server keeps prepared IIM models in memory and answers queries for
+inoperability, interdependency indices and n-th order interdependencies
+over TCP on localhost or over a Unix socket. Concurrent inoperability
+requests against the same model are coalesced into micro-batches solved
+in one pass, and recent results are kept in an LRU cache.
+
+All requests are POST with a JSON object as body (GET /models excepted):
+
+    /models         {}                                 -> {name: {...}}
+    /inoperability  {"model", "psector", "cvalue"}     -> {"q"}
+    /indices        {"model"}                          -> {"delta", ...}
+    /nth_order      {"model", "order", "k"}            -> {"rows"}
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import http.client
+import json
+import socket
+import iim.iim as iim
+
+
+class ResultCache:
+    """LRU cache of query results."""
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries  # maximum number of cached results
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return cached result for key, or None."""
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        """Cache result for key, evicting the least recently used entry."""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+
+class IIMServer:
+    """Class providing an asyncio server for IIM queries.
+
+    The models argument maps model names to prepared IIM models. The model
+    computations are run on a single worker thread, so the event loop stays
+    responsive and the models are never used concurrently.
+    """
+    def __init__(self, models, batch_delay=0.002, max_batch=256,
+                 cache_size=1024):
+        self.models = dict(models)      # name -> IIM model
+        self.batch_delay = batch_delay  # seconds to wait for a batch to fill
+        self.max_batch = max_batch      # maximum scenarios per batch
+        self.cache = ResultCache(cache_size)
+        self.stats = {"requests": 0, "batches": 0, "scenarios": 0,
+                      "cache_hits": 0}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._pending = {}   # model name -> list of queued scenarios
+        self._timers = {}    # model name -> timer flushing the batch
+        self._inflight = {}  # cache key -> future of queued scenario
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """Start listening on host:port, or on a Unix socket if path is
+        given, and return the bound address."""
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path=path)
+            return path
+        self._server = await asyncio.start_server(
+            self._handle_connection, host=host, port=port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Serve requests until cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop the server and the worker thread."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self._executor.shutdown()
+
+    def _model(self, name):
+        if name not in self.models:
+            raise RuntimeError("unknown model: %s" % name)
+        return self.models[name]
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def inoperability(self, name, psector_, cvalue_):
+        """Return inoperability of scenario for model."""
+        model = self._model(name)
+        if len(psector_) != len(cvalue_):
+            raise RuntimeError("psector and cvalue have different sizes")
+        scenario = {}
+        for ps, cs in zip(psector_, cvalue_):
+            model.sectors.get_loc(ps)  # raises KeyError if unknown
+            if not 0.0 <= float(cs) <= 1.0:
+                raise RuntimeError("%r not in range [0.0, 1.0]" % cs)
+            scenario[ps] = float(cs)
+        key = ("q", name, tuple(sorted(scenario.items())))
+        q = self.cache.get(key)
+        if q is not None:
+            self.stats["cache_hits"] += 1
+            return q
+        if key in self._inflight:  # identical scenario already queued
+            return await self._inflight[key]
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        batch = self._pending.setdefault(name, [])
+        batch.append((key, list(scenario), list(scenario.values()), future))
+        if len(batch) >= self.max_batch:
+            asyncio.ensure_future(self._flush(name))
+        elif name not in self._timers:
+            self._timers[name] = asyncio.get_running_loop().call_later(
+                self.batch_delay,
+                lambda: asyncio.ensure_future(self._flush(name)))
+        return await future
+
+    async def _flush(self, name):
+        # Solve all queued scenarios of model in one batch.
+        timer = self._timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(name, [])
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        self.stats["scenarios"] += len(batch)
+        try:
+            q = await self._run(_solve_batch, self.models[name],
+                                [b[1] for b in batch], [b[2] for b in batch])
+        except Exception as err:
+            for key, _, _, future in batch:
+                self._inflight.pop(key, None)
+                future.set_exception(err)
+            return
+        for k, (key, _, _, future) in enumerate(batch):
+            qk = q[k].copy()  # a row view would keep the whole batch alive
+            self.cache.put(key, qk)
+            self._inflight.pop(key, None)
+            future.set_result(qk)
+
+    async def indices(self, name):
+        """Return dict of interdependency indices for model."""
+        model = self._model(name)
+        key = ("indices", name)
+        res = self.cache.get(key)
+        if res is None:
+            res = await self._run(_indices, model)
+            self.cache.put(key, res)
+        else:
+            self.stats["cache_hits"] += 1
+        return res
+
+    async def nth_order(self, name, order, k=1):
+        """Return k largest n-th order interdependencies of model."""
+        model = self._model(name)
+        key = ("nth_order", name, int(order), int(k))
+        res = self.cache.get(key)
+        if res is None:
+            res = await self._run(
+                model.top_nth_order_interdependency, int(order), int(k))
+            res = [[str(si), str(sj), float(aij)] for si, sj, aij in res]
+            self.cache.put(key, res)
+        else:
+            self.stats["cache_hits"] += 1
+        return res
+
+    async def handle(self, method, path, request):
+        """Return response object for request to path."""
+        self.stats["requests"] += 1
+        if path == "/models" and method in ["GET", "POST"]:
+            return {name: {"sectors": [str(s) for s in m.get_sectors()],
+                           "mode": m.mode, "solver": m.solver_type}
+                    for name, m in self.models.items()}
+        if method != "POST":
+            raise _HTTPError(405, "method not allowed")
+        if path == "/inoperability":
+            q = await self.inoperability(
+                request.get("model"), request.get("psector", []),
+                request.get("cvalue", []))
+            return {"q": [float(v) for v in q]}
+        if path == "/indices":
+            return await self.indices(request.get("model"))
+        if path == "/nth_order":
+            return {"rows": await self.nth_order(
+                request.get("model"), request.get("order", 1),
+                request.get("k", 1))}
+        if path == "/stats":
+            return dict(self.stats, cached=len(self.cache))
+        raise _HTTPError(404, "not found: %s" % path)
+
+    async def _handle_connection(self, reader, writer):
+        # Serve HTTP/1.1 requests on connection until it is closed.
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in [b"\r\n", b"\n", b""]:
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(
+                    int(headers.get("content-length", 0)))
+                status, response = await self._respond(method, path, body)
+                data = json.dumps(response).encode()
+                writer.write(("HTTP/1.1 %d %s\r\n"
+                              "Content-Type: application/json\r\n"
+                              "Content-Length: %d\r\n\r\n"
+                              % (status, http.client.responses[status],
+                                 len(data))).encode("latin-1") + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, body):
+        try:
+            request = json.loads(body) if body else {}
+            if not isinstance(request, dict):
+                raise RuntimeError("request must be a JSON object")
+            return 200, await self.handle(method, path, request)
+        except _HTTPError as err:
+            return err.status, {"error": str(err)}
+        except KeyError as err:
+            return 400, {"error": "unknown sector: %s" % err.args[0]}
+        except (RuntimeError, ValueError, TypeError) as err:
+            return 400, {"error": str(err)}
+
+
+class _HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _solve_batch(model, psectors, cvalues):
+    return model.inoperability_batch(model.perturbation_batch(
+        psectors, cvalues))
+
+
+def _indices(model):
+    return {"delta": [float(v) for v in model.dependency()],
+            "delta_overall": [float(v) for v in model.overall_dependency()],
+            "rho": [float(v) for v in model.influence()],
+            "rho_overall": [float(v) for v in model.overall_influence()]}
+
+
+class IIMClient:
+    """Client for IIMServer over TCP or a Unix socket."""
+    def __init__(self, host="127.0.0.1", port=None, path=None, timeout=60.0):
+        if path is not None:
+            self.conn = _UnixHTTPConnection(path, timeout)
+        else:
+            self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def close(self):
+        """Close the connection."""
+        self.conn.close()
+
+    def request(self, path, request=None, method="POST"):
+        """Send request to path and return the decoded response."""
+        body = json.dumps(request or {}).encode()
+        self.conn.request(method, path, body=body,
+                          headers={"Content-Type": "application/json"})
+        resp = self.conn.getresponse()
+        data = json.loads(resp.read())
+        if resp.status != 200:
+            raise RuntimeError(data.get("error", resp.reason))
+        return data
+
+    def models(self):
+        """Return dict describing the served models."""
+        return self.request("/models", method="GET")
+
+    def inoperability(self, model, psector_, cvalue_):
+        """Return inoperability of scenario."""
+        return self.request("/inoperability", {
+            "model": model, "psector": list(psector_),
+            "cvalue": [float(c) for c in cvalue_]})["q"]
+
+    def indices(self, model):
+        """Return dict of interdependency indices."""
+        return self.request("/indices", {"model": model})
+
+    def nth_order(self, model, order, k=1):
+        """Return k largest n-th order interdependencies."""
+        return self.request("/nth_order", {
+            "model": model, "order": order, "k": k})["rows"]
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Local server for Inoperability Input-Output Models")
+    parser.add_argument("--model",
+                        action="append",
+                        dest="models",
+                        required=True,
+                        help="model to serve, given as NAME=CSV_FILE")
+    parser.add_argument("-t", "--table",
+                        action="store",
+                        dest="table",
+                        choices=["IO", "A"],
+                        default="IO",
+                        required=False,
+                        help="type of input-output table")
+    parser.add_argument("-m", "--mode",
+                        action="store",
+                        dest="mode",
+                        choices=["Demand", "Supply"],
+                        default="Demand",
+                        required=False,
+                        help="calculation mode")
+    parser.add_argument("--solver",
+                        action="store",
+                        dest="solver",
+                        choices=["LU", "Inverse", "SparseLU", "Krylov",
+                                 "Neumann"],
+                        default="LU",
+                        required=False,
+                        help="solver for the S matrix")
+    parser.add_argument("--cache",
+                        action="store",
+                        dest="cache",
+                        default=None,
+                        required=False,
+                        help="directory for cache of prepared models")
+    parser.add_argument("--host",
+                        action="store",
+                        dest="host",
+                        default="127.0.0.1",
+                        required=False,
+                        help="host to listen on")
+    parser.add_argument("--port",
+                        action="store",
+                        dest="port",
+                        type=int,
+                        default=8765,
+                        required=False,
+                        help="port to listen on")
+    parser.add_argument("--unix",
+                        action="store",
+                        dest="unix",
+                        default=None,
+                        required=False,
+                        help="Unix socket to listen on instead of TCP")
+    parser.add_argument("--results",
+                        action="store",
+                        dest="results",
+                        type=int,
+                        default=1024,
+                        required=False,
+                        help="number of results kept in the LRU cache")
+    return parser.parse_args()
+
+
+def load_models(args):
+    """Return dict of prepared models given as NAME=CSV_FILE."""
+    models = {}
+    for spec in args.models:
+        name, sep, filename = spec.partition("=")
+        if not sep:
+            raise RuntimeError("model must be given as NAME=CSV_FILE")
+        if args.cache:
+            import iim.cache as iim_cache  # not needed without --cache
+            models[name] = iim_cache.ModelCache(args.cache).get(
+                filename, [], [], args.table, args.mode, args.solver)
+        else:
+            models[name] = iim.IIM(
+                filename, [], [], args.table, args.mode, args.solver)
+    return models
+
+
+async def serve(args):
+    """Load models and serve requests until cancelled."""
+    server = IIMServer(load_models(args), cache_size=args.results)
+    address = await server.start(args.host, args.port, args.unix)
+    print("Serving %s on %s" % (", ".join(server.models), address))
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    """Driver for IIM server."""
+    asyncio.run(serve(parse_arguments()))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
+    except Exception as err:
+        print("Error: ", err)
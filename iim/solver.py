@@ -0,0 +1,490 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing solver backends for the IIM S matrix.
+
+The S matrix, S = (I - A*)^-1, is only needed through its action on
+vectors (inoperability), its row and column sums and its diagonal
+(overall dependency and influence). The solvers below provide these
+operations from a dense inverse, from a dense or sparse LU factorization
+of I - A*, from Krylov iterations or from the Neumann series; except for
+the dense inverse, S is never materialized.
+"""
+
+import copy
+import numpy as np
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+import iim.profile as iim_profile
+
+# The relative tolerance of gmres is named rtol from SciPy 1.12 (tol before).
+_GMRES_RTOL = "rtol" if tuple(
+    int(v) for v in scipy.__version__.split(".")[:2]) >= (1, 12) else "tol"
+
+
+class _Solver:
+    # Base class providing the S matrix diagonal and the dense S matrix
+    # from repeated multiple right-hand side solves.
+    max_diagonal_size = None  # largest n for diagonal() (None: no limit)
+
+    def __init__(self, n, block_size=512):
+        self.n = n                    # dimension of the S matrix
+        self.block_size = block_size  # columns per solve in diagonal()
+        self._diag = None
+
+    def __len__(self):
+        """Return dimension of the S matrix."""
+        return self.n
+
+    def diagonal(self):
+        """Return diagonal of the S matrix."""
+        #
+        # Algorithm:
+        #   S[:, k:k+m] is obtained by solving against the corresponding
+        #   columns of the identity matrix. Only the diagonal block is kept,
+        #   so at most n*block_size elements are held at any time.
+        #
+        # Note:
+        #   This costs n solves, i.e. O(n^3) for dense LU factors. Solvers
+        #   with max_diagonal_size set refuse larger matrices.
+        #
+        if self._diag is None:
+            n = len(self)
+            if self.max_diagonal_size is not None and \
+                    n > self.max_diagonal_size:
+                raise RuntimeError(
+                    "diagonal of S needs %d iterative solves; use the LU or "
+                    "SparseLU solver for more than %d sectors"
+                    % (n, self.max_diagonal_size))
+            diag = np.zeros(n)
+            for k in range(0, n, self.block_size):
+                m = min(self.block_size, n - k)
+                rhs = np.zeros(shape=(n, m))
+                rhs[k:k + m, :] = np.identity(m)
+                cols = self.solve(rhs)
+                diag[k:k + m] = np.diagonal(cols[k:k + m, :])
+            self._diag = diag
+        return self._diag.copy()
+
+    def matrix(self):
+        """Return the S matrix (materialized on each call)."""
+        return self.solve(np.identity(len(self)))
+
+    def state(self):
+        """Return arrays needed to restore the solver without setup."""
+        return {}
+
+    @classmethod
+    def restore(cls, astar, state):
+        """Restore solver from A* and the arrays returned by state()."""
+        return cls(astar)
+
+
+class InverseSolver(_Solver):
+    """Solver storing the dense S matrix."""
+    def __init__(self, astar):
+        n = astar.shape[0]
+        super().__init__(n)
+        self.smat = np.linalg.inv(np.identity(n) - astar)
+
+    def solve(self, b):
+        """Return S*b."""
+        return np.matmul(self.smat, b)
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        return np.matmul(np.transpose(self.smat), b)
+
+    def diagonal(self):
+        """Return diagonal of the S matrix."""
+        return np.diagonal(self.smat).copy()
+
+    def matrix(self):
+        """Return the S matrix."""
+        return self.smat
+
+    def state(self):
+        """Return arrays needed to restore the solver without setup."""
+        return {"smat": self.smat}
+
+    @classmethod
+    def restore(cls, astar, state):
+        """Restore solver from A* and the arrays returned by state()."""
+        if "smat" not in state:
+            return cls(astar)
+        solver = cls.__new__(cls)
+        _Solver.__init__(solver, astar.shape[0])
+        solver.smat = state["smat"]
+        return solver
+
+
+class LUSolver(_Solver):
+    """Solver using an LU factorization of I - A*."""
+    def __init__(self, astar, block_size=512):
+        n = astar.shape[0]
+        super().__init__(n, block_size)
+        self.lu_piv = scipy.linalg.lu_factor(np.identity(n) - astar)
+
+    def solve(self, b):
+        """Return S*b."""
+        return scipy.linalg.lu_solve(self.lu_piv, b)
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        return scipy.linalg.lu_solve(self.lu_piv, b, trans=1)
+
+    def state(self):
+        """Return arrays needed to restore the solver without setup."""
+        return {"lu": self.lu_piv[0], "piv": self.lu_piv[1]}
+
+    @classmethod
+    def restore(cls, astar, state):
+        """Restore solver from A* and the arrays returned by state()."""
+        if "lu" not in state or "piv" not in state:
+            return cls(astar)
+        solver = cls.__new__(cls)
+        _Solver.__init__(solver, astar.shape[0])
+        # The pivot indices are small and are always held in memory, since
+        # lu_solve does not accept read-only memory-mapped pivots.
+        solver.lu_piv = (state["lu"], np.array(state["piv"]))
+        return solver
+
+
+class MixedPrecisionLUSolver(LUSolver):
+    """Solver using a single precision LU factorization of I - A* with
+    iterative refinement of the solution in double precision.
+
+    The refined solution satisfies ||b - (I - A*) x|| <= tol ||b|| for the
+    single precision A*, with residuals accumulated in double precision.
+    """
+    def __init__(self, astar, tol=1.0e-12, maxiter=20, block_size=512):
+        n = astar.shape[0]
+        _Solver.__init__(self, n, block_size)
+        self.astar = astar      # single precision interdependency matrix
+        self.tol = tol          # relative residual tolerance
+        self.maxiter = maxiter  # maximum number of refinement steps
+        self.lu_piv = scipy.linalg.lu_factor(
+            np.identity(n, dtype=astar.dtype) - astar)
+
+    def _residual(self, b, x, trans):
+        # Return b - (I - A*) x in double precision, upcasting A* one
+        # block of rows at a time.
+        amat = np.transpose(self.astar) if trans else self.astar
+        r = b - x
+        for k in range(0, len(self), self.block_size):
+            r[k:k + self.block_size] += \
+                np.asarray(amat[k:k + self.block_size], dtype=float) @ x
+        return r
+
+    def _solve(self, b, trans):
+        #
+        # Algorithm:
+        #   Iterative refinement, x <- x + (I - A*)^-1 (b - (I - A*) x),
+        #   with the correction solved in single precision.
+        #
+        b = np.asarray(b, dtype=float)
+        lu32 = self.lu_piv[0].dtype
+        x = scipy.linalg.lu_solve(
+            self.lu_piv, b.astype(lu32), trans=trans).astype(float)
+        bnorm = np.abs(b).max(initial=0.0)
+        for _ in range(self.maxiter):
+            r = self._residual(b, x, trans)
+            if np.abs(r).max(initial=0.0) <= self.tol * bnorm:
+                return x
+            x += scipy.linalg.lu_solve(self.lu_piv, r.astype(lu32),
+                                       trans=trans)
+        raise RuntimeError("iterative refinement did not converge")
+
+    def solve(self, b):
+        """Return S*b."""
+        return self._solve(b, 0)
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        return self._solve(b, 1)
+
+    @classmethod
+    def restore(cls, astar, state):
+        """Restore solver from A* and the arrays returned by state()."""
+        if "lu" not in state or "piv" not in state:
+            return cls(astar)
+        solver = cls.__new__(cls)
+        _Solver.__init__(solver, astar.shape[0])
+        solver.astar = astar
+        solver.tol = 1.0e-12
+        solver.maxiter = 20
+        solver.lu_piv = (state["lu"], np.array(state["piv"]))
+        return solver
+
+
+class SparseLUSolver(_Solver):
+    """Solver using a sparse LU factorization of I - A*."""
+    def __init__(self, astar, block_size=512):
+        n = astar.shape[0]
+        super().__init__(n, block_size)
+        self.imat = scipy.sparse.identity(n, format="csc") - \
+            scipy.sparse.csc_matrix(astar)
+        self.lu = scipy.sparse.linalg.splu(self.imat)
+
+    def __getstate__(self):
+        # SuperLU objects cannot be pickled; refactorize when unpickled.
+        state = self.__dict__.copy()
+        del state["lu"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lu = scipy.sparse.linalg.splu(self.imat)
+
+    def solve(self, b):
+        """Return S*b."""
+        return self.lu.solve(np.asarray(b, dtype=float))
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        return self.lu.solve(np.asarray(b, dtype=float), trans="T")
+
+
+class KrylovSolver(_Solver):
+    """Solver using preconditioned GMRES iterations on I - A*.
+
+    Since the spectral radius of A* is less than one, the truncated
+    Neumann series I + A* + ... + A*^order is used as preconditioner.
+    The diagonal of S (n GMRES solves) is limited to max_diagonal_size
+    sectors.
+    """
+    max_diagonal_size = 5000
+    def __init__(self, astar, order=2, rtol=1.0e-10, maxiter=None,
+                 block_size=64):
+        n = astar.shape[0]
+        super().__init__(n, block_size)
+        if scipy.sparse.issparse(astar):
+            astar = scipy.sparse.csr_matrix(astar)
+        self.astar = astar
+        self.astar_t = astar.T
+        self.order = order      # order of Neumann series preconditioner
+        self.rtol = rtol        # relative tolerance
+        self.maxiter = maxiter  # maximum number of restart cycles
+
+    def _operators(self, amat):
+        # Return operators for I - A and its Neumann series approximate
+        # inverse, evaluated with Horner's scheme.
+        n = len(self)
+
+        def imat(x):
+            return x - amat @ x
+
+        def neumann(x):
+            y = x.copy()
+            for _ in range(self.order):
+                y = x + amat @ y
+            return y
+
+        return (scipy.sparse.linalg.LinearOperator((n, n), matvec=imat),
+                scipy.sparse.linalg.LinearOperator((n, n), matvec=neumann))
+
+    def _solve(self, amat, b):
+        b = np.asarray(b, dtype=float)
+        if b.ndim == 2:
+            return np.column_stack(
+                [self._solve(amat, b[:, k]) for k in range(b.shape[1])]) \
+                if b.shape[1] > 0 else np.zeros(b.shape)
+        if not np.any(b):
+            return np.zeros(len(self))
+        op, prec = self._operators(amat)
+        x, info = scipy.sparse.linalg.gmres(
+            op, b, M=prec, atol=0.0, maxiter=self.maxiter,
+            **{_GMRES_RTOL: self.rtol})
+        if info != 0:
+            raise RuntimeError("GMRES did not converge (info = %d)" % info)
+        return x
+
+    def solve(self, b):
+        """Return S*b."""
+        return self._solve(self.astar, b)
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        return self._solve(self.astar_t, b)
+
+
+class NeumannSolver(_Solver):
+    """Solver summing the Neumann series S = I + A* + A*^2 + ...
+
+    Each term requires one matrix-vector (or matrix-matrix) product with
+    A*, so no factorization is needed. The series converges since the
+    spectral radius of A* is less than one. The diagonal of S (n series
+    sums) is limited to max_diagonal_size sectors.
+    """
+    max_diagonal_size = 5000
+    def __init__(self, astar, tol=1.0e-12, maxiter=10000, block_size=64):
+        n = astar.shape[0]
+        super().__init__(n, block_size)
+        if scipy.sparse.issparse(astar):
+            astar = scipy.sparse.csr_matrix(astar)
+        self.astar = astar
+        self.astar_t = astar.T
+        self.tol = tol          # tolerance relative to the solution
+        self.maxiter = maxiter  # maximum number of terms
+
+    def _solve(self, amat, b):
+        term = np.array(b, dtype=float)
+        x = term.copy()
+        for _ in range(self.maxiter):
+            term = amat @ term
+            x += term
+            if np.abs(term).max(initial=0.0) <= \
+                    self.tol * np.abs(x).max(initial=0.0):
+                return x
+        raise RuntimeError("Neumann series did not converge")
+
+    def solve(self, b):
+        """Return S*b."""
+        return self._solve(self.astar, b)
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        return self._solve(self.astar_t, b)
+
+
+class LowRankUpdateSolver(_Solver):
+    """Solver for I - (A* + U V^T) reusing a solver for I - A*.
+
+    U and V are (n x k) arrays holding a rank-k change of A*. Further
+    changes are added with update(); the base solver is never modified.
+    """
+    def __init__(self, base, u, v):
+        super().__init__(len(base), base.block_size)
+        self.base = base
+        self.u = np.zeros((self.n, 0))
+        self.v = np.zeros((self.n, 0))
+        self.su = np.zeros((self.n, 0))   # S0 U
+        self.svt = np.zeros((self.n, 0))  # S0^T V
+        self._extend(u, v)
+
+    @property
+    def rank(self):
+        """Return rank of the accumulated change of A*."""
+        return self.u.shape[1]
+
+    def _extend(self, u, v):
+        #
+        # Algorithm:
+        #   Woodbury identity, (M - U V^T)^-1 = S0 + S0 U C^-1 V^T S0 with
+        #   M = I - A*, S0 = M^-1 and capacitance matrix C = I - V^T S0 U.
+        #   Only S0 U and S0^T V for the new columns need to be solved for.
+        #
+        u = np.asarray(u, dtype=float).reshape(self.n, -1)
+        v = np.asarray(v, dtype=float).reshape(self.n, -1)
+        self.su = np.hstack([self.su, self.base.solve(u)])
+        self.svt = np.hstack([self.svt, self.base.solve_transpose(v)])
+        self.u = np.hstack([self.u, u])
+        self.v = np.hstack([self.v, v])
+        cap = np.identity(self.rank) - self.v.T @ self.su
+        self.cap = scipy.linalg.lu_factor(cap)
+        self._diag = None
+
+    def update(self, u, v):
+        """Return solver with the further change U V^T of A*."""
+        solver = copy.copy(self)
+        solver._extend(u, v)
+        return solver
+
+    def solve(self, b):
+        """Return S*b."""
+        y = self.base.solve(b)
+        return y + self.su @ scipy.linalg.lu_solve(self.cap, self.v.T @ y)
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        y = self.base.solve_transpose(b)
+        return y + self.svt @ scipy.linalg.lu_solve(
+            self.cap, self.u.T @ y, trans=1)
+
+    def diagonal(self):
+        """Return diagonal of the S matrix."""
+        #
+        # Algorithm:
+        #   diag(S) = diag(S0) + rowsum((S0 U C^-1) * (S0^T V)), so only
+        #   the diagonal of the base solver is needed.
+        #
+        if self._diag is None:
+            suc = np.transpose(scipy.linalg.lu_solve(
+                self.cap, np.transpose(self.su), trans=1))
+            self._diag = self.base.diagonal() + \
+                np.einsum("ik,ik->i", suc, self.svt)
+        return self._diag.copy()
+
+
+class BlockDiagonalSolver(_Solver):
+    """Solver for block-diagonal I - A* from solvers for each block."""
+    def __init__(self, solvers):
+        self.solvers = list(solvers)
+        self.offsets = np.cumsum([0] + [len(s) for s in self.solvers])
+        super().__init__(int(self.offsets[-1]))
+
+    def _apply(self, b, trans):
+        b = np.asarray(b, dtype=float)
+        x = np.zeros(b.shape)
+        for k, solver in enumerate(self.solvers):
+            rows = slice(self.offsets[k], self.offsets[k + 1])
+            x[rows] = solver.solve_transpose(b[rows]) if trans \
+                else solver.solve(b[rows])
+        return x
+
+    def solve(self, b):
+        """Return S*b."""
+        return self._apply(b, False)
+
+    def solve_transpose(self, b):
+        """Return S^T*b."""
+        return self._apply(b, True)
+
+    def diagonal(self):
+        """Return diagonal of the S matrix."""
+        return np.concatenate([s.diagonal() for s in self.solvers])
+
+
+SOLVERS = {"LU": LUSolver,
+           "Inverse": InverseSolver,
+           "SparseLU": SparseLUSolver,
+           "Krylov": KrylovSolver,
+           "Neumann": NeumannSolver}
+
+# Solvers using sparse storage of the model matrices.
+SPARSE_SOLVERS = ["SparseLU", "Krylov", "Neumann"]
+
+# Solvers supporting single precision storage of the model matrices.
+SINGLE_PRECISION_SOLVERS = ["LU"]
+
+
+def _solver_class(astar, solver):
+    if solver not in SOLVERS:
+        raise RuntimeError("unknown solver: %s" % solver)
+    if astar.dtype == np.float32:
+        if solver not in SINGLE_PRECISION_SOLVERS:
+            raise RuntimeError(
+                "solver %s does not support single precision" % solver)
+        return MixedPrecisionLUSolver
+    return SOLVERS[solver]
+
+
+def _astar_sizes(astar, *args, **kwargs):
+    # Return matrix sizes of A* for profiling spans.
+    return iim_profile.matrix_sizes(astar)
+
+
+@iim_profile.profiled("solver.create", _astar_sizes)
+def create_solver(astar, solver="LU"):
+    """Create solver backend for the S matrix from the A* matrix."""
+    return _solver_class(astar, solver)(astar)
+
+
+@iim_profile.profiled("solver.restore", _astar_sizes)
+def restore_solver(astar, state, solver="LU"):
+    """Restore solver backend from the A* matrix and saved solver arrays."""
+    return _solver_class(astar, solver).restore(astar, state)
@@ -0,0 +1,80 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Module providing synthetic input-output tables for testing and
+benchmarking IIM at scale.
+
+The technical coefficient matrix A is drawn at random with a given
+density of non-zero elements and scaled to a given spectral radius.
+Since A* is similar to A (A* = diag(x)^-1 A diag(x) in the demand-driven
+model), the spectral radius of A* is the same, so it controls the
+conditioning of I - A* and the convergence of the Neumann series.
+"""
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+
+def spectral_radius(amat):
+    """Return spectral radius of dense or sparse square matrix."""
+    n = amat.shape[0]
+    if n <= 500:
+        dense = amat.toarray() if scipy.sparse.issparse(amat) else amat
+        return float(np.abs(np.linalg.eigvals(dense)).max(initial=0.0))
+    vals = scipy.sparse.linalg.eigs(
+        scipy.sparse.linalg.aslinearoperator(amat), k=1, which="LM",
+        return_eigenvectors=False)
+    return float(np.abs(vals).max())
+
+
+def synthetic_amat(n, density=1.0, radius=0.8, seed=None):
+    """Return random non-negative n x n matrix with the given density of
+    non-zero elements and spectral radius. The matrix is dense if density
+    is one and a CSR matrix otherwise."""
+    rng = np.random.default_rng(seed)
+    if density >= 1.0:
+        amat = rng.random((n, n))
+    else:
+        amat = scipy.sparse.random(n, n, density=density, format="csr",
+                                   random_state=rng)
+    rho = spectral_radius(amat)
+    if rho > 0.0:
+        amat = amat * (radius / rho)
+    return amat
+
+
+def synthetic_io_table(n, density=1.0, radius=0.8, seed=None):
+    """Return (sectors, io_table, xoutput) of a synthetic I/O table whose
+    technical coefficient matrix has the given density and spectral
+    radius."""
+    rng = np.random.default_rng(seed)
+    amat = synthetic_amat(n, density, radius, rng)
+    xoutput = rng.uniform(1.0e3, 1.0e5, n)
+    if scipy.sparse.issparse(amat):
+        io_table = scipy.sparse.csr_matrix(amat @ scipy.sparse.diags(xoutput))
+    else:
+        io_table = amat * xoutput
+    sectors = ["S%d" % i for i in range(n)]
+    return sectors, io_table, xoutput
+
+
+def write_io_table(filename, sectors, io_table, xoutput, chunk_rows=256):
+    """Write I/O table in the CSV format of examples/ssb_io.csv.
+
+    Rows are written in chunks, so sparse tables are never densified as
+    a whole.
+    """
+    n = len(sectors)
+    with open(filename, "w") as fout:
+        fout.write(",".join(sectors) + "\n")
+        for k in range(0, n, chunk_rows):
+            rows = io_table[k:k + chunk_rows]
+            if scipy.sparse.issparse(rows):
+                rows = rows.toarray()
+            np.savetxt(fout, rows, fmt="%.17g", delimiter=",")
+        np.savetxt(fout, np.reshape(xoutput, (1, n)), fmt="%.17g",
+                   delimiter=",")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Program for benchmarking IIM on synthetic input-output tables.
+
+For each table size a synthetic I/O table with the given density and
+spectral radius is written to a temporary CSV file. Reading the table,
+model construction, factorization of I - A*, inoperability, the four
+interdependency indices and the second order interdependencies are
+then timed (median of the repetitions) and their peak traced memory is
+recorded. Stages the solver refuses (e.g. the diagonal of S for the
+iterative solvers on large tables) are recorded as null. The results
+are written as JSON and can be compared with the results of another
+commit to catch regressions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import scipy
+import iim.iim as iim
+import iim.nthorder as iim_nthorder
+import iim.reader as iim_reader
+import iim.solver as iim_solver
+import iim.synthetic as iim_synthetic
+
+STAGES = ["read", "construct", "factorize", "inoperability", "dependency",
+          "influence", "overall_dependency", "overall_influence",
+          "max_nth_order"]
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark IIM on synthetic input-output tables")
+    parser.add_argument("-n", "--sizes",
+                        action="store",
+                        dest="sizes",
+                        nargs="+",
+                        type=int,
+                        default=[10, 100, 1000, 5000],
+                        help="numbers of sectors")
+    parser.add_argument("-d", "--density",
+                        action="store",
+                        dest="density",
+                        type=float,
+                        default=1.0,
+                        required=False,
+                        help="density of non-zero coefficients")
+    parser.add_argument("--radius",
+                        action="store",
+                        dest="radius",
+                        type=float,
+                        default=0.8,
+                        required=False,
+                        help="spectral radius of A*")
+    parser.add_argument("--solver",
+                        action="store",
+                        dest="solver",
+                        choices=["LU", "Inverse", "SparseLU", "Krylov",
+                                 "Neumann"],
+                        default="LU",
+                        required=False,
+                        help="solver for the S matrix")
+    parser.add_argument("-r", "--repeat",
+                        action="store",
+                        dest="repeat",
+                        type=int,
+                        default=3,
+                        required=False,
+                        help="number of repetitions per stage")
+    parser.add_argument("--seed",
+                        action="store",
+                        dest="seed",
+                        type=int,
+                        default=42,
+                        required=False,
+                        help="random seed")
+    parser.add_argument("-o", "--output",
+                        action="store",
+                        dest="output",
+                        default=None,
+                        required=False,
+                        help="name of JSON output file")
+    parser.add_argument("--baseline",
+                        action="store",
+                        dest="baseline",
+                        default=None,
+                        required=False,
+                        help="JSON results of baseline to compare with")
+    parser.add_argument("--tolerance",
+                        action="store",
+                        dest="tolerance",
+                        type=float,
+                        default=1.5,
+                        required=False,
+                        help="maximum ratio of time or memory to baseline")
+    return parser.parse_args()
+
+
+def measure(func, repeat=3, setup=None):
+    """Return (median seconds, peak traced bytes) of func().
+
+    The timed runs are made without memory tracing; one extra traced run
+    gives the peak memory allocated by func. If given, setup() is called
+    before each run to discard cached results.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def benchmark(n, density=1.0, radius=0.8, solver="LU", repeat=3, seed=42,
+              directory=None):
+    """Return list of results for an n-sector synthetic table."""
+    sectors, io_table, xoutput = iim_synthetic.synthetic_io_table(
+        n, density, radius, seed)
+    sparse = solver in iim_solver.SPARSE_SOLVERS
+    with tempfile.TemporaryDirectory(dir=directory) as tmpdir:
+        fname = os.path.join(tmpdir, "table.csv")
+        iim_synthetic.write_io_table(fname, sectors, io_table, xoutput)
+        del io_table
+        model = iim.IIM(fname, [], [], "IO", "Demand", solver)
+        model = model.with_perturbation([sectors[0]], [0.1])
+
+        def reset_diagonal():
+            # The S matrix diagonal is cached by the solver.
+            model.solver._diag = None
+
+        def reset_powers():
+            # Powers of A* are memoized by the model.
+            model._powers = iim_nthorder.InterdependencyPowers(model.astar)
+
+        stages = {
+            "read": (lambda: iim_reader.read_io_table(
+                fname, "IO", sparse=sparse), None),
+            "construct": (lambda: iim.IIM(
+                fname, [], [], "IO", "Demand", solver), None),
+            "factorize": (lambda: iim_solver.create_solver(
+                model.astar, solver), None),
+            "inoperability": (model.inoperability, None),
+            "dependency": (model.dependency, None),
+            "influence": (model.influence, None),
+            "overall_dependency": (model.overall_dependency, reset_diagonal),
+            "overall_influence": (model.overall_influence, reset_diagonal),
+            "max_nth_order": (lambda: model.max_nth_order_interdependency(2),
+                              reset_powers)}
+        res = []
+        for stage in STAGES:
+            func, setup = stages[stage]
+            try:
+                seconds, peak = measure(func, repeat, setup)
+            except RuntimeError:  # e.g. diagonal of S too large for solver
+                seconds, peak = None, None
+            res.append({"n": n, "density": density, "radius": radius,
+                        "solver": solver, "stage": stage,
+                        "seconds": seconds, "peak_bytes": peak})
+    return res
+
+
+def metadata():
+    """Return description of the benchmark environment."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True, universal_newlines=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+
+def compare(results, baseline, tolerance=1.5):
+    """Return list of [n, solver, stage, quantity, ratio] rows for stages
+    where time or peak memory exceeds tolerance times the baseline."""
+    base = {(r["n"], r["density"], r["solver"], r["stage"]): r
+            for r in baseline["results"]}
+    res = []
+    for r in results["results"]:
+        ref = base.get((r["n"], r["density"], r["solver"], r["stage"]))
+        if ref is None:
+            continue
+        for quantity in ["seconds", "peak_bytes"]:
+            if ref[quantity] is None or r[quantity] is None:
+                continue
+            if ref[quantity] > 0 and \
+                    r[quantity] > tolerance * ref[quantity]:
+                res.append([r["n"], r["solver"], r["stage"], quantity,
+                            r[quantity] / ref[quantity]])
+    return res
+
+
+def main():
+    args = parse_arguments()
+    results = {"meta": metadata(), "results": []}
+    for n in args.sizes:
+        results["results"] += benchmark(n, args.density, args.radius,
+                                        args.solver, args.repeat, args.seed)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as fout:
+            fout.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as fin:
+            regressions = compare(results, json.load(fin), args.tolerance)
+        for n, solver, stage, quantity, ratio in regressions:
+            print("Regression: n = %d, %s, %s: %s is %.2f x baseline"
+                  % (n, solver, stage, quantity, ratio), file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,9 @@
 
 """Program for collecting output from IIM runs.
 
+The runs must be written by iim.main in a machine-readable format
+(--format csv, json or npz; the format is given by the file extension).
+
 Structure of input file:
 
 PerturbedSector1 PerturbedSector2 PerturbedSectorN
@@ -18,8 +21,9 @@ FilenameRunN
 
 import argparse
 import csv
-import re
 import numpy as np
+import iim.io as iim_io
+import iim.profile as iim_profile
 from pathlib import Path
 
 
@@ -29,35 +33,32 @@ class IIMCollect:
     """
     def __init__(self):
         self.sectors = []        # list of sectors
-        self.inoperability = []  # inoperability for each sector
+        self.inoperability = []  # inoperability (sectors x runs)
         self.delta = []          # dependency index
         self.delta_overall = []  # overall dependency index
         self.rho = []            # influence gain
         self.rho_overall = []    # overall influence gain
         self.runs = []           # list of IIM runs
 
-    def _read_data_file(self, filename):
-        # Read output file from IIM.
-        self.sectors = []
-        self.delta = []
-        self.rho = []
-        qstar = []
-        with open(filename) as fin:
-            for dummy in range(0, 3):  # ignore header
-                line = fin.readline()
-            line = fin.readline()
-            for dummy in range(0, 3):  # ignore
-                line = fin.readline()
-            for line in fin:
-                pattern = r"(\w+)(\s+)(\d+\.\d*)(\s+)(\d+\.\d*)(\s+)(\d+\.\d*)(\s+)(\d+\.\d*)(\s+)(\d+\.\d*)"
-                match = re.search(pattern, line)
-                self.sectors.append(match.group(1))
-                qstar.append(float(match.group(3)))
-                self.delta.append(float(match.group(5)))
-                self.delta_overall.append(float(match.group(7)))
-                self.rho.append(float(match.group(9)))
-                self.rho_overall.append(float(match.group(11)))
-        self.inoperability.append(qstar)
+    def _read_data_files(self, filenames):
+        # Read output files from IIM and stack the inoperability vectors
+        # column-wise. The indices do not depend on the perturbation and
+        # are taken from the first run.
+        for k, filename in enumerate(filenames):
+            with iim_profile.span("collect.read_results", file=filename):
+                res = iim_io.read_results(filename)
+            if k == 0:
+                self.sectors = res["sectors"]
+                self.delta = res["delta"]
+                self.delta_overall = res["delta_overall"]
+                self.rho = res["rho"]
+                self.rho_overall = res["rho_overall"]
+                self.inoperability = np.zeros(
+                    shape=(len(self.sectors), len(filenames)))
+            elif res["sectors"] != self.sectors:
+                raise RuntimeError("sectors in %s differ from %s"
+                                   % (filename, filenames[0]))
+            self.inoperability[:, k] = res["q"]
 
     def _print_data(self, inputfile):
         # Print collected IIM data.
@@ -65,19 +66,11 @@ class IIMCollect:
         with open(filename, "w", newline="") as fout:
             writer = csv.writer(fout, dialect="excel")
             tmp = ["Sector", "delta", "delta_overall", "rho", "rho_overall"]
-            for i in range(len(self.runs)):
-                tmp.append(self.runs[i])
-            writer.writerow(tmp)
+            writer.writerow(tmp + self.runs)
             for i in range(len(self.sectors)):
-                tmp = []
-                tmp.append(self.sectors[i])
-                tmp.append(self.delta[i])
-                tmp.append(self.delta_overall[i])
-                tmp.append(self.rho[i])
-                tmp.append(self.rho_overall[i])
-                for j in range(len(self.runs)):
-                    tmp.append(self.inoperability[j, i])
-                writer.writerow(tmp)
+                tmp = [self.sectors[i], self.delta[i], self.delta_overall[i],
+                       self.rho[i], self.rho_overall[i]]
+                writer.writerow(tmp + list(self.inoperability[i, :]))
 
     def collect(self, filename):
         """Collect data from each IIM output file."""
@@ -85,11 +78,13 @@ class IIMCollect:
             line = fin.readline()
             for run in line.split():
                 self.runs.append(run)
-            for f in fin:
-                if f and (not f.isspace()):
-                    self._read_data_file(f.rstrip())
-        self.inoperability = np.array(self.inoperability)
-        self._print_data(filename)
+            files = [f.strip() for f in fin if f and (not f.isspace())]
+        if len(files) != len(self.runs):
+            raise RuntimeError("number of runs and output files differ")
+        self._read_data_files(files)
+        with iim_profile.span("collect.write", runs=len(files),
+                              sectors=len(self.sectors)):
+            self._print_data(filename)
 
 
 if __name__ == "__main__":
@@ -99,10 +94,17 @@ if __name__ == "__main__":
                         dest="filename",
                         required=True,
                         help="name of IIM output file")
+    parser.add_argument("--profile",
+                        action="store",
+                        dest="profile",
+                        default=None,
+                        required=False,
+                        help="write profiling spans as JSON to file")
     args = parser.parse_args()
 
     try:
-        model = IIMCollect()
-        model.collect(args.filename)
+        with iim_profile.profiling(args.profile):
+            model = IIMCollect()
+            model.collect(args.filename)
     except Exception as err:
         print("Error: ", err)
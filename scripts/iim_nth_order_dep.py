@@ -11,8 +11,8 @@ interdependency matrix."""
 
 import argparse
 import csv
-import numpy as np
 import iim.iim as iim
+import iim.profile as iim_profile
 from pathlib import Path
 
 
@@ -29,9 +29,17 @@ def parse_arguments():
                         action="store",
                         dest="order",
                         type=int,
+                        nargs="+",
+                        required=False,
+                        default=[1],
+                        help="n-th order interdependency (one or more)")
+    parser.add_argument("-k", "--top",
+                        action="store",
+                        dest="top",
+                        type=int,
                         required=False,
                         default=1,
-                        help="n-th order interdependency")
+                        help="number of largest interdependencies per sector")
     parser.add_argument("-t", "--table",
                         action="store",
                         dest="table",
@@ -46,15 +54,30 @@ def parse_arguments():
                         default="Demand",
                         required=False,
                         help="calculation mode")
+    parser.add_argument("--cache",
+                        action="store",
+                        dest="cache",
+                        default=None,
+                        required=False,
+                        help="directory for cache of prepared models")
+    parser.add_argument("--profile",
+                        action="store",
+                        dest="profile",
+                        default=None,
+                        required=False,
+                        help="write profiling spans as JSON to file")
     return parser.parse_args()
 
 
-def write_aij(inputfile, aij, order):
+def write_aij(inputfile, aij, order, top=1):
     """Write max n-th order interdependencies to CSV file."""
     filename = Path(inputfile).stem + "_" + str(order) + "-order_dep.csv"
     with open(filename, "w", newline="") as fout:
         writer = csv.writer(fout, dialect="excel")
-        aij_str = "max(aj^" + str(order) + ")"
+        if top == 1:
+            aij_str = "max(aj^" + str(order) + ")"
+        else:
+            aij_str = "top" + str(top) + "(aj^" + str(order) + ")"
         tmp = ["i", "j", aij_str]
         writer.writerow(tmp)
         writer.writerows(aij)
@@ -64,9 +87,20 @@ def main():
     args = parse_arguments()
     psector = []
     cvalue = []
-    model = iim.IIM(args.filename, psector, cvalue, args.table, args.mode)
-    aij = model.max_nth_order_interdependency(args.order)
-    write_aij(args.filename, aij, args.order)
+    with iim_profile.profiling(args.profile):
+        with iim_profile.span("main.model"):
+            if args.cache:
+                import iim.cache as iim_cache  # not needed without --cache
+                model = iim_cache.ModelCache(args.cache).get(
+                    args.filename, psector, cvalue, args.table, args.mode)
+            else:
+                model = iim.IIM(
+                    args.filename, psector, cvalue, args.table, args.mode)
+        # Powers are built incrementally.
+        for order in sorted(set(args.order)):
+            with iim_profile.span("main.output", order=order):
+                aij = model.top_nth_order_interdependency(order, args.top)
+                write_aij(args.filename, aij, order, args.top)
 
 
 if __name__ == "__main__":
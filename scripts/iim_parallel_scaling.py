@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Program for measuring the scaling of parallel IIM scenario execution
+on a synthetic A* matrix."""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import iim.iim as iim
+import iim.parallel as iim_parallel
+import iim.synthetic as iim_synthetic
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Measure scaling of parallel IIM scenario execution")
+    parser.add_argument("-n", "--sectors",
+                        action="store",
+                        dest="nsectors",
+                        type=int,
+                        default=5000,
+                        required=False,
+                        help="number of sectors")
+    parser.add_argument("--tasks",
+                        action="store",
+                        dest="ntasks",
+                        type=int,
+                        default=200,
+                        required=False,
+                        help="number of scenarios")
+    parser.add_argument("--nproc",
+                        action="store",
+                        dest="nproc",
+                        type=int,
+                        default=os.cpu_count(),
+                        required=False,
+                        help="maximum number of processes")
+    parser.add_argument("--solver",
+                        action="store",
+                        dest="solver",
+                        choices=["LU", "Inverse"],
+                        default="LU",
+                        required=False,
+                        help="solver for the S matrix")
+    parser.add_argument("--seed",
+                        action="store",
+                        dest="seed",
+                        type=int,
+                        default=42,
+                        required=False,
+                        help="random seed")
+    return parser.parse_args()
+
+
+def top_sectors(model, task):
+    """Return the ten most inoperable sectors of a scenario."""
+    q = iim_parallel.inoperability_task(model, task)
+    indx = np.argsort(q)[::-1][:10]
+    return [(model.get_sectors()[i], float(q[i])) for i in indx]
+
+
+def main():
+    args = parse_arguments()
+    n = args.nsectors
+    sectors = ["S%d" % i for i in range(n)]
+    model = iim.IIM.from_arrays(
+        sectors, iim_synthetic.synthetic_amat(n, seed=args.seed), table_="A",
+        solver_=args.solver, copy_arrays=False)
+    rng = np.random.default_rng(args.seed)
+    tasks = []
+    for _ in range(args.ntasks):
+        psector = list(rng.choice(sectors, size=5, replace=False))
+        tasks.append((psector, list(rng.uniform(0.0, 0.5, size=5))))
+
+    print("Scaling of %d scenarios on %d sectors (%s solver)"
+          % (args.ntasks, n, args.solver))
+    print(60 * "-")
+    print("%-8s\t%-10s\t%-10s\t%-10s" % ("nproc", "Setup (s)", "Run (s)",
+                                         "Speedup"))
+    ref = None
+    base = None
+    for nproc in range(1, args.nproc + 1):
+        start = time.perf_counter()
+        with iim_parallel.ParallelRunner(model, nproc=nproc) as runner:
+            setup = time.perf_counter() - start
+            start = time.perf_counter()
+            res = runner.map(top_sectors, tasks)
+            wall = time.perf_counter() - start
+        if ref is None:
+            ref, base = res, wall
+        elif [r[0][0] for r in res] != [r[0][0] for r in ref]:
+            raise RuntimeError("results differ for nproc = %d" % nproc)
+        print("%-8d\t%-10.3f\t%-10.3f\t%-10.2f"
+              % (nproc, setup, wall, base / wall))
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as err:
+        print("Error: ", err)
+        sys.exit(1)
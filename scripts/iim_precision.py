@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Program for validating reduced-precision IIM results against the 
+double precision results."""
+
+import argparse
+import sys
+import numpy as np
+import iim.iim as iim
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Validate reduced-precision IIM results")
+    parser.add_argument("-f", "--file",
+                        action="store",
+                        dest="filename",
+                        required=True,
+                        help="name of CSV file")
+    parser.add_argument("-s", "--sector",
+                        action="append",
+                        dest="psector",
+                        default=[],
+                        help="name of perturbed sector")
+    parser.add_argument("-c", "--cvalue",
+                        action="append",
+                        dest="cvalue",
+                        type=float,
+                        default=[],
+                        help="fraction of perturbation [0-1]")
+    parser.add_argument("-t", "--table",
+                        action="store",
+                        dest="table",
+                        choices=["IO", "A"],
+                        default="IO",
+                        required=False,
+                        help="type of input-output table")
+    parser.add_argument("-m", "--mode",
+                        action="store",
+                        dest="mode",
+                        choices=["Demand", "Supply"],
+                        default="Demand",
+                        required=False,
+                        help="calculation mode")
+    parser.add_argument("--precision",
+                        action="store",
+                        dest="precision",
+                        choices=["float32"],
+                        default="float32",
+                        required=False,
+                        help="reduced precision to validate")
+    parser.add_argument("--tol",
+                        action="store",
+                        dest="tol",
+                        type=float,
+                        default=1.0e-6,
+                        required=False,
+                        help="tolerance on max error relative to max value")
+    return parser.parse_args()
+
+
+def compare(ref, model):
+    """Return list of [quantity, max abs error, max rel error] rows."""
+    res = []
+    for name in ["inoperability", "dependency", "overall_dependency",
+                 "influence", "overall_influence"]:
+        x = getattr(ref, name)()
+        y = getattr(model, name)()
+        err = np.abs(x - y).max(initial=0.0)
+        scale = np.abs(x).max(initial=0.0)
+        res.append([name, err, err / scale if scale > 0.0 else err])
+    return res
+
+
+def main():
+    args = parse_arguments()
+    if len(args.psector) != len(args.cvalue):
+        raise RuntimeError("psector and cvalue have different sizes")
+    ref = iim.IIM(args.filename, args.psector, args.cvalue, args.table,
+                  args.mode)
+    model = iim.IIM(args.filename, args.psector, args.cvalue, args.table,
+                    args.mode, "LU", args.precision)
+    print("Validation of %s against float64 (tolerance %.1e)"
+          % (args.precision, args.tol))
+    print(60 * "-")
+    print("%-20s\t%-12s\t%-12s" % ("Quantity", "Max abs err", "Max rel err"))
+    passed = True
+    for name, err, rel in compare(ref, model):
+        print("%-20s\t%.6e\t%.6e" % (name, err, rel))
+        passed = passed and rel <= args.tol
+    print(60 * "-")
+    print("PASSED" if passed else "FAILED")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as err:
+        print("Error: ", err)
+        sys.exit(1)
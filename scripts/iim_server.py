@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Program for serving IIM queries from models kept in memory."""
+
+import iim.server as iim_server
+
+
+if __name__ == "__main__":
+    try:
+        iim_server.main()
+    except KeyboardInterrupt:
+        pass
+    except Exception as err:
+        print("Error: ", err)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+"""Program for measuring IIM startup time.
+
+Each repetition runs a fresh Python interpreter that imports iim.main and
+then computes the first result (model setup, inoperability and indices)
+for the given input file. The import and first-result latencies are
+written as JSON, and the program fails if the median import time exceeds
+the given limit.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import iim.main
+import iim.iim as iim
+t1 = time.perf_counter()
+model = iim.IIM(sys.argv[1], [], [], sys.argv[2], sys.argv[3])
+q = model.inoperability()
+d = model.dependency(), model.overall_dependency()
+r = model.influence(), model.overall_influence()
+t2 = time.perf_counter()
+heavy = [m for m in ["pandas", "matplotlib"] if m in sys.modules]
+print(json.dumps({"import": t1 - t0, "first_result": t2 - t1,
+                  "heavy_modules": heavy}))
+"""
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Measure IIM startup time")
+    parser.add_argument("-f", "--file",
+                        action="store",
+                        dest="filename",
+                        required=True,
+                        help="name of CSV file")
+    parser.add_argument("-t", "--table",
+                        action="store",
+                        dest="table",
+                        choices=["IO", "A"],
+                        default="IO",
+                        required=False,
+                        help="type of input-output table")
+    parser.add_argument("-m", "--mode",
+                        action="store",
+                        dest="mode",
+                        choices=["Demand", "Supply"],
+                        default="Demand",
+                        required=False,
+                        help="calculation mode")
+    parser.add_argument("-r", "--repeat",
+                        action="store",
+                        dest="repeat",
+                        type=int,
+                        default=5,
+                        required=False,
+                        help="number of fresh interpreters")
+    parser.add_argument("--max-import",
+                        action="store",
+                        dest="max_import",
+                        type=float,
+                        default=None,
+                        required=False,
+                        help="maximum median import time in seconds")
+    parser.add_argument("-o", "--output",
+                        action="store",
+                        dest="output",
+                        default=None,
+                        required=False,
+                        help="name of JSON output file")
+    return parser.parse_args()
+
+
+def measure(filename, table="IO", mode="Demand", repeat=5):
+    """Return startup timings from repeat fresh interpreters."""
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE, filename, table, mode],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True)
+        runs.append(json.loads(out.stdout))
+    res = {"filename": filename, "repeat": repeat, "runs": runs}
+    for key in ["import", "first_result"]:
+        res[key + "_median"] = statistics.median(r[key] for r in runs)
+        res[key + "_min"] = min(r[key] for r in runs)
+    res["heavy_modules"] = sorted(set(m for r in runs
+                                      for m in r["heavy_modules"]))
+    return res
+
+
+def main():
+    args = parse_arguments()
+    res = measure(args.filename, args.table, args.mode, args.repeat)
+    text = json.dumps(res, indent=2)
+    if args.output:
+        with open(args.output, "w") as fout:
+            fout.write(text + "\n")
+    else:
+        print(text)
+    if args.max_import is not None and res["import_median"] > args.max_import:
+        print("Error:  median import time %.3f s exceeds %.3f s"
+              % (res["import_median"], args.max_import))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,12 +26,14 @@ setuptools.setup(
     packages=setuptools.find_packages(),
     install_requires=[req for req in requirements if req[:2] != "# "],
     scripts=["scripts/iim_run.py", "scripts/iim_collect.py", 
-             "scripts/iim_nth_order_dep.py"],
+             "scripts/iim_nth_order_dep.py", "scripts/iim_precision.py",
+             "scripts/iim_startup.py", "scripts/iim_parallel_scaling.py",
+             "scripts/iim_server.py", "scripts/iim_benchmark.py"],
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.8',
 )
 
@@ -0,0 +1,59 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import copy
+import os
+import tempfile
+import iim.iim as iim
+import iim.synthetic as iim_synthetic
+import numpy as np
+import scipy.sparse
+import scripts.iim_benchmark as iim_benchmark
+import unittest
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_synthetic_table(self):
+        for density in [1.0, 0.05]:
+            sectors, io_table, xoutput = iim_synthetic.synthetic_io_table(
+                600, density, 0.7, seed=1)
+            self.assertEqual(scipy.sparse.issparse(io_table), density < 1.0)
+            model = iim.IIM.from_arrays(sectors, io_table, xoutput)
+            astar = model.get_interdependency_matrix()
+            self.assertAlmostEqual(
+                iim_synthetic.spectral_radius(astar), 0.7, places=6)
+            if density < 1.0:
+                self.assertAlmostEqual(
+                    io_table.nnz / 600.0**2, density, places=3)
+
+    def test_write_io_table(self):
+        sectors, io_table, xoutput = iim_synthetic.synthetic_io_table(
+            40, 0.2, 0.5, seed=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "table.csv")
+            iim_synthetic.write_io_table(fname, sectors, io_table, xoutput,
+                                         chunk_rows=7)
+            model = iim.IIM(fname, [], [], "IO", "Demand")
+        self.assertEqual(list(model.get_sectors()), sectors)
+        self.assertTrue(np.array_equal(model.io_table, io_table.toarray()))
+        self.assertTrue(np.array_equal(model.get_xoutput(), xoutput))
+
+    def test_benchmark(self):
+        res = iim_benchmark.benchmark(20, repeat=1)
+        self.assertEqual([r["stage"] for r in res], iim_benchmark.STAGES)
+        self.assertTrue(all(r["seconds"] > 0.0 for r in res))
+        self.assertTrue(all(r["peak_bytes"] > 0 for r in res))
+        results = {"meta": iim_benchmark.metadata(), "results": res}
+        self.assertEqual(iim_benchmark.compare(results, results), [])
+        baseline = copy.deepcopy(results)
+        baseline["results"][2]["seconds"] = res[2]["seconds"] / 3.0
+        regressions = iim_benchmark.compare(results, baseline, 2.0)
+        self.assertEqual([r[2:4] for r in regressions],
+                         [["factorize", "seconds"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import tempfile
+import iim.iim as iim
+import iim.cache as iim_cache
+import numpy as np
+import unittest
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join("examples", "ssb_io.csv")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_warm_start(self):
+        cache = iim_cache.ModelCache(self.tmpdir.name)
+        for solver in ["LU", "Inverse", "SparseLU", "Krylov"]:
+            ref = iim.IIM(self.fname, ["RD"], [0.1], "IO", "Demand", solver)
+            cold = cache.get(self.fname, ["RD"], [0.1], "IO", "Demand", solver)
+            warm = cache.get(self.fname, ["RD"], [0.1], "IO", "Demand", solver)
+            for model in [cold, warm]:
+                self.assertTrue(np.array_equal(
+                    model.get_sectors(), ref.get_sectors()))
+                self.assertTrue(np.allclose(
+                    model.inoperability(), ref.inoperability()))
+                self.assertTrue(np.allclose(
+                    model.overall_influence(), ref.overall_influence()))
+                self.assertEqual(model.max_nth_order_interdependency(2),
+                                 ref.max_nth_order_interdependency(2))
+        self.assertEqual(len(cache.entries()), 4)
+
+    def test_single_precision(self):
+        cache = iim_cache.ModelCache(self.tmpdir.name)
+        ref = iim.IIM(self.fname, ["RD"], [0.1], "IO", "Demand")
+        for _ in range(2):
+            model = cache.get(
+                self.fname, ["RD"], [0.1], "IO", "Demand", "LU", "float32")
+            self.assertEqual(model.astar.dtype, np.float32)
+            self.assertTrue(np.allclose(
+                model.inoperability(), ref.inoperability(), rtol=1.0e-6))
+
+    def test_key(self):
+        cache = iim_cache.ModelCache(self.tmpdir.name)
+        k1 = cache.key(self.fname, "IO", "Demand")
+        self.assertEqual(k1, cache.key(self.fname, "IO", "Demand"))
+        self.assertNotEqual(k1, cache.key(self.fname, "IO", "Supply"))
+        fname = os.path.join(self.tmpdir.name, "table.csv")
+        with open(fname, "w") as fout:
+            fout.write("Sector1,Sector2\n0.0,0.8\n0.2,0.0\n")
+        k2 = cache.key(fname, "A", "Demand")
+        with open(fname, "w") as fout:
+            fout.write("Sector1,Sector2\n0.0,0.7\n0.2,0.0\n")
+        self.assertNotEqual(k2, cache.key(fname, "A", "Demand"))
+
+    def test_eviction(self):
+        cache = iim_cache.ModelCache(self.tmpdir.name)
+        cache.get(self.fname, [], [], "IO", "Demand")
+        size = cache.size()
+        cache.max_bytes = int(1.5 * size)
+        cache.get(self.fname, [], [], "IO", "Supply")
+        keys = [key for key, _ in cache.entries()]
+        self.assertEqual(keys, [cache.key(self.fname, "IO", "Supply")])
+        cache.clear()
+        self.assertEqual(cache.entries(), [])
+
+    def test_corrupt_entry(self):
+        cache = iim_cache.ModelCache(self.tmpdir.name)
+        cache.get(self.fname, [], [], "IO", "Demand")
+        key = cache.key(self.fname, "IO", "Demand")
+        os.remove(os.path.join(self.tmpdir.name, key, "astar.npy"))
+        self.assertIsNone(cache.load(key))
+        model = cache.get(self.fname, ["RD"], [0.1], "IO", "Demand")
+        self.assertTrue(model.inoperability().max() > 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,10 +6,47 @@
 
 import os
 import iim.iim as iim
+import iim.solver as iim_solver
 import numpy as np
+import scipy.sparse
 import unittest
 
 
+def _loop_tech_coeff(io_table, xoutput):
+    # Reference element-wise construction of the A matrix.
+    n = len(xoutput)
+    amat = np.zeros(shape=(n, n))
+    for i in range(n):
+        for j in range(n):
+            if xoutput[j] != 0.0:
+                amat[i, j] = io_table[i, j] / xoutput[j]
+    return amat
+
+
+def _loop_astar_demand(io_table, xoutput):
+    # Reference element-wise construction of the demand-driven A* matrix.
+    n = len(xoutput)
+    astar = np.zeros(shape=(n, n))
+    for i in range(n):
+        for j in range(n):
+            if xoutput[i] != 0.0:
+                astar[i, j] = io_table[i, j] / xoutput[i]
+    return astar
+
+
+def _loop_offdiag_sums(mat):
+    # Reference off-diagonal row and column sums.
+    n = mat.shape[0]
+    rows = np.zeros(n)
+    cols = np.zeros(n)
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                rows[i] += mat[i, j]
+                cols[j] += mat[i, j]
+    return rows, cols
+
+
 class TestIIM(unittest.TestCase):
     def test_case1(self):
         # Correct answer (Haimes & Jiang, 2001):
@@ -102,6 +139,365 @@ class TestIIM(unittest.TestCase):
 
         self.assertTrue(np.allclose(a_ans, amat, atol=0.015))
 
+    def test_vectorized_construction(self):
+        fnames = [os.path.join("tests", "test_case4.csv"),
+                  os.path.join("examples", "ssb_io.csv")]
+        for fname in fnames:
+            for mode in ["Demand", "Supply"]:
+                model = iim.IIM(fname, [], [], "IO", mode)
+                x = model.get_xoutput()
+                amat = _loop_tech_coeff(model.io_table, x)
+                self.assertTrue(np.array_equal(model.get_tech_coeff(), amat))
+                if mode == "Demand":
+                    astar = _loop_astar_demand(model.io_table, x)
+                else:
+                    astar = np.transpose(amat)
+                self.assertTrue(
+                    np.array_equal(model.get_interdependency_matrix(), astar))
+
+    def test_vectorized_construction_table_a(self):
+        for k in range(1, 4):
+            fname = os.path.join("tests", "test_case%d.csv" % k)
+            model = iim.IIM(fname, [], [], "A", "Demand")
+            self.assertTrue(np.array_equal(
+                model.get_interdependency_matrix(), model.io_table))
+            self.assertTrue(np.array_equal(
+                model.get_tech_coeff(), np.zeros((len(model), len(model)))))
+
+    def test_solver_equivalence(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        psector = ["RD", "R49"]
+        cvalue = [0.1, 0.3]
+        inv = iim.IIM(fname, psector, cvalue, "IO", "Demand", "Inverse")
+        lu = iim.IIM(fname, psector, cvalue, "IO", "Demand", "LU")
+        self.assertTrue(np.allclose(inv.smat, lu.smat))
+        self.assertTrue(np.allclose(inv.inoperability(), lu.inoperability()))
+        self.assertTrue(np.allclose(
+            inv.overall_dependency(), lu.overall_dependency()))
+        self.assertTrue(np.allclose(
+            inv.overall_influence(), lu.overall_influence()))
+
+    def test_solver_diagonal(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        model = iim.IIM(fname, [], [], "IO", "Demand", "LU")
+        model.solver.block_size = 7  # exercise partial blocks
+        smat = np.linalg.inv(np.identity(len(model)) - model.astar)
+        self.assertTrue(np.allclose(model.solver.diagonal(), np.diag(smat)))
+
+    def test_unknown_solver(self):
+        fname = os.path.join("tests", "test_case1.csv")
+        with self.assertRaises(RuntimeError):
+            iim.IIM(fname, [], [], "A", "Demand", "QR")
+
+    def test_inoperability_batch(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        model = iim.IIM(fname, [], [], "IO", "Demand")
+        n = len(model)
+        rng = np.random.default_rng(1)
+        cstar = rng.random((25, n)) * (rng.random((25, n)) < 0.1)
+        qans = []
+        for c in cstar:
+            model.cstar = c
+            qans.append(model.inoperability())
+        qans = np.array(qans)
+        self.assertTrue(np.allclose(model.inoperability_batch(cstar), qans))
+        self.assertTrue(np.allclose(
+            model.inoperability_batch(cstar, chunk_size=7), qans))
+        self.assertTrue(np.allclose(model.inoperability_batch(
+            scipy.sparse.csr_matrix(cstar), chunk_size=4), qans))
+        chunks = list(model.iter_inoperability_batch(cstar, chunk_size=10))
+        self.assertEqual([len(q) for q in chunks], [10, 10, 5])
+
+    def test_inoperability_batch_clipping(self):
+        fname = os.path.join("tests", "test_case2.csv")
+        model = iim.IIM(fname, ["Sector2"], [0.5], "A", "Demand")
+        cstar = np.array([[0.0, 0.5, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0]])
+        q = model.inoperability_batch(cstar)
+        self.assertTrue(np.allclose(q[0], model.inoperability()))
+        self.assertTrue(np.all(q <= 1.0))
+        with self.assertRaises(RuntimeError):
+            model.inoperability_batch(np.zeros((2, 3)))
+
+    def test_from_arrays(self):
+        fname = os.path.join("tests", "test_case4.csv")
+        model = iim.IIM(fname, ["Rail"], [0.2], "IO", "Demand")
+        table = np.loadtxt(fname, delimiter=",", skiprows=1)
+        sectors = ["Electric", "Rail", "Water", "Gas"]
+        arr = iim.IIM.from_arrays(
+            sectors, table[:-1, :], table[-1, :], ["Rail"], [0.2])
+        self.assertTrue(np.array_equal(arr.get_sectors(), sectors))
+        self.assertTrue(np.array_equal(
+            arr.get_interdependency_matrix(),
+            model.get_interdependency_matrix()))
+        self.assertTrue(
+            np.allclose(arr.inoperability(), model.inoperability()))
+        with self.assertRaises(RuntimeError):
+            iim.IIM.from_arrays(sectors, table[:-1, :])
+        with self.assertRaises(RuntimeError):
+            iim.IIM.from_arrays(sectors, table, table[-1, :])
+
+    def test_with_perturbation(self):
+        fname = os.path.join("tests", "test_case1.csv")
+        model = iim.IIM(fname, [], [], "A", "Demand")
+        view = model.with_perturbation(["Sector2"], [0.6])
+        self.assertIs(view.astar, model.astar)
+        self.assertIs(view.solver, model.solver)
+        self.assertTrue(np.allclose(view.inoperability(), [0.571, 0.714],
+                                    atol=0.001))
+        self.assertTrue(np.allclose(model.inoperability(), [0.0, 0.0]))
+        with self.assertRaises(ValueError):
+            model.astar[0, 0] = 1.0
+
+    def test_sector_indices(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        model = iim.IIM(fname, ["RD"], [0.1], "IO", "Demand", "Inverse")
+        n = len(model)
+        rows, cols = _loop_offdiag_sums(model.astar)
+        self.assertTrue(np.allclose(model.dependency(), rows / (n - 1.0)))
+        self.assertTrue(np.allclose(model.influence(), cols / (n - 1.0)))
+        rows, cols = _loop_offdiag_sums(model.smat)
+        self.assertTrue(np.allclose(
+            model.overall_dependency(), rows / (n - 1.0)))
+        self.assertTrue(np.allclose(
+            model.overall_influence(), cols / (n - 1.0)))
+
+        df = model.get_many()
+        self.assertEqual(len(df), n)
+        for sector in ["RD", "R49"]:
+            i = model.get_sectors().get_loc(sector)
+            ans = [model.inoperability()[i], model.dependency()[i],
+                   model.overall_dependency()[i], model.influence()[i],
+                   model.overall_influence()[i]]
+            self.assertTrue(np.allclose(model.get(sector), ans))
+            self.assertTrue(np.allclose(df.loc[sector].values, ans))
+        self.assertEqual(list(model.get_many(["R49"]).index), ["R49"])
+
+    def test_sector_indices_cache(self):
+        fname = os.path.join("tests", "test_case1.csv")
+        model = iim.IIM(fname, [], [], "A", "Demand")
+        self.assertEqual(model.get("Sector1")[0], 0.0)
+        view = model.with_perturbation(["Sector2"], [0.6])
+        self.assertAlmostEqual(view.get("Sector1")[0], 0.571, places=3)
+        self.assertEqual(model.get("Sector1")[0], 0.0)
+        model.clear_cache()
+        self.assertEqual(model.get("Sector2")[1:], view.get("Sector2")[1:])
+
+    def test_sparse_solvers(self):
+        fnames = [os.path.join("tests", "test_case4.csv"),
+                  os.path.join("examples", "ssb_io.csv")]
+        for fname in fnames:
+            for mode in ["Demand", "Supply"]:
+                sectors = list(iim.IIM(fname, [], [], "IO", mode).sectors)
+                psector = sectors[1:3]
+                cvalue = [0.1, 0.2]
+                dense = iim.IIM(fname, psector, cvalue, "IO", mode)
+                for solver in ["SparseLU", "Krylov", "Neumann"]:
+                    model = iim.IIM(fname, psector, cvalue, "IO", mode, solver)
+                    self.assertTrue(scipy.sparse.issparse(model.astar))
+                    self.assertTrue(np.allclose(
+                        model.astar.toarray(), dense.astar))
+                    self.assertTrue(np.allclose(
+                        model.inoperability(), dense.inoperability()))
+                    for index in ["dependency", "influence",
+                                  "overall_dependency", "overall_influence"]:
+                        self.assertTrue(np.allclose(
+                            getattr(model, index)(), getattr(dense, index)()))
+
+    def test_sparse_from_arrays(self):
+        n = 300
+        rng = np.random.default_rng(2)
+        table = scipy.sparse.random(n, n, density=0.02, random_state=rng)
+        xoutput = 2.0 * np.asarray(table.sum(axis=0)).ravel() + 1.0
+        sectors = ["S%d" % i for i in range(n)]
+        cstar = np.zeros((3, n))
+        cstar[0, 5] = 0.3
+        cstar[1, 17] = 0.1
+        cstar[2, [4, 9]] = 0.2
+        dense = iim.IIM.from_arrays(sectors, table.toarray(), xoutput)
+        qans = dense.inoperability_batch(cstar)
+        for solver in ["SparseLU", "Krylov"]:
+            model = iim.IIM.from_arrays(
+                sectors, table, xoutput, solver_=solver)
+            self.assertTrue(
+                np.allclose(model.inoperability_batch(cstar), qans))
+            self.assertTrue(np.allclose(
+                model.overall_influence(), dense.overall_influence()))
+
+    def test_diagonal_size_limit(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        for solver in ["Krylov", "Neumann"]:
+            model = iim.IIM(fname, ["RD"], [0.1], "IO", "Demand", solver)
+            model.solver.max_diagonal_size = len(model) - 1
+            with self.assertRaises(RuntimeError):
+                model.overall_dependency()
+            self.assertTrue(np.all(model.inoperability() >= 0.0))
+
+    def test_propagation(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        model = iim.IIM(fname, ["RD", "R49"], [0.1, 0.3], "IO", "Demand")
+        terms = model.propagation(tol=1.0e-14)
+        self.assertTrue(np.array_equal(terms[0], model.cstar))
+        self.assertTrue(np.allclose(terms[1], model.astar @ model.cstar))
+        self.assertTrue(np.allclose(
+            terms.sum(axis=0), model.solver.solve(model.cstar)))
+        terms = model.propagation(max_order=2)
+        self.assertEqual(terms.shape, (3, len(model)))
+
+        model = iim.IIM(fname, [], [], "IO", "Demand")
+        self.assertEqual(model.propagation().shape, (1, len(model)))
+
+    def test_single_precision(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        psector = ["RD", "R49"]
+        cvalue = [0.1, 0.3]
+        ref = iim.IIM(fname, psector, cvalue, "IO", "Demand")
+        model = iim.IIM(fname, psector, cvalue, "IO", "Demand", "LU",
+                        "float32")
+        self.assertEqual(model.astar.dtype, np.float32)
+        self.assertEqual(model.solver.lu_piv[0].dtype, np.float32)
+        for name in ["inoperability", "dependency", "overall_dependency",
+                     "influence", "overall_influence"]:
+            x = getattr(ref, name)()
+            y = getattr(model, name)()
+            self.assertEqual(y.dtype, np.float64)
+            self.assertTrue(
+                np.abs(x - y).max() <= 1.0e-6 * np.abs(x).max())
+        cstar = np.random.default_rng(3).random((4, len(model))) * 0.1
+        self.assertTrue(np.allclose(
+            model.inoperability_batch(cstar),
+            ref.inoperability_batch(cstar), rtol=1.0e-6, atol=1.0e-9))
+        with self.assertRaises(RuntimeError):
+            iim.IIM(fname, [], [], "IO", "Demand", "Krylov", "float32")
+        with self.assertRaises(RuntimeError):
+            iim.IIM(fname, [], [], "IO", "Demand", "LU", "float16")
+
+    def test_sensitivity(self):
+        fname = os.path.join("tests", "test_case3.csv")
+        model = iim.IIM(fname, ["SectorB", "SectorC"], [0.1, 0.2], "A",
+                        "Demand")
+        weights = np.array([1.0, 2.0, 0.5])
+        grad = model.inoperability_gradient(weights)
+        # Central finite differences of the weighted inoperability.
+        h = 1.0e-6
+        astar = model.get_interdependency_matrix()
+        fd = np.zeros(grad.shape)
+        for i in range(len(model)):
+            for j in range(len(model)):
+                fval = []
+                for step in [h, -h]:
+                    amat = np.array(astar)
+                    amat[i, j] += step
+                    pert = iim.IIM.from_arrays(
+                        model.get_sectors(), amat, None,
+                        ["SectorB", "SectorC"], [0.1, 0.2], "A")
+                    fval.append(weights @ pert.inoperability())
+                fd[i, j] = (fval[0] - fval[1]) / (2.0 * h)
+        self.assertTrue(np.allclose(grad, fd, atol=1.0e-7))
+
+        top = model.top_sensitivities(4, weights)
+        flat = np.argsort(-np.abs(grad).ravel(), kind="stable")[:4]
+        self.assertTrue(np.allclose([r[3] for r in top],
+                                    grad.ravel()[flat]))
+        top = model.top_sensitivities(20, weights, nonzero=True,
+                                      block_size=2)
+        nnz = np.count_nonzero(astar)
+        self.assertEqual(len(top), nnz)
+        self.assertTrue(all(r[2] != 0.0 for r in top))
+
+    def test_sensitivity_clipping(self):
+        fname = os.path.join("tests", "test_case3.csv")
+        model = iim.IIM(fname, ["SectorA"], [1.0], "A", "Demand")
+        q = model.inoperability()
+        grad = model.inoperability_gradient()
+        self.assertEqual(q[0], 1.0)
+        # The saturated sector does not contribute to the gradient.
+        ref = np.outer(model.solver.solve_transpose((q < 1.0) * 1.0),
+                       model.solver.solve(model.cstar))
+        self.assertTrue(np.allclose(grad, ref))
+
+    def test_low_rank_update(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        rng = np.random.default_rng(7)
+        for solver in ["LU", "Inverse", "SparseLU", "Krylov"]:
+            original = iim.IIM(fname, ["RD", "R49"], [0.1, 0.2], "IO",
+                               "Demand", solver)
+            qorig = original.inoperability()
+            view = original.with_perturbation(["RD"], [0.1])
+            qview = view.inoperability()
+            original.max_update_rank = 3
+            sectors = original.get_sectors()
+            n = len(sectors)
+            astar = original.get_interdependency_matrix()
+            astar = np.array(astar.toarray() if solver in ["SparseLU",
+                                                            "Krylov"]
+                             else astar)
+            astar0 = astar.copy()
+            model = original.update_interdependency("RD", "R49", 0.05)
+            astar[sectors.index("RD"), sectors.index("R49")] = 0.05
+            row = astar[3, :] * 0.5
+            model = model.update_interdependency_row(sectors[3], row)
+            astar[3, :] = row
+            col = rng.random(n) * 0.01
+            model = model.update_interdependency_column(sectors[5], col)
+            astar[:, 5] = col
+            self.assertEqual(model.refactorizations, 0)
+            self.assertEqual(model.solver.rank, 3)
+            u = rng.random((n, 2)) * 1.0e-3
+            v = rng.random((n, 2)) * 1.0e-3
+            updated = model.low_rank_update(u, v)
+            astar += u @ v.T
+            self.assertEqual(updated.refactorizations, 1)
+            self.assertEqual(model.refactorizations, 0)
+
+            ref = iim.IIM.from_arrays(sectors, astar, None, ["RD", "R49"],
+                                      [0.1, 0.2], "A", "Demand", solver)
+            self.assertTrue(np.allclose(updated.inoperability(),
+                                        ref.inoperability()))
+            self.assertTrue(np.allclose(updated.overall_influence(),
+                                        ref.overall_influence()))
+            self.assertTrue(np.allclose(updated.dependency(),
+                                        ref.dependency()))
+
+            # The original model and its views are not changed.
+            self.assertTrue(np.array_equal(original.inoperability(), qorig))
+            self.assertTrue(np.array_equal(view.inoperability(), qview))
+            aorig = original.get_interdependency_matrix()
+            if solver in ["SparseLU", "Krylov"]:
+                aorig = aorig.toarray()
+            self.assertTrue(np.array_equal(aorig, astar0))
+            self.assertNotIsInstance(original.solver,
+                                     iim_solver.LowRankUpdateSolver)
+
+    def test_low_rank_update_woodbury(self):
+        fname = os.path.join("tests", "test_case3.csv")
+        model = iim.IIM(fname, ["SectorC"], [0.12], "A", "Demand")
+        model = model.update_interdependency("SectorA", "SectorB", 0.1)
+        model = model.update_interdependency("SectorC", "SectorA", 0.0)
+        self.assertEqual(model.solver.rank, 2)
+        self.assertTrue(model.drift <= model.drift_tol)
+        astar = np.array([[0.0, 0.1, 0.3], [0.4, 0.0, 0.0], [0.0, 0.6, 0.0]])
+        self.assertTrue(np.allclose(model.get_interdependency_matrix(), astar))
+        smat = np.linalg.inv(np.identity(3) - astar)
+        self.assertTrue(np.allclose(model.smat, smat))
+        self.assertTrue(np.allclose(model.solver.solve_transpose(np.ones(3)),
+                                    smat.sum(axis=0)))
+
+    def test_key_sector_sweep(self):
+        fname = os.path.join("tests", "test_case3.csv")
+        for solver in ["LU", "Inverse", "SparseLU"]:
+            model = iim.IIM(fname, [], [], "A", "Demand", solver)
+            rows = model.key_sector_sweep([0.5, 1.0], block_size=2)
+            self.assertEqual(len(rows), 2 * len(model))
+            for sector, mag, qtot, qmax, smax in rows:
+                q = model.with_perturbation([sector], [mag]).inoperability()
+                self.assertAlmostEqual(qtot, q.sum())
+                self.assertAlmostEqual(qmax, q.max())
+                self.assertEqual(smax, model.get_sectors()[np.argmax(q)])
+            for mag in [0.5, 1.0]:
+                qtot = [r[2] for r in rows if r[1] == mag]
+                self.assertEqual(qtot, sorted(qtot, reverse=True))
+            self.assertEqual(max(r[3] for r in rows), 1.0)  # clipped
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,100 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import tempfile
+import iim.iim as iim
+import iim.dynamic as iim_dynamic
+import numpy as np
+import unittest
+
+
+class TestDynamic(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        fname = os.path.join("examples", "ssb_io.csv")
+        self.model = iim.IIM(fname, ["RD", "R49"], [0.1, 0.2], "IO",
+                             "Demand")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_steady_state(self):
+        n = len(self.model)
+        diim = iim_dynamic.DynamicIIM(self.model, 0.5)
+        res = diim.run(np.zeros(n), 200, cstar=self.model.cstar)
+        self.assertTrue(np.allclose(res.q[0], self.model.inoperability()))
+
+    def test_recovery(self):
+        n = len(self.model)
+        rng = np.random.default_rng(1)
+        q0 = rng.random((3, n)) * 0.5
+        kvalue = rng.uniform(0.1, 0.9, n)
+        diim = iim_dynamic.DynamicIIM(self.model, kvalue)
+        fname = os.path.join(self.tmpdir.name, "traj.npy")
+        res = diim.run(q0, 20, trajectory=fname, every=5, dtype=np.float64)
+
+        # Reference with all steps kept in memory.
+        astar = self.model.get_interdependency_matrix()
+        qs = [q0]
+        for _ in range(20):
+            q = qs[-1]
+            qs.append(np.clip(q + kvalue * (q @ astar.T - q), 0.0, 1.0))
+        qs = np.array(qs)
+        traj = np.load(fname)
+        self.assertEqual(traj.shape, (5, 3, n))
+        self.assertTrue(np.allclose(traj, qs[::5]))
+        self.assertTrue(np.allclose(res.q, qs[-1]))
+        integral = 0.5 * (qs[:-1] + qs[1:]).sum(axis=0)
+        self.assertTrue(np.allclose(res.integral, integral))
+        self.assertTrue(np.allclose(
+            res.total_loss(), integral @ self.model.get_xoutput()))
+        first = np.argmax(qs <= 1.0e-3, axis=0)
+        never = ~np.any(qs <= 1.0e-3, axis=0)
+        self.assertTrue(np.array_equal(res.recovery_step,
+                                       np.where(never, -1, first)))
+
+    def test_time_varying_cstar(self):
+        n = len(self.model)
+        diim = iim_dynamic.DynamicIIM(self.model, 0.3)
+
+        def pulse(t):
+            return self.model.cstar if t < 5 else np.zeros(n)
+
+        gen = (pulse(t) for t in range(10))
+        res1 = diim.run(np.zeros((2, n)), 10, cstar=pulse)
+        res2 = diim.run(np.zeros((2, n)), 10, cstar=gen)
+        self.assertTrue(np.array_equal(res1.q, res2.q))
+        self.assertTrue(np.all(res1.integral >= 0.0))
+        self.assertTrue(res1.integral.sum() > 0.0)
+        with self.assertRaises(RuntimeError):
+            diim.run(np.zeros(n), 11, cstar=(pulse(t) for t in range(10)))
+        with self.assertRaises(RuntimeError):
+            iim_dynamic.DynamicIIM(self.model, 1.5)
+
+    def test_constant_cstar_list(self):
+        n = len(self.model)
+        diim = iim_dynamic.DynamicIIM(self.model, 0.3)
+        cstar = list(self.model.cstar)
+        res1 = diim.run(np.zeros(n), 10, cstar=cstar)
+        res2 = diim.run(np.zeros(n), 10, cstar=self.model.cstar)
+        self.assertGreater(res1.q.sum(), 0.0)
+        self.assertTrue(np.array_equal(res1.q, res2.q))
+        res3 = diim.run(np.zeros((2, n)), 10, cstar=[cstar, cstar])
+        self.assertTrue(np.allclose(res3.q[1], res2.q[0]))
+        with self.assertRaises(RuntimeError):
+            diim.run(np.zeros(n), 10, cstar=[0.1, 0.2])
+
+    def test_resilience_coefficients(self):
+        astar = np.array([[0.5, 0.0], [0.0, 0.0]])
+        k = iim_dynamic.resilience_coefficients(
+            [0.5, 0.5], [0.005, 0.05], [10.0, 5.0], astar)
+        self.assertTrue(np.allclose(
+            k, [np.log(100.0) / 5.0, np.log(10.0) / 5.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import csv
+import os
+import tempfile
+import iim.iim as iim
+import iim.io as iim_io
+import iim.main as iim_main
+import numpy as np
+import scripts.iim_collect as iim_collect
+import unittest
+
+
+class TestIO(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join("examples", "ssb_io.csv")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_results_roundtrip(self):
+        model = iim.IIM(self.fname, ["RD"], [0.1], "IO", "Demand")
+        results = iim_io.collect_results(model)
+        for fmt in ["csv", "json", "npz"]:
+            fname = os.path.join(self.tmpdir.name, "run." + fmt)
+            iim_io.write_results(results, fmt, fname)
+            res = iim_io.read_results(fname)
+            self.assertEqual(res["sectors"], results["sectors"])
+            for k in iim_io.RESULT_FIELDS:
+                self.assertTrue(np.array_equal(res[k], results[k]))
+            if fmt != "csv":
+                self.assertEqual(res["psector"], ["RD"])
+                self.assertEqual(res["mode"], "Demand")
+        with self.assertRaises(RuntimeError):
+            iim_io.write_results(results, "npz")
+
+    def test_collect(self):
+        runs = ["RD", "R49", "R01"]
+        qans = []
+        with open(os.path.join(self.tmpdir.name, "runs.txt"), "w") as fout:
+            fout.write(" ".join(runs) + "\n")
+            for run, fmt in zip(runs, ["npz", "json", "csv"]):
+                model = iim.IIM(self.fname, [run], [0.1], "IO", "Demand")
+                qans.append(model.inoperability())
+                fname = os.path.join(self.tmpdir.name, run + "." + fmt)
+                iim_io.write_results(
+                    iim_io.collect_results(model), fmt, fname)
+                fout.write(fname + "\n")
+
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            collector = iim_collect.IIMCollect()
+            collector.collect("runs.txt")
+            with open("runs.csv", newline="") as fin:
+                rows = list(csv.reader(fin))
+        finally:
+            os.chdir(cwd)
+
+        self.assertTrue(np.allclose(
+            collector.inoperability, np.transpose(qans)))
+        self.assertEqual(len(collector.delta_overall), len(model))
+        self.assertTrue(np.allclose(
+            collector.delta_overall, model.overall_dependency()))
+        self.assertEqual(rows[0][5:], runs)
+        self.assertEqual(len(rows), len(model) + 1)
+
+    def test_scenarios(self):
+        fcsv = os.path.join(self.tmpdir.name, "scen.csv")
+        with open(fcsv, "w") as fout:
+            fout.write("scenario,sector,cvalue\n"
+                       "a,RD,0.1\nb,R49,0.2\nb,R01,0.05\n")
+        fjson = os.path.join(self.tmpdir.name, "scen.jsonl")
+        with open(fjson, "w") as fout:
+            fout.write('{"name": "a", "cvalue": {"RD": 0.1}}\n'
+                       '{"name": "b", "cvalue": {"R49": 0.2, "R01": 0.05}}\n')
+        scenarios = iim_io.read_scenarios(fcsv)
+        self.assertEqual(scenarios, iim_io.read_scenarios(fjson))
+        self.assertEqual(scenarios[1], ("b", ["R49", "R01"], [0.2, 0.05]))
+
+        model = iim.IIM(self.fname, [], [], "IO", "Demand")
+        cstar = model.perturbation_batch([ps for _, ps, _ in scenarios],
+                                         [cs for _, _, cs in scenarios])
+        qbatch = model.inoperability_batch(cstar)
+        for (_, psector, cvalue), q in zip(scenarios, qbatch):
+            ref = model.with_perturbation(psector, cvalue).inoperability()
+            self.assertTrue(np.allclose(q, ref))
+
+        results = iim_io.collect_results(model)
+        results["q"] = qbatch.T
+        results["scenarios"] = ["a", "b"]
+        fname = os.path.join(self.tmpdir.name, "out.csv")
+        iim_io.write_batch_results(results, "csv", fname)
+        with open(fname, newline="") as fin:
+            rows = list(csv.reader(fin))
+        self.assertEqual(rows[0][5:], ["a", "b"])
+        self.assertEqual(len(rows), len(model) + 1)
+
+        with self.assertRaises(RuntimeError):
+            iim_main._check_input(["RD"], [0.1], scenarios=fcsv)
+        iim_main._check_input([], [], scenarios=fcsv)
+
+    def test_sweep(self):
+        model = iim.IIM(self.fname, [], [], "IO", "Demand")
+        rows = model.key_sector_sweep([0.1])
+        fname = os.path.join(self.tmpdir.name, "sweep.csv")
+        iim_io.write_sweep(rows, "csv", fname)
+        with open(fname, newline="") as fin:
+            data = list(csv.reader(fin))
+        self.assertEqual(data[0], iim_io.SWEEP_FIELDS)
+        self.assertEqual([r[0] for r in data[1:]], [r[0] for r in rows])
+        self.assertEqual([float(r[2]) for r in data[1:]],
+                         [r[2] for r in rows])
+        fname = os.path.join(self.tmpdir.name, "sweep.npz")
+        iim_io.write_sweep(rows, "npz", fname)
+        with np.load(fname) as data:
+            self.assertEqual(list(data["sector"]), [r[0] for r in rows])
+            self.assertTrue(np.array_equal(data["q_tot"],
+                                           [r[2] for r in rows]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import iim.iim as iim
+import iim.mitigation as iim_mitigation
+import numpy as np
+import scipy.optimize
+import unittest
+
+
+class TestMitigation(unittest.TestCase):
+    def setUp(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        self.psector = ["RD", "R49", "R01", "R84"]
+        self.cvalue = [0.1, 0.2, 0.3, 0.05]
+        self.model = iim.IIM(fname, self.psector, self.cvalue, "IO",
+                             "Demand")
+
+    def test_greedy_cstar(self):
+        opt = iim_mitigation.MitigationOptimizer(self.model)
+        candidates = [(ps, 0.05, 1.0) for ps in self.psector] + \
+            [(ps, 0.1, 1.5) for ps in self.psector]
+        res = opt.greedy(2.6, candidates)
+        sectors = self.model.sectors
+        self.assertLessEqual(res.cost, 2.6)
+        self.assertEqual(len(res.selected), len(res.history) - 1)
+        self.assertTrue(np.all(np.diff(res.history) <= 0.0))
+        self.assertAlmostEqual(res.objective, opt.objective(res.cstar))
+        self.assertAlmostEqual(res.objective0,
+                               self.model.inoperability().sum())
+        self.assertTrue(np.allclose(res.model.inoperability(),
+                                    np.minimum(self.model.solver.solve(
+                                        res.cstar), 1.0)))
+        self.assertTrue(np.all(res.reduction >= 0.0))
+        self.assertTrue(np.array_equal(res.model.cstar, res.cstar))
+        self.assertEqual(res.model.psector, self.psector)
+        self.assertEqual(res.model.cvalue,
+                         [res.cstar[sectors.get_loc(ps)]
+                          for ps in self.psector])
+        # The model itself is not modified.
+        self.assertAlmostEqual(opt.objective(), res.objective0)
+
+    def test_greedy_links(self):
+        sectors = self.model.get_sectors()
+        astar = np.array(self.model.get_interdependency_matrix())
+        orig = astar.copy()
+        rows, cols = np.nonzero(astar > 0.01)
+        links = [(sectors[i], sectors[j], 0.0, 1.0)
+                 for i, j in zip(rows, cols)]
+        opt = iim_mitigation.MitigationOptimizer(self.model)
+        res = opt.greedy(3.0, [("RD", 0.1, 5.0)], links)
+        self.assertEqual(len(res.selected), 3)
+        self.assertTrue(all(kind == "link" for kind, _ in res.selected))
+        for _, k in res.selected:
+            astar[rows[k], cols[k]] = 0.0
+        ref = iim.IIM.from_arrays(sectors, astar, None, self.psector,
+                                  self.cvalue, "A")
+        self.assertAlmostEqual(res.objective, ref.inoperability().sum())
+        self.assertTrue(res.objective < res.objective0)
+        self.assertTrue(np.array_equal(
+            self.model.get_interdependency_matrix(), orig))
+
+    def test_allocate(self):
+        n = len(self.model)
+        costs = np.linspace(1.0, 2.0, n)
+        opt = iim_mitigation.MitigationOptimizer(self.model)
+        res = opt.allocate(costs, 0.2)
+        self.assertAlmostEqual(res.cost, 0.2)
+        lam = self.model.solver.solve_transpose(np.ones(n))
+        ref = scipy.optimize.linprog(
+            -lam, A_ub=costs[np.newaxis, :], b_ub=[0.2],
+            bounds=list(zip(np.zeros(n), self.model.cstar)))
+        self.assertAlmostEqual(res.objective, res.objective0 + ref.fun)
+        pgd = opt.allocate(costs, 0.2, method="pgd")
+        self.assertLessEqual(pgd.objective, res.objective + 1.0e-12)
+        self.assertLessEqual(pgd.cost, 0.2 + 1.0e-9)
+
+    def test_allocate_clipped(self):
+        fname = os.path.join("tests", "test_case3.csv")
+        model = iim.IIM(fname, ["SectorA", "SectorB"], [1.0, 0.2], "A",
+                        "Demand")
+        opt = iim_mitigation.MitigationOptimizer(model)
+        res = opt.allocate(1.0, 0.3, method="pgd")
+        self.assertTrue(res.objective < res.objective0)
+        self.assertTrue(np.all(res.reduction >= 0.0))
+        self.assertLessEqual(res.cost, 0.3 + 1.0e-9)
+        with self.assertRaises(RuntimeError):
+            opt.allocate(1.0, 0.3, method="simplex")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import iim.iim as iim
+import iim.montecarlo as iim_mc
+import numpy as np
+import unittest
+
+
+class TestMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        fname = os.path.join("tests", "test_case3.csv")
+        self.model = iim.IIM(fname, ["SectorC"], [0.12], "A", "Demand")
+
+    def test_statistics(self):
+        n = len(self.model)
+        perturbation = iim_mc.UniformPerturbation(np.zeros(n), [0.0, 0.2, 0.4])
+        mc = iim_mc.MonteCarlo(self.model, perturbation, thresholds=[0.1])
+        res = mc.run(5000, seed=42, chunk_size=1000)
+
+        # Reference from stored draws with the same random streams.
+        seeds = np.random.SeedSequence(42).spawn(5)
+        cstar = np.vstack([perturbation(np.random.default_rng(ss), 1000)
+                           for ss in seeds])
+        q = self.model.inoperability_batch(cstar)
+
+        self.assertEqual(res.ndraws, 5000)
+        self.assertTrue(np.allclose(res.mean, q.mean(axis=0)))
+        self.assertTrue(np.allclose(res.std(), q.std(axis=0, ddof=1)))
+        self.assertTrue(np.allclose(
+            res.exceedance()[0], (q > 0.1).mean(axis=0)))
+        for p in [5, 50, 95]:
+            self.assertTrue(np.allclose(
+                res.percentile(p), np.percentile(q, p, axis=0), atol=2.0e-3))
+
+    def test_fixed_perturbation(self):
+        mc = iim_mc.MonteCarlo(self.model)
+        res = mc.run(10, seed=1)
+        self.assertTrue(np.allclose(res.mean, self.model.inoperability()))
+        self.assertTrue(np.allclose(res.std(), 0.0))
+
+    def test_reproducible_process_pool(self):
+        mc = iim_mc.MonteCarlo(self.model, astar_sigma=0.1)
+        res1 = mc.run(200, nproc=1, seed=7, chunk_size=50)
+        res2 = mc.run(200, nproc=2, seed=7, chunk_size=50)
+        self.assertTrue(np.array_equal(res1.mean, res2.mean))
+        self.assertTrue(np.array_equal(res1.hist, res2.hist))
+        self.assertTrue(res1.std().max() > 0.0)
+        self.assertTrue(np.allclose(
+            res1.mean, self.model.inoperability(), rtol=0.05))
+
+
+if __name__ == "__main__":
+    unittest.main()
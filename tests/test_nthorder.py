@@ -0,0 +1,73 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import iim.iim as iim
+import iim.nthorder as iim_nthorder
+import numpy as np
+import scipy.sparse
+import unittest
+
+
+class TestNthOrder(unittest.TestCase):
+    def setUp(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        self.model = iim.IIM(fname, [], [], "IO", "Demand")
+
+    def test_powers(self):
+        astar = self.model.astar
+        powers = iim_nthorder.InterdependencyPowers(astar)
+        for k, amat in powers.iter_powers(4):
+            self.assertTrue(np.allclose(
+                amat, np.linalg.matrix_power(astar, k)))
+        self.assertEqual(powers.cached_orders(), [1, 2, 3, 4])
+        self.assertTrue(np.allclose(
+            powers.power(6), np.linalg.matrix_power(astar, 6)))
+        with self.assertRaises(RuntimeError):
+            powers.power(0)
+
+    def test_memory_budget(self):
+        astar = self.model.astar
+        powers = iim_nthorder.InterdependencyPowers(
+            astar, max_bytes=astar.nbytes)
+        self.assertTrue(np.allclose(
+            powers.power(3), np.linalg.matrix_power(astar, 3)))
+        self.assertEqual(powers.cached_orders(), [1, 2])
+        self.assertTrue(np.allclose(
+            powers.power(4), np.linalg.matrix_power(astar, 4)))
+
+    def test_top_k(self):
+        amat = np.linalg.matrix_power(self.model.astar, 2)
+        for astar in [self.model.astar,
+                      scipy.sparse.csr_matrix(self.model.astar)]:
+            powers = iim_nthorder.InterdependencyPowers(astar, block_size=10)
+            indx, vals = powers.top_k(2, 3)
+            ans = -np.sort(-amat, axis=1)[:, :3]
+            self.assertTrue(np.allclose(vals, ans))
+            self.assertTrue(np.allclose(
+                np.take_along_axis(amat, indx, axis=1), ans))
+
+    def test_max_nth_order_interdependency(self):
+        sectors = self.model.get_sectors()
+        for n in [1, 2, 3]:
+            amat = np.linalg.matrix_power(self.model.astar, n)
+            res = self.model.max_nth_order_interdependency(n)
+            self.assertEqual(len(res), len(sectors))
+            for i, (si, sj, aij) in enumerate(res):
+                j = np.argmax(amat[i, :])
+                self.assertEqual(si, sectors[i])
+                self.assertEqual(sj, sectors[j])
+                self.assertAlmostEqual(aij, amat[i, j])
+        res = self.model.top_nth_order_interdependency(2, 2)
+        self.assertEqual(len(res), 2 * len(sectors))
+        self.assertTrue(res[0][2] >= res[1][2])
+        self.assertAlmostEqual(
+            self.model.interdependency_index("R01", "R03", 2),
+            np.linalg.matrix_power(self.model.astar, 2)[0, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import iim.iim as iim
+import iim.parallel as iim_parallel
+import numpy as np
+import unittest
+
+
+def _top_sector(model, task):
+    q = iim_parallel.inoperability_task(model, task)
+    return model.get_sectors()[int(np.argmax(q))], float(q.sum())
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.fname = os.path.join("examples", "ssb_io.csv")
+
+    def test_ordered_results(self):
+        for solver in ["LU", "Inverse", "Krylov"]:
+            model = iim.IIM(self.fname, [], [], "IO", "Demand", solver)
+            tasks = [([s], [0.1]) for s in model.get_sectors()]
+            ref = [iim_parallel.inoperability_task(model, t) for t in tasks]
+            with iim_parallel.ParallelRunner(
+                    model, nproc=2, max_pending=3, chunk_size=4) as runner:
+                res = runner.map(iim_parallel.inoperability_task, tasks)
+                top = list(runner.imap(_top_sector, tasks[:5]))
+            self.assertEqual(len(res), len(ref))
+            for q, qref in zip(res, ref):
+                self.assertTrue(np.allclose(q, qref))
+            self.assertEqual(top, [_top_sector(model, t) for t in tasks[:5]])
+
+    def test_unshared_solvers(self):
+        model = iim.IIM(self.fname, [], [], "IO", "Demand", "SparseLU")
+        with self.assertRaises(RuntimeError):
+            iim_parallel.ParallelRunner(model, nproc=2)
+        model = iim.IIM(self.fname, [], [], "IO", "Demand")
+        model = model.update_interdependency("RD", "R49", 0.05)
+        with self.assertRaises(RuntimeError):
+            iim_parallel.ParallelRunner(model, nproc=2)
+        with iim_parallel.ParallelRunner(model, nproc=1) as runner:
+            res = runner.map(iim_parallel.inoperability_task,
+                             [(["RD"], [0.1])])
+        self.assertTrue(np.allclose(
+            res[0], model.with_perturbation(["RD"], [0.1]).inoperability()))
+
+    def test_shared_arrays(self):
+        arr = np.arange(12.0).reshape(3, 4)
+        shared = iim_parallel.SharedArrays({"a": arr, "b": np.zeros(0)})
+        arrays, handles = iim_parallel.attach_arrays(shared.spec)
+        self.assertTrue(np.array_equal(arrays["a"], arr))
+        self.assertEqual(arrays["b"].shape, (0,))
+        self.assertFalse(arrays["a"].flags.writeable)
+        del arrays
+        for shm in handles:
+            shm.close()
+        spec = shared.spec
+        shared.close()
+        with self.assertRaises(FileNotFoundError):
+            iim_parallel.attach_arrays(spec)
+
+    def test_serial(self):
+        model = iim.IIM(self.fname, [], [], "IO", "Demand")
+        with iim_parallel.ParallelRunner(model, nproc=1) as runner:
+            res = runner.map(iim_parallel.inoperability_task,
+                             [(["RD"], [0.1])])
+        self.assertTrue(np.allclose(
+            res[0], model.with_perturbation(["RD"], [0.1]).inoperability()))
+
+
+if __name__ == "__main__":
+    unittest.main()
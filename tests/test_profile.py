@@ -0,0 +1,106 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import json
+import os
+import sys
+import tempfile
+import unittest.mock
+import iim.iim as iim
+import iim.main as iim_main
+import iim.profile as iim_profile
+import unittest
+
+
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join("examples", "ssb_io.csv")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hook(self):
+        records = []
+        iim_profile.add_hook(records.append)
+        try:
+            model = iim.IIM(self.fname, ["RD"], [0.1], "IO", "Demand")
+            model.inoperability()
+        finally:
+            iim_profile.remove_hook(records.append)
+        names = [r["name"] for r in records]
+        self.assertEqual(names, ["iim.read_io_table", "iim.tech_coeff",
+                                 "solver.create", "iim.interdependency",
+                                 "iim.inoperability"])
+        n = len(model)
+        rec = records[2]
+        self.assertEqual(rec["parent"], "iim.interdependency")
+        self.assertEqual(rec["depth"], 1)
+        self.assertEqual(rec["attrs"], {"shape": [n, n], "nnz": n * n})
+        self.assertEqual(records[1]["attrs"], {"shape": [n, n], "nnz": n * n})
+        self.assertEqual(records[4]["attrs"]["solver"], "LU")
+        self.assertIsNone(rec["bytes"])  # tracemalloc is not tracing
+        self.assertTrue(all(r["wall"] >= 0.0 and r["cpu"] >= 0.0
+                            for r in records))
+
+        # No records without hooks.
+        model.inoperability()
+        self.assertEqual(len(records), 5)
+        self.assertIs(iim_profile.span("test"), iim_profile.span("test"))
+
+    def test_profiler(self):
+        with iim_profile.Profiler() as prof:
+            with iim_profile.span("outer", tag=1) as sp:
+                model = iim.IIM(self.fname, ["RD"], [0.1], "IO", "Demand",
+                                "SparseLU")
+                sp.set(n=len(model))
+        self.assertFalse(iim_profile.enabled())
+        outer = prof.spans[-1]
+        self.assertEqual(outer["name"], "outer")
+        self.assertEqual(outer["attrs"], {"tag": 1, "n": len(model)})
+        inner = [r for r in prof.spans if r["parent"] == "outer"]
+        self.assertTrue(inner)
+        for rec in inner:
+            self.assertGreaterEqual(outer["bytes"], rec["bytes"])
+            self.assertGreaterEqual(outer["wall"], rec["wall"])
+        solver = [r for r in prof.spans if r["name"] == "solver.create"][0]
+        self.assertEqual(solver["attrs"]["nnz"], model.astar.nnz)
+        summary = {row[0]: row for row in prof.summary()}
+        self.assertEqual(summary["outer"][1], 1)
+
+    def test_nested_peak(self):
+        with iim_profile.Profiler() as prof:
+            with iim_profile.span("outer"):
+                work = bytearray(8 * 10**6)
+                del work
+                with iim_profile.span("inner"):
+                    pass
+        inner, outer = prof.spans
+        self.assertLess(inner["bytes"], 10**6)
+        self.assertGreaterEqual(outer["bytes"], 8 * 10**6)
+
+    def test_main(self):
+        output = os.path.join(self.tmpdir.name, "out.json")
+        profile = os.path.join(self.tmpdir.name, "profile.json")
+        argv = ["iim", "-f", self.fname, "-s", "RD", "-c", "0.1",
+                "--format", "json", "-o", output, "--profile", profile]
+        with unittest.mock.patch.object(sys, "argv", argv):
+            iim_main.main()
+        with open(profile) as fin:
+            res = json.load(fin)
+        names = {r["name"] for r in res["spans"]}
+        for name in ["main.model", "main.output", "iim.read_io_table",
+                     "iim.inoperability", "iim.overall_influence"]:
+            self.assertIn(name, names)
+        for rec in res["spans"]:
+            self.assertGreaterEqual(rec["bytes"], 0)
+        self.assertEqual(sum(r["calls"] for r in res["summary"]),
+                         len(res["spans"]))
+        self.assertTrue(os.path.exists(output))
+
+
+if __name__ == "__main__":
+    unittest.main()
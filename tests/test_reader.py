@@ -0,0 +1,101 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import tempfile
+import iim.iim as iim
+import iim.reader as iim_reader
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import unittest
+
+
+class TestReader(unittest.TestCase):
+    def test_read_io_table(self):
+        fnames = [(os.path.join("tests", "test_case%d.csv" % k), "A")
+                  for k in range(1, 4)]
+        fnames += [(os.path.join("tests", "test_case4.csv"), "IO"),
+                   (os.path.join("examples", "ssb_io.csv"), "IO")]
+        for fname, table in fnames:
+            df = pd.read_csv(fname)
+            values = np.array(df.values, dtype=float)
+            for chunk_rows in [1, 7, 1024]:
+                sectors, io_table, xoutput, stats = \
+                    iim_reader.read_io_table(
+                        fname, table, chunk_rows=chunk_rows)
+                self.assertEqual(sectors, list(df.columns.str.strip()))
+                self.assertEqual(stats.rows, len(values))
+                if table == "IO":
+                    self.assertTrue(np.array_equal(io_table, values[:-1]))
+                    self.assertTrue(np.array_equal(xoutput, values[-1]))
+                    self.assertIs(io_table.base, xoutput.base)
+                else:
+                    self.assertTrue(np.array_equal(io_table, values))
+                    self.assertEqual(xoutput, [])
+                sectors, sp_table, sp_xoutput, _ = iim_reader.read_io_table(
+                    fname, table, sparse=True, chunk_rows=chunk_rows)
+                self.assertTrue(scipy.sparse.issparse(sp_table))
+                self.assertTrue(np.array_equal(sp_table.toarray(), io_table))
+                if table == "IO":
+                    self.assertTrue(np.array_equal(sp_xoutput, xoutput))
+
+    def test_memory_mapped(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        ref = iim.IIM(fname, ["RD"], [0.1], "IO", "Demand")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            mmap_file = os.path.join(tmpdir, "ssb_io.npy")
+            sectors, io_table, xoutput, _ = iim_reader.read_io_table(
+                fname, "IO", mmap_file=mmap_file)
+            self.assertTrue(np.array_equal(
+                np.load(mmap_file)[:-1], ref.io_table))
+            model = iim.IIM.from_arrays(
+                sectors, io_table, xoutput, ["RD"], [0.1],
+                copy_arrays=False)
+            self.assertTrue(np.shares_memory(model.io_table, io_table))
+            self.assertTrue(np.allclose(
+                model.inoperability(), ref.inoperability()))
+            del model, io_table, xoutput
+
+    def test_bad_tables(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "table.csv")
+            with open(fname, "w") as fout:
+                fout.write("A,B\n0.0,0.1\n0.2,0.0\n")
+            with self.assertRaises(RuntimeError):
+                iim_reader.read_io_table(fname, "IO")
+            with open(fname, "w") as fout:
+                fout.write("A,B\n0.0,0.1\n0.2,0.0\n0.3,0.3\n")
+            with self.assertRaises(RuntimeError):
+                iim_reader.read_io_table(fname, "A")
+
+    def test_byte_order_mark(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "table.csv")
+            with open(fname, "w", encoding="utf-8-sig") as fout:
+                fout.write("R01,R02\n0.0,0.1\n0.2,0.0\n")
+            sectors, io_table, _, _ = iim_reader.read_io_table(fname, "A")
+            self.assertEqual(sectors, ["R01", "R02"])
+            model = iim.IIM(fname, ["R01"], [0.1], "A", "Demand")
+            self.assertGreater(model.inoperability()[0], 0.1)
+
+    def test_quoted_values(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "table.csv")
+            with open(fname, "w") as fout:
+                fout.write('"A","B"\n"0.0","0.1"\n0.2,"0.0"\n')
+            for sparse in [False, True]:
+                sectors, io_table, _, _ = iim_reader.read_io_table(
+                    fname, "A", sparse=sparse)
+                if sparse:
+                    io_table = io_table.toarray()
+                self.assertEqual(sectors, ["A", "B"])
+                self.assertTrue(np.array_equal(
+                    io_table, pd.read_csv(fname).values))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import tempfile
+import iim.cache as iim_cache
+import iim.iim as iim
+import iim.regional as iim_regional
+import iim.solver as iim_solver
+import numpy as np
+import unittest
+
+
+class TestRegional(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join("examples", "ssb_io.csv")
+        self.east = iim.IIM(self.fname, [], [], "IO", "Demand")
+        sectors = self.east.get_sectors()
+        rng = np.random.default_rng(5)
+        self.trade = []
+        for _ in range(40):
+            i, j = rng.integers(0, len(sectors), 2)
+            ri, rj = ("East", "West") if rng.random() < 0.5 \
+                else ("West", "East")
+            self.trade.append((ri, sectors[i], rj, sectors[j],
+                               rng.uniform(0.0, 0.01)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _reference(self, model, psector, cvalue):
+        # Unstructured IIM with the same combined A* matrix.
+        return iim.IIM.from_arrays(
+            model.get_sectors(), model.astar.toarray(), None, psector,
+            cvalue, "A", "Demand")
+
+    def test_block_elimination(self):
+        psector = ["East:RD", "West:R49"]
+        cvalue = [0.1, 0.2]
+        for max_rank in [2048, 0]:
+            model = iim_regional.MultiRegionalIIM(
+                [("East", self.east), ("West", self.fname)], self.trade,
+                psector, cvalue, max_rank=max_rank)
+            ref = self._reference(model, psector, cvalue)
+            if max_rank > 0:
+                self.assertIsInstance(model.solver,
+                                      iim_solver.LowRankUpdateSolver)
+                self.assertEqual(model.solver_type, "LowRankUpdate")
+            else:
+                self.assertEqual(model.solver_type, "SparseLU")
+            self.assertTrue(model.sparse)
+            self.assertIsNone(model.get_tech_coeff())
+            self.assertEqual(len(model), 2 * len(self.east))
+            self.assertEqual(model.get_sectors()[0], "East:" +
+                             self.east.get_sectors()[0])
+            for name in ["inoperability", "dependency", "overall_dependency",
+                         "influence", "overall_influence"]:
+                self.assertTrue(np.allclose(getattr(model, name)(),
+                                            getattr(ref, name)()))
+            self.assertTrue(np.allclose(model.solver.diagonal(),
+                                        ref.solver.diagonal()))
+        self.assertEqual(len(model.get_xoutput()), len(model))
+
+    def test_solver_type(self):
+        model = iim_regional.MultiRegionalIIM(
+            [("East", self.east), ("West", self.east)], [], ["East:RD"],
+            [0.1])
+        self.assertEqual(model.solver_type, "BlockDiagonal")
+        with self.assertRaises(RuntimeError):
+            iim_cache.ModelCache(self.tmpdir.name).store("key", model)
+
+        # Refactorization after updates of A* uses a sparse LU solver.
+        model.drift_tol = 0.0
+        updated = model.update_interdependency("East:RD", "West:R49", 0.01)
+        self.assertEqual(updated.refactorizations, 1)
+        self.assertIsInstance(updated.solver, iim_solver.SparseLUSolver)
+        ref = self._reference(updated, ["East:RD"], [0.1])
+        self.assertTrue(np.allclose(updated.inoperability(),
+                                    ref.inoperability()))
+
+    def test_region_indices(self):
+        model = iim_regional.MultiRegionalIIM(
+            [("East", self.east), ("West", self.east)], self.trade,
+            ["East:RD"], [0.1])
+        rows = model.region_indices()
+        self.assertEqual([r[0] for r in rows], ["East", "West"])
+        q = model.inoperability()
+        n = len(self.east)
+        self.assertAlmostEqual(rows[1][1], q[n:].mean())
+        self.assertAlmostEqual(rows[0][2], q[:n].max())
+        dep = model.regional_dependency()
+        delta = model.astar.sum(axis=1)
+        self.assertTrue(np.allclose(dep.sum(axis=1),
+                                    [delta[:n].mean(), delta[n:].mean()]))
+        ref = self._reference(model, [], [])
+        smat = ref.smat
+        self.assertAlmostEqual(model.regional_dependency(True)[0, 1],
+                               smat[:n, n:].sum(axis=1).mean())
+
+    def test_read_trade(self):
+        fname = os.path.join(self.tmpdir.name, "trade.csv")
+        with open(fname, "w") as fout:
+            fout.write("region_i,sector_i,region_j,sector_j,value\n"
+                       "East,RD,West,R49,0.01\n")
+        trade = iim_regional.read_trade(fname)
+        self.assertEqual(trade, [("East", "RD", "West", "R49", 0.01)])
+        with self.assertRaises(RuntimeError):
+            iim_regional.MultiRegionalIIM(
+                [("East", self.east)], [("East", "RD", "East", "R49", 0.1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
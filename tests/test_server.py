@@ -0,0 +1,109 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import asyncio
+import concurrent.futures
+import os
+import tempfile
+import threading
+import iim.iim as iim
+import iim.server as iim_server
+import numpy as np
+import unittest
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        fname = os.path.join("examples", "ssb_io.csv")
+        self.model = iim.IIM(fname, [], [], "IO", "Demand")
+        self.server = iim_server.IIMServer(
+            {"ssb": self.model}, batch_delay=0.05, cache_size=8)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(
+            self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.tmpdir.cleanup()
+
+    def _start(self, **kwargs):
+        return asyncio.run_coroutine_threadsafe(
+            self.server.start(**kwargs), self.loop).result()
+
+    def test_queries(self):
+        host, port = self._start()
+        client = iim_server.IIMClient(host, port)
+        try:
+            models = client.models()
+            self.assertEqual(models["ssb"]["sectors"],
+                             list(self.model.get_sectors()))
+            q = client.inoperability("ssb", ["RD", "R49"], [0.1, 0.2])
+            ref = self.model.with_perturbation(
+                ["RD", "R49"], [0.1, 0.2]).inoperability()
+            self.assertTrue(np.allclose(q, ref))
+            # Same scenario in another order is served from the cache.
+            client.inoperability("ssb", ["R49", "RD"], [0.2, 0.1])
+            self.assertEqual(self.server.stats["cache_hits"], 1)
+
+            indices = client.indices("ssb")
+            self.assertTrue(np.allclose(
+                indices["rho_overall"], self.model.overall_influence()))
+            rows = client.nth_order("ssb", 2, k=3)
+            ref = self.model.top_nth_order_interdependency(2, 3)
+            self.assertEqual([r[:2] for r in rows],
+                             [[str(r[0]), str(r[1])] for r in ref])
+
+            with self.assertRaises(RuntimeError):
+                client.inoperability("ssb", ["XX"], [0.1])
+            for cvalue in [-0.1, 1.5]:
+                with self.assertRaisesRegex(RuntimeError, "not in range"):
+                    client.inoperability("ssb", ["RD"], [cvalue])
+            with self.assertRaises(RuntimeError):
+                client.indices("unknown")
+            with self.assertRaises(RuntimeError):
+                client.request("/missing")
+        finally:
+            client.close()
+
+    def test_micro_batches(self):
+        host, port = self._start()
+        sectors = list(self.model.get_sectors())[:12]
+
+        def query(sector):
+            client = iim_server.IIMClient(host, port)
+            try:
+                return client.inoperability("ssb", [sector], [0.1])
+            finally:
+                client.close()
+
+        with concurrent.futures.ThreadPoolExecutor(12) as pool:
+            res = list(pool.map(query, sectors))
+        for sector, q in zip(sectors, res):
+            ref = self.model.with_perturbation([sector], [0.1])
+            self.assertTrue(np.allclose(q, ref.inoperability()))
+        self.assertEqual(self.server.stats["scenarios"], 12)
+        self.assertLess(self.server.stats["batches"], 12)
+        self.assertEqual(len(self.server.cache), 8)
+
+    def test_unix_socket(self):
+        path = os.path.join(self.tmpdir.name, "iim.sock")
+        self._start(path=path)
+        client = iim_server.IIMClient(path=path)
+        try:
+            q = client.inoperability("ssb", ["RD"], [0.1])
+        finally:
+            client.close()
+        self.assertTrue(np.allclose(q, self.model.with_perturbation(
+            ["RD"], [0.1]).inoperability()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+# Copyright (c) 2020 Stig Rune Sellevag
+#
+# This file is distributed under the MIT License. See the accompanying file
+# LICENSE.txt or http://www.opensource.org/licenses/mit-license.php for terms
+# and conditions.
+
+import os
+import scripts.iim_startup as iim_startup
+import unittest
+
+
+class TestStartup(unittest.TestCase):
+    def test_no_heavy_imports(self):
+        # The CLI must not load Pandas or Matplotlib to produce results.
+        fname = os.path.join("examples", "ssb_io.csv")
+        res = iim_startup.measure(fname, repeat=1)
+        self.assertEqual(res["heavy_modules"], [])
+        self.assertTrue(res["import_median"] > 0.0)
+        self.assertTrue(res["first_result_median"] > 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()